@@ -149,6 +149,16 @@ def get_range_scores(workers_per_weekday: np.ndarray, use_faulty_range_score = F
                 for min_amount, max_amount in zip(mins, maxs)]
 
 
+def get_range_scores_of_arrays(mins: np.ndarray, maxs: np.ndarray, use_faulty_range_score = False) -> np.ndarray:
+    """The same as range_score (or faulty_range_score) applied elementwise, for arrays of any shape"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.square((maxs - mins) / maxs)
+    if use_faulty_range_score:
+        return np.where(mins == 0, 0.0, scores)
+    else:
+        return np.where(maxs == 0, 1.0, scores)
+
+
 
 
 
@@ -1,3 +1,5 @@
+import numpy as np
+
 from Core.FullSolution import FullSolution
 from Core.PRef import PRef
 from Core.PS import PS
@@ -10,6 +12,8 @@ class BenchmarkProblem:
     """ The main components of this class are:
      -  a search space: the combinatorial search space
      -  fitness_function: the fitness function to be MAXIMISED
+     -  fitness_function_batch: the same, but for a matrix of full solutions (one per row), ideally vectorised
+     -  fitness_delta: how much the fitness changes when a single variable is changed, if has_fitness_delta
      -  get_targets: the ideal Core catalog
      -  repr_pr: a way to represent the Core which makes sense for the problem (ie checkerboard would use a grid)
      
@@ -17,6 +21,9 @@ class BenchmarkProblem:
      """
     search_space: SearchSpace
 
+    # True when fitness_delta is implemented incrementally, in which case SA and GA use it for single point mutations
+    has_fitness_delta: bool = False
+
     def __init__(self, search_space: SearchSpace):
         self.search_space = search_space
 
@@ -24,9 +31,10 @@ class BenchmarkProblem:
         raise Exception("An implementation of BenchmarkProblem does not implement __repr__")
 
     def get_reference_population(self, sample_size: int) -> PRef:
-        return PRef.sample_from_search_space(search_space=self.search_space,
-                                             fitness_function=self.fitness_function,
-                                             amount_of_samples=sample_size)
+        full_solution_matrix = self.search_space.random_solution_matrix(sample_size)
+        return PRef(fitness_array=self.fitness_function_batch(full_solution_matrix),
+                    full_solution_matrix=full_solution_matrix,
+                    search_space=self.search_space)
 
     def repr_full_solution(self, fs: FullSolution) -> str:
         """default implementation"""
@@ -42,6 +50,25 @@ class BenchmarkProblem:
     def fitness_function(self, fs: FullSolution) -> float:
         raise Exception("An implementation of BenchmarkProblem does not implement the fitness function!!!")
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        """The fitnesses of the rows of the matrix. This default implementation calls fitness_function for each row"""
+        return np.array([self.fitness_function(FullSolution(row)) for row in full_solution_matrix], dtype=float)
+
+    def get_delta_state(self, fs: FullSolution):
+        """Whatever fitness_delta needs to know about fs, which is None when fs itself is enough"""
+        return None
+
+    def fitness_delta(self, fs: FullSolution, var: int, new_val: int, cached_state=None) -> float:
+        """
+        fitness_function(fs.with_different_value(var, new_val)) - fitness_function(fs),
+        where cached_state is from get_delta_state(fs). This default implementation evaluates both solutions.
+        """
+        return self.fitness_function(fs.with_different_value(var, new_val)) - self.fitness_function(fs)
+
+    def apply_delta(self, fs: FullSolution, var: int, new_val: int, cached_state):
+        """Returns cached_state updated for fs.with_different_value(var, new_val), which might modify it in place"""
+        return cached_state
+
     def get_targets(self) -> set[PS]:
         raise Exception("An implementation of BenchmarkProblem does not implement get_targets")
 
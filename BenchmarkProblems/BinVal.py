@@ -1,3 +1,5 @@
+import numpy as np
+
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core.FullSolution import FullSolution
 from Core.PS import PS
@@ -20,6 +22,10 @@ class BinVal(BenchmarkProblem):
             header *= 2
         return float(result)
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        headers = 2.0 ** np.arange(self.amount_of_bits - 1, -1, -1)  # floats, since they would overflow as ints
+        return full_solution_matrix @ headers
+
     def get_targets(self) -> list[PS]:
         empty = PS.empty(self.search_space)
         return [empty.with_fixed_value(variable_position=var, fixed_value=1) for var in range(self.amount_of_bits)]
@@ -41,6 +41,12 @@ class CheckerBoard(BenchmarkProblem):
 
         # could have been np.sum(grid[1:] != grid[:-1]) + np.sum(grid[:, 1:] != grid[:, :-1])
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        grids = full_solution_matrix.reshape((-1, self.rows, self.columns))
+        vertical_diffs = np.sum(grids[:, 1:] != grids[:, :-1], axis=(1, 2))
+        horizontal_diffs = np.sum(grids[:, :, 1:] != grids[:, :, :-1], axis=(1, 2))
+        return (vertical_diffs + horizontal_diffs).astype(float)
+
     @staticmethod
     def fitness_of_flat_clique(fs: FullSolution) -> float:
         return float(np.sum(fs.values[:-1] != fs.values[1:]))
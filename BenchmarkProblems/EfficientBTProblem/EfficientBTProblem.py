@@ -1,12 +1,13 @@
 import itertools
 import math
-from typing import TypeAlias
+from typing import TypeAlias, Optional
 
 import numpy as np
+import pandas as pd
 
 import utils
 from BenchmarkProblems.BT.BTProblem import BTProblem
-from BenchmarkProblems.BT.RotaPattern import RotaPattern, get_range_scores, WorkDay
+from BenchmarkProblems.BT.RotaPattern import RotaPattern, get_range_scores, WorkDay, get_range_scores_of_arrays
 from BenchmarkProblems.BT.Worker import Worker, Skill
 from BenchmarkProblems.GraphColouring import GraphColouring
 from Core.FullSolution import FullSolution
@@ -154,12 +155,35 @@ def get_coverage(cohort: Cohort) -> float:
     return np.average(total_pattern)   # happens to be equal to quantity_working_days / quantity_days
 
 
+class BTDeltaState:
+    """What EfficientBTProblem.fitness_delta needs to know about the current solution, see get_delta_state"""
+    calendars: np.ndarray  # for each skill class, how many of its workers work on each day, shape (classes, calendar_length)
+    class_scores: np.ndarray  # for each skill class, the weighted sum of the range scores of one of its skills
+    fitness: float
+
+    def __init__(self, calendars: np.ndarray, class_scores: np.ndarray, fitness: float):
+        self.calendars = calendars
+        self.class_scores = class_scores
+        self.fitness = fitness
+
+
 class EfficientBTProblem(BTProblem):
     extended_patterns: list[FullPatternOptions]
     workers_by_skills: dict  # Skill -> set[worker index]
     use_faulty_fitness_function: bool
     rota_preference_weight: float
 
+    # the same information as above, as arrays for the vectorised fitness function.
+    # The skills which have exactly the same workers always get the same range scores, so they are grouped in classes,
+    # where each class is evaluated once and its score is multiplied by the amount of skills in it
+    skill_classes: list[list[Skill]]
+    class_multiplicities: np.ndarray  # how many skills are in each class
+    incidence_matrix: np.ndarray  # incidence_matrix[worker, class] is 1 if the worker has the skills of that class
+    pattern_tensor: np.ndarray  # pattern_tensor[worker, rota] is the extended pattern (padded with 0s for missing rotas)
+    classes_of_workers: list[np.ndarray]  # the indices of the skill classes of each worker
+
+    has_fitness_delta = True
+
     def __init__(self,
                  workers: list[Worker],
                  calendar_length: int,
@@ -175,6 +199,25 @@ class EfficientBTProblem(BTProblem):
         self.use_faulty_fitness_function = use_faulty_fitness_function
         self.rota_preference_weight = rota_preference_weight
 
+        self.skill_classes = self.get_skill_classes()
+        self.class_multiplicities = np.array([len(skill_class) for skill_class in self.skill_classes], dtype=float)
+        self.incidence_matrix = np.array([[1 if index in self.workers_by_skills[skill_class[0]] else 0
+                                           for skill_class in self.skill_classes]
+                                          for index in range(len(self.workers))], dtype=float).reshape((len(self.workers), -1))
+        self.pattern_tensor = np.zeros(shape=(len(self.workers),
+                                              max(len(options) for options in self.extended_patterns),
+                                              calendar_length), dtype=float)
+        for index, options in enumerate(self.extended_patterns):
+            self.pattern_tensor[index, :len(options)] = options
+        self.classes_of_workers = [np.nonzero(row)[0] for row in self.incidence_matrix]
+
+    def get_skill_classes(self) -> list[list[Skill]]:
+        """Groups the skills by their set of workers, in order of first appearance of each class in the sorted skills"""
+        classes = dict()  # frozenset of worker indices -> list of skills
+        for skill in sorted(self.all_skills):
+            classes.setdefault(frozenset(self.workers_by_skills[skill]), []).append(skill)
+        return list(classes.values())
+
     def get_ranges_for_weekdays_for_skill(self, chosen_patterns: list[ExtendedPattern],
                                           skill: Skill) -> WeekRanges:
         indexes = self.workers_by_skills[skill]
@@ -183,7 +226,7 @@ class EfficientBTProblem(BTProblem):
         return get_range_scores(summed_patterns, self.use_faulty_fitness_function)
 
     def aggregate_range_scores(self, range_scores: WeekRanges) -> float:
-        return float(np.sum(day_range * weight for day_range, weight in zip(range_scores, self.weights)))
+        return float(sum(day_range * weight for day_range, weight in zip(range_scores, self.weights)))
 
 
     def get_chosen_patterns_from_fs(self, fs: FullSolution) -> list[ExtendedPattern]:
@@ -191,17 +234,76 @@ class EfficientBTProblem(BTProblem):
 
 
     def fitness_function(self, fs: FullSolution) -> float:
-        chosen_patterns = self.get_chosen_patterns_from_fs(fs)
-        quantity_of_unliked_rotas = np.sum(fs.values != 0)
-
-        def score_for_skill(skill) -> float:
-            ranges = self.get_ranges_for_weekdays_for_skill(chosen_patterns, skill)
-            return self.aggregate_range_scores(ranges)
-
-        rota_score = np.sum([score_for_skill(skill) for skill in self.all_skills])
-        preference_score = self.rota_preference_weight * quantity_of_unliked_rotas
-        return -(rota_score + preference_score) # to convert it to a maximisation task
-
+        return float(self.fitness_function_batch(fs.values.reshape((1, -1)))[0])
+
+    def get_skill_scores_of_calendars(self, calendars: np.ndarray) -> np.ndarray:
+        """From the calendars of the skill classes, shape (..., calendar_length), to their weighted range scores, shape (...)"""
+        weeks = calendars.reshape(calendars.shape[:-1] + (-1, 7))
+        range_scores = get_range_scores_of_arrays(np.min(weeks, axis=-2), np.max(weeks, axis=-2),
+                                                  self.use_faulty_fitness_function)
+        return range_scores @ np.array(self.weights, dtype=float)
+
+    def get_calendars_of_skills(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        """For each row and skill class, how many of its workers work on each day, shape (rows, classes, calendar)"""
+        chosen_patterns = self.pattern_tensor[np.arange(len(self.workers)), full_solution_matrix]  # (rows, workers, calendar)
+        return np.swapaxes(np.swapaxes(chosen_patterns, 1, 2) @ self.incidence_matrix, 1, 2)
+
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        # the rows are processed in chunks, so that the calendars of the skills don't use too much memory
+        rows_per_chunk = max(1, 2 ** 22 // (len(self.skill_classes) * self.calendar_length + 1))
+        rota_scores = np.concatenate([self.get_skill_scores_of_calendars(self.get_calendars_of_skills(chunk)) @ self.class_multiplicities
+                                      for chunk in np.array_split(full_solution_matrix,
+                                                                  range(rows_per_chunk, len(full_solution_matrix), rows_per_chunk))])
+        preference_scores = self.rota_preference_weight * np.sum(full_solution_matrix != 0, axis=1)
+        return -(rota_scores + preference_scores)  # to convert it to a maximisation task
+
+    def get_delta_state(self, fs: FullSolution) -> BTDeltaState:
+        calendars = self.get_calendars_of_skills(fs.values.reshape((1, -1)))[0]
+        class_scores = self.get_skill_scores_of_calendars(calendars)
+        preference_score = self.rota_preference_weight * np.sum(fs.values != 0)
+        return BTDeltaState(calendars, class_scores, fitness=-float(class_scores @ self.class_multiplicities + preference_score))
+
+    def fitness_delta(self, fs: FullSolution, var: int, new_val: int, cached_state: Optional[BTDeltaState] = None) -> float:
+        """
+        How much the fitness changes when worker var takes the rota new_val, where cached_state is from get_delta_state(fs).
+        Only the calendars of the skill classes of that worker are recalculated
+        """
+        old_val = fs.values[var]
+        if old_val == new_val:
+            return 0.0
+        if cached_state is None:
+            cached_state = self.get_delta_state(fs)
+        classes = self.classes_of_workers[var]
+        new_calendars = cached_state.calendars[classes] + (self.pattern_tensor[var, new_val] - self.pattern_tensor[var, old_val])
+        score_changes = self.get_skill_scores_of_calendars(new_calendars) - cached_state.class_scores[classes]
+        rota_delta = score_changes @ self.class_multiplicities[classes]
+        preference_delta = self.rota_preference_weight * (int(new_val != 0) - int(old_val != 0))
+        return -float(rota_delta + preference_delta)
+
+    def apply_delta(self, fs: FullSolution, var: int, new_val: int, cached_state: BTDeltaState) -> BTDeltaState:
+        """Updates cached_state (in place) to be the state of fs.with_different_value(var, new_val)"""
+        old_val = fs.values[var]
+        if old_val == new_val:
+            return cached_state
+        delta = self.fitness_delta(fs, var, new_val, cached_state)
+        classes = self.classes_of_workers[var]
+        cached_state.calendars[classes] += self.pattern_tensor[var, new_val] - self.pattern_tensor[var, old_val]
+        cached_state.class_scores[classes] = self.get_skill_scores_of_calendars(cached_state.calendars[classes])
+        cached_state.fitness += delta
+        return cached_state
+
+
+    def details_of_solution(self, fs: FullSolution):
+        """The minimum and maximum amount of workers for each skill and weekday, where each skill class is calculated once"""
+        calendars = self.get_calendars_of_skills(fs.values.reshape((1, -1)))[0].astype(int)
+        weeks = calendars.reshape((len(self.skill_classes), -1, 7))
+        mins_and_maxs = [list(zip(mins, maxs)) for mins, maxs in zip(np.min(weeks, axis=1), np.max(weeks, axis=1))]
+
+        weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        ranges_for_skills = [[skill] + mins_and_maxs[class_index]
+                             for class_index, skill_class in enumerate(self.skill_classes)
+                             for skill in skill_class]
+        return pd.DataFrame(ranges_for_skills, columns=["Skill"] + weekdays)
 
     def ps_to_properties(self, ps: PS) -> dict:
         cohort = ps_to_cohort(self, ps)
@@ -332,3 +434,58 @@ class EfficientBTProblem(BTProblem):
                                   weights=[1 for _ in range(7)])
 
 
+
+
+def test_skill_classes(amount_of_workers: int = 30, sample_size: int = 500):
+    """
+    Compares the fitnesses and the details of solutions, where the skills with the same workers are grouped in classes,
+    against the same quantities calculated separately for every skill, both with the normal and the faulty range scores
+    """
+    generator = np.random.default_rng(0)
+
+    def random_rota() -> RotaPattern:
+        amount_of_weeks = generator.integers(1, 4)
+        return RotaPattern(7, [WorkDay.working_day(900, 1700) if generator.random() < 0.6 else WorkDay.not_working()
+                               for _ in range(7 * amount_of_weeks)])
+
+    def make_worker(index: int) -> Worker:
+        # most skills are shared by the same workers, so that there are only 3 skill classes for 11 skills
+        skills = {f"SKILL_{s}" for s in (range(0, 6) if index % 3 else range(6, 10))}
+        if index < 4:
+            skills.add("SKILL_EXTRA")
+        return Worker(available_skills=skills,
+                      available_rotas=[random_rota() for _ in range(3)],
+                      name=f"Worker_{index}",
+                      worker_id=f"Worker_{index}")
+
+    workers = [make_worker(index) for index in range(amount_of_workers)]
+
+    for use_faulty_fitness_function in [False, True]:
+        problem = EfficientBTProblem(workers,
+                                     calendar_length=7 * 12,
+                                     use_faulty_fitness_function=use_faulty_fitness_function,
+                                     rota_preference_weight=0.01)
+        print(f"With faulty = {use_faulty_fitness_function}, "
+              f"{len(problem.all_skills)} skills are grouped in {len(problem.skill_classes)} classes")
+
+        def get_control_fitness(fs: FullSolution) -> float:
+            chosen_patterns = problem.get_chosen_patterns_from_fs(fs)
+            rota_score = sum(problem.aggregate_range_scores(problem.get_ranges_for_weekdays_for_skill(chosen_patterns, skill))
+                             for skill in problem.all_skills)
+            return -(rota_score + problem.rota_preference_weight * np.sum(fs.values != 0))
+
+        def details_as_dict(details: pd.DataFrame) -> dict:
+            return {row[0]: [(int(low), int(high)) for low, high in row[1:]]
+                    for row in details.itertuples(index=False)}
+
+        full_solution_matrix = problem.search_space.random_solution_matrix(sample_size)
+        control_fitnesses = np.array([get_control_fitness(FullSolution(row)) for row in full_solution_matrix])
+        experimental_fitnesses = problem.fitness_function_batch(full_solution_matrix)
+        for row, control, experimental in zip(full_solution_matrix, control_fitnesses, experimental_fitnesses):
+            if abs(control - experimental) > 0.000001:
+                print(f"The solution {FullSolution(row)} has a significant error: {control} vs {experimental}")
+
+        for row in full_solution_matrix[:20]:
+            fs = FullSolution(row)
+            if details_as_dict(BTProblem.details_of_solution(problem, fs)) != details_as_dict(problem.details_of_solution(fs)):
+                print(f"The details of {fs} are different")
@@ -3,6 +3,8 @@ import json
 import random
 from typing import TypeAlias, Iterable, Optional
 
+import numpy as np
+
 import utils
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core.FullSolution import FullSolution
@@ -47,9 +49,12 @@ class GraphColouring(BenchmarkProblem):
     amount_of_nodes: int
 
     connections: list[Connection]
+    neighbours: list[np.ndarray]  # the adjacency lists, where each connection appears once (self loops are ignored)
 
     target_pss: Optional[set[PS]]
 
+    has_fitness_delta = True
+
     def __init__(self,
                  amount_of_colours: int,
                  amount_of_nodes: int,
@@ -58,6 +63,12 @@ class GraphColouring(BenchmarkProblem):
         self.amount_of_colours = amount_of_colours
         self.amount_of_nodes = amount_of_nodes
         self.connections = [(a, b) for (a, b) in connections]
+        adjacency = [[] for _ in range(self.amount_of_nodes)]
+        for node_a, node_b in self.connections:
+            if node_a != node_b:
+                adjacency[node_a].append(node_b)
+                adjacency[node_b].append(node_a)
+        self.neighbours = [np.array(adjacent, dtype=int) for adjacent in adjacency]
 
         self.target_pss = target_pss
 
@@ -87,6 +98,16 @@ class GraphColouring(BenchmarkProblem):
         return float(sum([1 for (node_a, node_b) in self.connections
                           if fs.values[node_a] != fs.values[node_b]]))
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        edges = np.array(self.connections, dtype=int).reshape((-1, 2))
+        different_colours = full_solution_matrix[:, edges[:, 0]] != full_solution_matrix[:, edges[:, 1]]
+        return np.sum(different_colours, axis=1).astype(float)
+
+    def fitness_delta(self, fs: FullSolution, var: int, new_val: int, cached_state=None) -> float:
+        """Only the connections of node var can change"""
+        neighbour_colours = fs.values[self.neighbours[var]]
+        return float(np.sum(neighbour_colours != new_val) - np.sum(neighbour_colours != fs.values[var]))
+
     def repr_ps(self, ps: PS) -> str:
         colours = ["red", "green", "blue", "yellow", "purple", "orange", "black", "white", "pink", "brown", "gray",
                    "cyan"]
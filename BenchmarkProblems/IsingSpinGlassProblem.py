@@ -1,5 +1,5 @@
 import json
-from typing import TypeAlias
+from typing import TypeAlias, Optional
 
 import numpy as np
 
@@ -47,6 +47,14 @@ and the left nodes are connected to the right nodes"""
 """
 
 
+class IsingDeltaState:
+    """What IsingSpinGlassProblem.fitness_delta needs to know about the current solution, see get_delta_state"""
+    local_fields: np.ndarray  # for each node, the sum of the spins of its neighbours times the links to them
+
+    def __init__(self, local_fields: np.ndarray):
+        self.local_fields = local_fields
+
+
 class IsingSpinGlassProblem(BenchmarkProblem):
     width: int
     height: int
@@ -56,6 +64,17 @@ class IsingSpinGlassProblem(BenchmarkProblem):
 
     amount_of_variables: int
 
+    # the links as flat arrays: node i is linked to right_neighbours[i] with right_links[i], and likewise for down.
+    right_neighbours: np.ndarray
+    down_neighbours: np.ndarray
+    right_links: np.ndarray
+    down_links: np.ndarray
+    # the 4 neighbours of each node with the links to them (0 for self loops, which don't affect the deltas)
+    neighbours: np.ndarray
+    neighbour_links: np.ndarray
+
+    has_fitness_delta = True
+
     def __init__(self,
                  horizontal_link_values: np.ndarray,
                  vertical_link_values: np.ndarray,
@@ -71,6 +90,23 @@ class IsingSpinGlassProblem(BenchmarkProblem):
 
         search_space = SearchSpace([2 for var in range(self.amount_of_variables)])
         super().__init__(search_space)
+        self.precompute_links()
+
+    def precompute_links(self):
+        """Sets the flat link arrays from horizontal_link_values and vertical_link_values, which should be called if they change"""
+        nodes = np.arange(self.amount_of_variables).reshape((self.height, self.width))
+        self.right_neighbours = np.roll(nodes, -1, axis=1).ravel()
+        self.down_neighbours = np.roll(nodes, -1, axis=0).ravel()
+        self.right_links = np.array(self.horizontal_link_values, dtype=LinkValue).ravel()
+        self.down_links = np.array(self.vertical_link_values, dtype=LinkValue).ravel()
+
+        left_neighbours = np.roll(nodes, 1, axis=1).ravel()
+        up_neighbours = np.roll(nodes, 1, axis=0).ravel()
+        left_links = self.right_links[left_neighbours]
+        up_links = self.down_links[up_neighbours]
+        self.neighbours = np.column_stack([self.right_neighbours, left_neighbours, self.down_neighbours, up_neighbours])
+        self.neighbour_links = np.column_stack([self.right_links, left_links, self.down_links, up_links])
+        self.neighbour_links[self.neighbours == nodes.reshape((-1, 1))] = 0
 
     @classmethod
     def empty(cls, width: int, height: int, best_fitness: int):
@@ -136,6 +172,7 @@ class IsingSpinGlassProblem(BenchmarkProblem):
                 result.set_link_value_left(row, column, values[2])
                 result.set_link_value_right(row, column, values[3])
 
+            result.precompute_links()  # the setters only change horizontal_link_values and vertical_link_values
             return result
 
     @classmethod
@@ -171,22 +208,54 @@ class IsingSpinGlassProblem(BenchmarkProblem):
                 horizontal_links = np.array(data["horizontal_links"], dtype=LinkValue)
                 return cls(horizontal_link_values=horizontal_links,
                            vertical_link_values=vertical_links,
-                           best_fitness=best_fitness)
+                           best_fitness=best_fitness)  # the constructor precomputes the flat link arrays
         except FileExistsError:
             raise Exception(f"The file {filename} could not be written")
 
     def fitness_function(self, fs: FullSolution) -> float:
-        node_values = np.array(fs.values.reshape((self.height, self.width)), dtype=int)
-        node_values[node_values == 0] = -1  # before the values were 0 and 1, now they are -1 and 1
-
-        cycled_left = np.hstack((node_values[:, 1:], node_values[:, :1]))
-        cycled_up = np.vstack((node_values[1:, :], node_values[:1, :]))
+        spins = fs.values * 2 - 1  # before the values were 0 and 1, now they are -1 and 1
 
-        horizontal_differentials = np.sum(node_values * cycled_left * self.horizontal_link_values)
-        vertical_differentials = np.sum(node_values * cycled_up * self.vertical_link_values)
+        horizontal_differentials = np.sum(spins * spins[self.right_neighbours] * self.right_links)
+        vertical_differentials = np.sum(spins * spins[self.down_neighbours] * self.down_links)
 
         return horizontal_differentials + vertical_differentials
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        # the rows are processed in chunks, so that the spins of the neighbours don't use too much memory
+        rows_per_chunk = max(1, 2 ** 22 // (self.amount_of_variables + 1))
+
+        def fitnesses_of_chunk(chunk: np.ndarray) -> np.ndarray:
+            spins = (chunk * 2 - 1).astype(np.int8)
+            return (np.sum(spins * spins[:, self.right_neighbours] * self.right_links, axis=1) +
+                    np.sum(spins * spins[:, self.down_neighbours] * self.down_links, axis=1))
+
+        return np.concatenate([fitnesses_of_chunk(chunk).astype(float)
+                               for chunk in np.array_split(full_solution_matrix,
+                                                           range(rows_per_chunk, len(full_solution_matrix), rows_per_chunk))])
+
+    def get_delta_state(self, fs: FullSolution) -> IsingDeltaState:
+        spins = fs.values * 2 - 1
+        return IsingDeltaState(np.sum(spins[self.neighbours] * self.neighbour_links, axis=1))
+
+    def fitness_delta(self, fs: FullSolution, var: int, new_val: int, cached_state: Optional[IsingDeltaState] = None) -> float:
+        """Only the 4 links of node var can change, so the delta is the change in its spin times its local field"""
+        if fs.values[var] == new_val:
+            return 0.0
+        if cached_state is not None:
+            local_field = cached_state.local_fields[var]
+        else:
+            local_field = np.sum((fs.values[self.neighbours[var]] * 2 - 1) * self.neighbour_links[var])
+        spin = fs.values[var] * 2 - 1
+        return float(-2 * spin * local_field)  # the spin goes from s to -s
+
+    def apply_delta(self, fs: FullSolution, var: int, new_val: int, cached_state: IsingDeltaState) -> IsingDeltaState:
+        """Updates cached_state (in place) to be the state of fs.with_different_value(var, new_val)"""
+        if fs.values[var] == new_val:
+            return cached_state
+        spin_change = -2 * (fs.values[var] * 2 - 1)
+        np.add.at(cached_state.local_fields, self.neighbours[var], self.neighbour_links[var] * spin_change)
+        return cached_state
+
     def repr_ps(self, ps: PS) -> str:
         def repr_cell(cell_value):
             if cell_value == STAR:
@@ -206,3 +275,23 @@ class IsingSpinGlassProblem(BenchmarkProblem):
 
     def get_global_optima_fitness(self) -> float:
         return float(self.global_optima)
+
+
+def test_from_sandys_files(filename: str, sample_size: int = 1000):
+    """Compares the fitnesses of a problem read with from_sandys_files with the formula on the grids of links"""
+    problem = IsingSpinGlassProblem.from_sandys_files(filename)
+
+    def get_control_fitness(fs: FullSolution) -> float:
+        node_values = np.array(fs.values.reshape((problem.height, problem.width)), dtype=int) * 2 - 1
+        cycled_left = np.hstack((node_values[:, 1:], node_values[:, :1]))
+        cycled_up = np.vstack((node_values[1:, :], node_values[:1, :]))
+        return (np.sum(node_values * cycled_left * problem.horizontal_link_values) +
+                np.sum(node_values * cycled_up * problem.vertical_link_values))
+
+    full_solution_matrix = problem.search_space.random_solution_matrix(sample_size)
+    batch_fitnesses = problem.fitness_function_batch(full_solution_matrix)
+    for row, batch_fitness in zip(full_solution_matrix, batch_fitnesses):
+        fs = FullSolution(row)
+        control, single = get_control_fitness(fs), problem.fitness_function(fs)
+        if control != single or control != batch_fitness:
+            print(f"The solution {fs} has different fitnesses: {control} vs {single} vs {batch_fitness}")
@@ -67,6 +67,11 @@ class MultiDimensionalKnapsack(BenchmarkProblem):
         else:
             return float(fitness)
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        gotten = full_solution_matrix @ self.items  # the sum of the metrics for each row, with the manhattan distance
+        fitnesses = -np.sum(np.abs(gotten - self.targets), axis=1).astype(float)
+        return np.where(np.any(gotten > self.targets, axis=1), fitnesses - self.penalty, fitnesses)
+
     def get_worst_fitness(self):
         all_zeros = FullSolution([0 for item in self.items])
         return self.fitness_function(all_zeros)
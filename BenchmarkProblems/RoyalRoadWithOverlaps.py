@@ -55,5 +55,12 @@ class RoyalRoadWithOverlaps(BenchmarkProblem):
     def fitness_function(self, fs: FullSolution) -> float:
         return float(len([ps for ps in self.target_pss if ps.present_in(fs)]))
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        result = np.zeros(len(full_solution_matrix), dtype=float)
+        for ps in self.target_pss:
+            fixed = ps.values != STAR
+            result += np.all(full_solution_matrix[:, fixed] == ps.values[fixed], axis=1)
+        return result
+
     def get_targets(self) -> list[PS]:
         return list(self.target_pss)
@@ -1,5 +1,5 @@
 import json
-from typing import TypeAlias
+from typing import TypeAlias, Optional
 
 import numpy as np
 
@@ -10,6 +10,20 @@ from Core.SearchSpace import SearchSpace
 Clause: TypeAlias = np.ndarray
 
 
+class SATDeltaState:
+    """What SATProblem.fitness_delta needs to know about the current solution, see get_delta_state"""
+    true_counts: np.ndarray  # for each clause, how many of its literals are true
+    true_sums: np.ndarray  # for each clause, the sum of the variables of its true literals (the critical one when there's 1)
+    break_counts: np.ndarray  # for each variable, in how many clauses it's the only true literal
+    make_counts: np.ndarray  # for each variable, in how many unsatisfied clauses it appears
+
+    def __init__(self, true_counts: np.ndarray, true_sums: np.ndarray, break_counts: np.ndarray, make_counts: np.ndarray):
+        self.true_counts = true_counts
+        self.true_sums = true_sums
+        self.break_counts = break_counts
+        self.make_counts = make_counts
+
+
 class SATProblem(BenchmarkProblem):
     amount_of_variables: int
     amount_of_clauses: int
@@ -17,6 +31,20 @@ class SATProblem(BenchmarkProblem):
 
     clauses: list[Clause]
 
+    # the literals of all the clauses in CSR form: the literals of clause k are in [clause_starts[k], clause_starts[k+1]),
+    # and each literal is the variable literal_variables[i], which is true when its value is literal_values[i]
+    clause_starts: np.ndarray
+    literal_variables: np.ndarray
+    literal_values: np.ndarray
+    clause_lengths: np.ndarray
+
+    # the occurrences of each variable, also in CSR form: the occurrences of var are in [occurrence_starts[var], occurrence_starts[var+1])
+    occurrence_starts: np.ndarray
+    occurrence_clauses: np.ndarray
+    occurrence_values: np.ndarray  # the value that makes the literal true
+
+    has_fitness_delta = True
+
     def __init__(self,
                  amount_of_variables: int,
                  amount_of_clauses: int,
@@ -32,6 +60,19 @@ class SATProblem(BenchmarkProblem):
         search_space = SearchSpace([2 for _ in range(self.amount_of_variables)])
         super().__init__(search_space)
 
+        literals = [np.nonzero(clause)[0] for clause in self.clauses]
+        self.clause_lengths = np.array([len(variables) for variables in literals], dtype=int)
+        self.clause_starts = np.concatenate([[0], np.cumsum(self.clause_lengths)]).astype(int)
+        self.literal_variables = np.concatenate([np.zeros(0, dtype=int)] + literals).astype(int)
+        self.literal_values = np.concatenate([np.zeros(0, dtype=int)] + [clause[variables] > 0
+                                                                         for variables, clause in zip(literals, self.clauses)]).astype(int)
+
+        literal_clauses = np.repeat(np.arange(len(self.clauses)), self.clause_lengths)
+        by_variable = np.argsort(self.literal_variables, kind="stable")
+        self.occurrence_starts = np.searchsorted(self.literal_variables[by_variable], np.arange(self.amount_of_variables + 1))
+        self.occurrence_clauses = literal_clauses[by_variable]
+        self.occurrence_values = self.literal_values[by_variable]
+
     def long_repr(self) -> str:
         def repr_var(var_number):
             if var_number < 0:
@@ -157,14 +198,87 @@ class SATProblem(BenchmarkProblem):
         with open(file_location, "w+") as output_file:
             json.dump(result, output_file, indent=4)
 
-    def fitness_function(self, fs: FullSolution) -> float:
-
-        reworked_values = fs.values * 2 - 1  # so that they're +-1
-
-        def clause_is_satisfied(clause: Clause):
-            return any(reworked_values * clause == 1)
+    def get_amounts_of_satisfied_clauses(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        """For each row, how many clauses have at least one true literal (empty clauses are never satisfied)"""
+        literals_are_true = full_solution_matrix[:, self.literal_variables] == self.literal_values
+        non_empty_starts = self.clause_starts[:-1][self.clause_lengths > 0]
+        if len(non_empty_starts) == 0:
+            return np.zeros(len(full_solution_matrix), dtype=int)
+        return np.sum(np.logical_or.reduceat(literals_are_true, non_empty_starts, axis=1), axis=1)
+
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        # the rows are processed in chunks, so that the truth of the literals doesn't use too much memory
+        rows_per_chunk = max(1, 2 ** 22 // (len(self.literal_variables) + 1))
+        return np.concatenate([self.get_amounts_of_satisfied_clauses(chunk).astype(float)
+                               for chunk in np.array_split(full_solution_matrix,
+                                                           range(rows_per_chunk, len(full_solution_matrix), rows_per_chunk))])
 
-        return float(sum(clause_is_satisfied(clause) for clause in self.clauses))
+    def fitness_function(self, fs: FullSolution) -> float:
+        return float(self.fitness_function_batch(fs.values.reshape((1, -1)))[0])
+
+    def get_literals_of_clauses(self, clauses: np.ndarray) -> np.ndarray:
+        """The indices (in literal_variables) of all the literals of the given clauses"""
+        lengths = self.clause_lengths[clauses]
+        offsets = np.arange(np.sum(lengths)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(self.clause_starts[clauses], lengths) + offsets
+
+    def get_delta_state(self, fs: FullSolution) -> SATDeltaState:
+        literals_are_true = fs.values[self.literal_variables] == self.literal_values
+        literal_clauses = np.repeat(np.arange(len(self.clauses)), self.clause_lengths)
+        true_counts = np.bincount(literal_clauses, weights=literals_are_true, minlength=len(self.clauses)).astype(int)
+        true_sums = np.bincount(literal_clauses, weights=literals_are_true * self.literal_variables,
+                                minlength=len(self.clauses)).astype(int)
+        break_counts = np.bincount(true_sums[true_counts == 1], minlength=self.amount_of_variables)
+        make_counts = np.bincount(self.literal_variables[np.repeat(true_counts == 0, self.clause_lengths)],
+                                  minlength=self.amount_of_variables)
+        return SATDeltaState(true_counts, true_sums, break_counts, make_counts)
+
+    def fitness_delta(self, fs: FullSolution, var: int, new_val: int, cached_state: Optional[SATDeltaState] = None) -> float:
+        """
+        Flipping var satisfies the unsatisfied clauses where it appears (make)
+        and unsatisfies those where it's the only true literal (break).
+        Without a cached state, only the clauses where var appears are checked
+        """
+        if new_val == fs.values[var]:
+            return 0.0
+        if cached_state is not None:
+            return float(cached_state.make_counts[var] - cached_state.break_counts[var])
+
+        occurrences = slice(self.occurrence_starts[var], self.occurrence_starts[var + 1])
+        clauses = self.occurrence_clauses[occurrences]
+        was_true = self.occurrence_values[occurrences] == fs.values[var]
+        literals = self.get_literals_of_clauses(clauses)
+        literals_are_true = fs.values[self.literal_variables[literals]] == self.literal_values[literals]
+        true_counts = np.bincount(np.repeat(np.arange(len(clauses)), self.clause_lengths[clauses]),
+                                  weights=literals_are_true, minlength=len(clauses))
+        return float(np.sum(true_counts[~was_true] == 0) - np.sum(true_counts[was_true] == 1))
+
+    def apply_delta(self, fs: FullSolution, var: int, new_val: int, cached_state: SATDeltaState) -> SATDeltaState:
+        """Updates cached_state (in place) to be the state of fs.with_different_value(var, new_val)"""
+        if new_val == fs.values[var]:
+            return cached_state
+        occurrences = slice(self.occurrence_starts[var], self.occurrence_starts[var + 1])
+        clauses = self.occurrence_clauses[occurrences]
+        was_true = self.occurrence_values[occurrences] == fs.values[var]
+        counts = cached_state.true_counts[clauses]
+
+        # the literals of var that become false
+        now_unsatisfied = clauses[was_true & (counts == 1)]
+        cached_state.break_counts[var] -= len(now_unsatisfied)
+        np.add.at(cached_state.make_counts, self.literal_variables[self.get_literals_of_clauses(now_unsatisfied)], 1)
+        now_critical = clauses[was_true & (counts == 2)]
+        np.add.at(cached_state.break_counts, cached_state.true_sums[now_critical] - var, 1)
+
+        # the literals of var that become true
+        now_satisfied = clauses[~was_true & (counts == 0)]
+        np.add.at(cached_state.make_counts, self.literal_variables[self.get_literals_of_clauses(now_satisfied)], -1)
+        cached_state.break_counts[var] += len(now_satisfied)
+        no_longer_critical = clauses[~was_true & (counts == 1)]
+        np.add.at(cached_state.break_counts, cached_state.true_sums[no_longer_critical], -1)
+
+        cached_state.true_counts[clauses] += np.where(was_true, -1, 1)
+        cached_state.true_sums[clauses] += np.where(was_true, -var, var)
+        return cached_state
 
     def __repr__(self):
         return f"SATProblem(#vars = {self.amount_of_variables}, #clauses = {self.amount_of_clauses})"
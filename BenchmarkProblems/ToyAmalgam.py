@@ -83,6 +83,13 @@ class ToyAmalgam(BenchmarkProblem):
         bit_counts = self.get_bit_counts(fs)
         return sum(self.fitness_for_clique_bitcount(bc, problem) for bc, problem in zip(bit_counts, self.problems))
 
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        # table[clique, bitcount] is the fitness of that clique, so the cliques are scored by indexing
+        table = np.array([[self.fitness_for_clique_bitcount(bitcount, problem) for bitcount in range(self.clique_size + 1)]
+                          for problem in self.problems], dtype=float)
+        bit_counts = np.sum(full_solution_matrix.reshape((len(full_solution_matrix), -1, self.clique_size)), axis=2)
+        return np.sum(table[np.arange(len(self.problems)), bit_counts], axis=1)
+
     def __repr__(self):
         return f"ToyAmalgam({''.join(f'{p}' for p in self.problems)}, clique size = {self.clique_size}"
 
@@ -11,6 +11,9 @@ class UnitaryProblem(BenchmarkProblem):
     """ This interface represents all problems where """
     amount_of_cliques: int
     clique_size: int
+    unitary_table: np.ndarray  # see get_unitary_table
+
+    has_fitness_delta = True
 
     def __init__(self,
                  amount_of_cliques: int,
@@ -19,6 +22,7 @@ class UnitaryProblem(BenchmarkProblem):
         self.clique_size = clique_size
         search_space = SearchSpace([2 for _ in range(self.amount_of_bits)])
         super().__init__(search_space)
+        self.unitary_table = self.get_unitary_table()
 
     def get_bit_counts(self, full_solution: FullSolution) -> ArrayOfInts:
         bits = full_solution.values.reshape((-1, self.clique_size))
@@ -47,6 +51,22 @@ class UnitaryProblem(BenchmarkProblem):
     def fitness_function(self, full_solution: FullSolution) -> float:
         return sum(self.unitary_function(bc, self.clique_size) for bc in self.get_bit_counts(full_solution))
 
+    def get_unitary_table(self) -> np.ndarray:
+        """The fitness of a clique for each possible bitcount, so that the cliques can be scored by indexing"""
+        return np.array([self.unitary_function(bitcount, self.clique_size) for bitcount in range(self.clique_size + 1)],
+                        dtype=float)
+
+    def fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        bit_counts = np.sum(full_solution_matrix.reshape((len(full_solution_matrix), -1, self.clique_size)), axis=2)
+        return np.sum(self.unitary_table[bit_counts], axis=1)
+
+    def fitness_delta(self, fs: FullSolution, var: int, new_val: int, cached_state=None) -> float:
+        """Only the clique of var is counted again"""
+        clique_start = (var // self.clique_size) * self.clique_size
+        old_bitcount = int(np.sum(fs.values[clique_start:clique_start + self.clique_size]))
+        new_bitcount = old_bitcount - fs.values[var] + new_val
+        return float(self.unitary_table[new_bitcount] - self.unitary_table[old_bitcount])
+
     def get_problem_name(self) -> str:
         raise Exception(
             "An implementation of UnitaryProblem does not implement get_problem_name, which is used in __repr__")
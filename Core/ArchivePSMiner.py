@@ -1,32 +1,50 @@
-import heapq
+import copy
 import json
+import pickle
 import warnings
-from typing import Optional, TypeAlias
+from math import ceil
+from typing import Optional, TypeAlias, Iterator
 
 import numpy as np
 
 import utils
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core.EvaluatedPS import EvaluatedPS
+from Core.Fidelity import FidelitySchedule, StratifiedSubsample
 from Core.PRef import PRef
+from Core.ParallelPSEvaluator import ParallelPSEvaluator
 from Core.PS import PS
 from Core.PSMetric.Atomicity import Atomicity
 from Core.PSMetric.MeanFitness import MeanFitness
 from Core.PSMetric.Metric import Metric
+from Core.PSMetric.Racing import Racing
 from Core.PSMetric.Simplicity import Simplicity
+from Core.PSPopulation import PSPopulation, PSArchive
 from Core.SearchSpace import SearchSpace
+from Core.SupportIndex import SupportIndex
 from Core.TerminationCriteria import TerminationCriteria, PSEvaluationLimit, IterationLimit
 from Core.get_init import just_empty
 from Core.get_local import specialisations
-from Core.selection import truncation_selection
-from FSStochasticSearch.GA import GA
+from Core.selection import truncation_selection, as_index_based_selection
+from FSStochasticSearch.VectorGA import VectorGA
 from FSStochasticSearch.Operators import SinglePointFSMutation, TwoPointFSCrossover, TournamentSelection
 from PSMiners.AbstractPSMiner import AbstractPSMiner
+from PSMiners.Checkpoint import Checkpointer, CheckpointState, get_rng_state, set_rng_state, from_bytes_array, \
+    pRef_to_checkpoint_state, pRef_from_checkpoint_state, load_checkpoint
 
 Population: TypeAlias = list[EvaluatedPS]
 GetInitType: TypeAlias = [[PRef, Optional[int]], list[PS]]
 GetLocalType: TypeAlias = [[PS, SearchSpace], list[PS]]
-SelectionType: TypeAlias = [[list[EvaluatedPS], int], list[EvaluatedPS]]
+SelectionType: TypeAlias = [[np.ndarray, int], np.ndarray]  # from the aggregated scores to the selected indices
+
+
+def get_aggregated_scores(metric_scores: np.ndarray, metrics: list[Metric]) -> np.ndarray:
+    """Each metric (except for MeanFitness) is remapped to be in [0, 1] within the population, and then they are averaged"""
+    metric_matrix = metric_scores.copy()
+    for column in range(metric_matrix.shape[1]):
+        if not isinstance(metrics[column], MeanFitness):
+            metric_matrix[:, column] = utils.remap_array_in_zero_one(metric_matrix[:, column])
+    return np.average(metric_matrix, axis=1)
 
 
 class ArchivePSMiner(AbstractPSMiner):
@@ -41,10 +59,30 @@ class ArchivePSMiner(AbstractPSMiner):
 
     selection: SelectionType  # the selection operator
 
-    current_population: list[EvaluatedPS]
-    archive: set[EvaluatedPS]  # the archive, which will contain all the selected PSs
-
-    used_evaluations: int  # counts how many F_\psi evaluations have happened
+    current_population: PSPopulation  # the genomes and metrics are stored as arrays, see PSPopulation
+    archive: PSArchive  # the archive, which will contain all the selected PSs
+
+    used_evaluations: int  # counts how many F_\psi evaluations have happened (weighted by their fidelity, rounded up)
+    iterations: int
+    parallel_evaluator: Optional[ParallelPSEvaluator]  # if present, the metrics are calculated by worker processes
+    configuration: tuple  # the metrics (copied before set_pRef) and the operators, stored in the checkpoints
+    pickled_configuration: Optional[bytes]  # only pickled when it's needed, see get_pickled_configuration
+    min_support: int  # unevaluated individuals with fewer observations than this are discarded without evaluating them
+    support_index: Optional[SupportIndex]
+
+    # when a fidelity schedule is given, the early iterations use copies of the metrics on a subsample of the PRef,
+    # and the selected individuals are evaluated again using the full PRef before entering the archive
+    fidelity_schedule: Optional[FidelitySchedule]
+    subsample: Optional[StratifiedSubsample]
+    low_fidelity_metrics: Optional[list[Metric]]
+    fidelity: float  # the fraction of the PRef that low_fidelity_metrics are using
+
+    # when the MeanFitness metric has a Racing, the mean fitness of a new individual is raced against the lowest value
+    # that could let it survive the next truncation, and if it's clearly below that the individual is discarded.
+    racing_column: Optional[int]
+    cutoff_score: Optional[float]  # the aggregated score of the worst individual after the last truncation
+    cutoff_ranges: Optional[np.ndarray]  # the min and max of each metric after the last truncation, one row each
+    raced_out: int  # how many individuals were discarded by racing
 
     def __init__(self,
                  pRef: PRef,
@@ -52,24 +90,57 @@ class ArchivePSMiner(AbstractPSMiner):
                  get_init: GetInitType,
                  get_local: GetLocalType,
                  population_size: int,
-                 selection: SelectionType):
+                 selection: SelectionType,
+                 workers: Optional[int] = None,
+                 starting_population: Optional[PSPopulation] = None,
+                 min_support: int = 0,
+                 fidelity_schedule: Optional[FidelitySchedule] = None):
         super().__init__(pRef)
         self.used_evaluations = 0
+        self.iterations = 0
+        self.min_support = min_support
+        self.support_index = SupportIndex(pRef) if min_support > 0 else None
 
         self.pRef = pRef
         self.metrics = metrics
+        self.configuration = (copy.deepcopy(metrics), get_init, get_local, selection)
+        self.pickled_configuration = None
+
+        self.parallel_evaluator = None
+        if workers is not None and workers > 1:  # the workers receive the metrics before set_pRef is called on them
+            self.parallel_evaluator = ParallelPSEvaluator(pRef=self.pRef, metrics=self.metrics, workers=workers)
+
+        # the workers calculate the exact metrics, so racing is not used with them
+        racing_columns = [column for column, metric in enumerate(self.metrics)
+                          if isinstance(metric, MeanFitness) and metric.racing is not None]
+        self.racing_column = racing_columns[0] if len(racing_columns) > 0 and self.parallel_evaluator is None else None
+        self.cutoff_score = None
+        self.cutoff_ranges = None
+        self.raced_out = 0
 
         for metric in self.metrics:
             metric.set_pRef(self.pRef)
 
+        if fidelity_schedule is not None and self.parallel_evaluator is not None:
+            raise Exception("ArchivePSMiner can't use a fidelity schedule with workers, since they use the full PRef")
+        self.fidelity_schedule = fidelity_schedule
+        self.subsample = None if fidelity_schedule is None else fidelity_schedule.get_subsample(self.pRef)
+        self.low_fidelity_metrics = None if fidelity_schedule is None else copy.deepcopy(self.configuration[0])
+        self.fidelity = 1.0
+        self.update_fidelity()
+
         self.get_init = get_init
         self.get_local = get_local
-        self.selection = selection
+        self.selection = as_index_based_selection(selection)  # the list based operators are translated, the unknown ones rejected
         self.population_size = population_size
 
-        self.current_population = [EvaluatedPS(ps) for ps in self.get_init(self.pRef, quantity=self.population_size)]
+        if starting_population is None:
+            starting_population = PSPopulation.from_pss(self.get_init(self.pRef, quantity=self.population_size),
+                                                        search_space=self.search_space,
+                                                        amount_of_metrics=len(self.metrics))
+        self.current_population = starting_population
         self.current_population = self.evaluate_individuals(self.current_population)  # experimental
-        self.archive = set()
+        self.archive = PSArchive(self.search_space, amount_of_metrics=len(self.metrics))
 
     def __repr__(self):
         return f"PSMiner(population_size = {self.population_size})"
@@ -78,7 +149,7 @@ class ArchivePSMiner(AbstractPSMiner):
     def search_space(self):
         return self.pRef.search_space
 
-    def with_aggregated_scores(self, population: list[EvaluatedPS]) -> list[EvaluatedPS]:
+    def with_aggregated_scores(self, population: PSPopulation) -> PSPopulation:
         """
         This is kinda the fitness function of PSs, where we
          - remap every metric between individuals, to be in range[0, 1]
@@ -86,75 +157,244 @@ class ArchivePSMiner(AbstractPSMiner):
 
          Note that the final fitnesses are RELATIVE to the population, which is why the algorithm is quite slow
         :param population: the population, where ALL of the metrics are assumed to have been calculated
-        :return: population: the same population, but now .aggregated_score is a valid value
+        :return: population: the same population, but now .aggregated_scores is valid
         """
-        metric_matrix = np.array([ind.metric_scores for ind in population])
-        for column in range(metric_matrix.shape[1]):
-            if not isinstance(self.metrics[column], MeanFitness):
-                metric_matrix[:, column] = utils.remap_array_in_zero_one(metric_matrix[:, column])
+        if len(population) == 0:
+            return population
+        population.aggregated_scores = get_aggregated_scores(population.metric_scores, self.metrics)
+        return population
 
-        averages = np.average(metric_matrix, axis=1)
-        for individual, score in zip(population, averages):
-            individual.aggregated_score = score
+    @property
+    def current_metrics(self) -> list[Metric]:
+        """The metrics used to evaluate the population, which use a subsample of the PRef in the early iterations"""
+        return self.metrics if self.fidelity >= 1 else self.low_fidelity_metrics
 
+    def update_fidelity(self):
+        """
+        Sets the fidelity for the current iteration. Note that the population is not evaluated again:
+        the metrics are estimated on a subsample which keeps the fitness distribution, so their values remain comparable
+        """
+        if self.fidelity_schedule is None:
+            return
+        fidelity = self.fidelity_schedule.fraction_at(self.iterations)
+        if fidelity != self.fidelity and fidelity < 1:
+            for metric in self.low_fidelity_metrics:
+                metric.set_pRef(self.subsample.get_pRef(fidelity))
+        self.fidelity = fidelity
+
+    def add_evaluation_cost(self, amount_of_evaluations: int):
+        self.used_evaluations += ceil(amount_of_evaluations * self.fidelity)
+
+    def with_full_fidelity(self, population: PSPopulation) -> PSPopulation:
+        """Evaluates the population again using the full PRef, unless that's what it was evaluated with already"""
+        if self.fidelity >= 1:
+            return population
+        for index in range(len(population)):
+            individual = population.ps_at(index)
+            population.metric_scores[index] = [metric.get_single_score(individual) for metric in self.metrics]
+        self.used_evaluations += len(population)
         return population
 
-    def step(self):
-        """ The contents of the main loop"""
+    def step(self, max_evaluations: Optional[int] = None) -> PSPopulation:
+        """
+        The contents of the main loop, where at most max_evaluations new individuals will be evaluated.
+        Returns the individuals that were added to the archive
+        """
+        self.update_fidelity()
 
-        self.current_population = self.without_duplicates(self.current_population)
+        self.current_population = self.current_population.without_duplicates()
 
         # aggregate the various objectives into a single score
         self.current_population = self.with_aggregated_scores(self.current_population)
         # truncate population
-        self.current_population = self.top(n=self.population_size, population=self.current_population)
+        self.current_population = self.current_population.top(n=self.population_size)
+        self.update_cutoff()
 
         # select parents
-        parents = self.selection(self.current_population, self.population_size // 3)
-        parents = self.without_duplicates(parents)
+        selected = self.selection(self.current_population.aggregated_scores, self.population_size // 3)
+        parents = self.current_population.subset(selected).without_duplicates()
 
         # get offspring
-        children = [EvaluatedPS(child) for parent in parents for child in parent.specialisations(self.search_space)]
+        children = parents.specialisations(self.search_space)
 
-        # add selected individuals to archive
-        self.archive.update(parents)
+        # add selected individuals to archive, always evaluated on the full PRef
+        unarchived_parents = parents.subset(~self.archive.contains(parents))
+        if max_evaluations is not None and self.fidelity < 1:
+            max_evaluations = max(max_evaluations - len(unarchived_parents), 0)
+        newly_archived = self.archive.add(self.with_full_fidelity(unarchived_parents))
 
-        self.current_population.extend(children)
+        # children that are already in the population are removed here, so that they are not evaluated again
+        self.current_population = PSPopulation.concatenate([self.current_population, children]).without_duplicates()
 
         # remove from population the individuals that appear in the archive (including the parents]
-        self.current_population = [ind for ind in self.current_population if ind not in self.archive]
+        self.current_population = self.current_population.subset(~self.archive.contains(self.current_population))
+
+        self.current_population = self.evaluate_individuals(self.current_population, max_evaluations)
+        return newly_archived
 
-        self.current_population = self.evaluate_individuals(self.current_population)
+    def update_cutoff(self):
+        """Stores what the new individuals need to beat to survive truncation, which is only known when the population is full"""
+        if self.racing_column is None or len(self.current_population) < self.population_size:
+            self.cutoff_score = None
+            return
+        self.cutoff_score = float(np.min(self.current_population.aggregated_scores))
+        scores = self.current_population.metric_scores
+        self.cutoff_ranges = np.array([np.min(scores, axis=0), np.max(scores, axis=0)])
 
-    def evaluate_individuals(self, newborns: Population) -> Population:
+    def get_racing_threshold(self, metric_scores: np.ndarray) -> float:
+        """
+        The lowest mean fitness that an individual could have and still reach the cut-off aggregated score,
+        where its other metrics are remapped using the ranges of the last truncated population (clipped to [0, 1]),
+        and the ones that are not calculated yet (NaN) are assumed to be the best in the population.
+        This is an approximation, since the ranges change when the new individuals are added to the population
+        """
+        best_others = 0.0
+        for column, value in enumerate(metric_scores):
+            if column == self.racing_column:
+                continue
+            low, high = self.cutoff_ranges[:, column]
+            if np.isnan(value) or high <= low:
+                best_others += 1.0
+            elif isinstance(self.current_metrics[column], MeanFitness):
+                best_others += value
+            else:
+                best_others += float(np.clip((value - low) / (high - low), 0, 1))
+        return len(self.metrics) * self.cutoff_score - best_others
+
+    def evaluate_individuals(self, newborns: PSPopulation, max_evaluations: Optional[int] = None) -> PSPopulation:
         """
         Calculates the metrics for each individual, but this is not the true fitness function!
         These metrics are ABSOLUTE, ie they are not relative to the population, although they are relative to the PRef.
         :param newborns: the individuals to be evaluated
+        :param max_evaluations: if there are more unevaluated individuals than this, the excess ones are removed
         :return: the same individuals as the input, but now .metric_scores will be valid
+                 (the unevaluated individuals without enough support are removed, and they don't use up the budget)
         """
-        for individual in newborns:
-            if individual.metric_scores is None:  # avoid recalculating if already valid
-                individual.metric_scores = [metric.get_single_score(individual) for metric in self.metrics]
-                self.used_evaluations += 1
-        return newborns
+        is_unevaluated = ~newborns.is_evaluated
+        if self.support_index is not None:
+            is_unobservable = is_unevaluated & ~self.support_index.has_enough_support(newborns.genomes, self.min_support)
+            newborns = newborns.subset(~is_unobservable)
+            is_unevaluated = is_unevaluated[~is_unobservable]
+
+        to_evaluate = np.nonzero(is_unevaluated)[0]  # avoid recalculating if already valid
+        if max_evaluations is not None:  # the budget is in full fidelity evaluations
+            max_evaluations = int(max_evaluations / self.fidelity)
+        if max_evaluations is not None and len(to_evaluate) > max_evaluations:
+            newborns = newborns.subset(np.setdiff1d(np.arange(len(newborns)), to_evaluate[max_evaluations:]))
+            to_evaluate = to_evaluate[:max_evaluations]
+
+        raced_out = np.zeros(len(newborns), dtype=bool)
+        if self.parallel_evaluator is not None:
+            newborns.metric_scores[to_evaluate] = self.parallel_evaluator.evaluate(newborns.genomes[to_evaluate])
+        else:
+            for index in to_evaluate:
+                individual = newborns.ps_at(index)
+                # the metrics before MeanFitness (usually Simplicity) help racing, the ones after it are NaN when racing
+                for column, metric in enumerate(self.current_metrics):
+                    if column == self.racing_column and self.cutoff_score is not None:
+                        result = metric.get_racing_estimate(individual, self.get_racing_threshold(newborns.metric_scores[index]))
+                        if result.decision < 0:
+                            raced_out[index] = True
+                            break
+                        if result.is_exact:  # all the observations were seen, so there's no need to calculate it again
+                            newborns.metric_scores[index, column] = result.estimate
+                            continue
+                    newborns.metric_scores[index, column] = metric.get_single_score(individual)
+        self.add_evaluation_cost(len(to_evaluate))
+        self.raced_out += int(np.sum(raced_out))
+        return newborns.subset(~raced_out)
+
+    def close(self):
+        """Stops the worker processes, if there are any"""
+        if self.parallel_evaluator is not None:
+            self.parallel_evaluator.close()
+            self.parallel_evaluator = None
 
     def get_used_evaluations(self) -> int:
         return self.used_evaluations
 
-    def run(self, termination_criteria: TerminationCriteria, verbose=False):
+    def run(self,
+            termination_criteria: TerminationCriteria,
+            verbose=False,
+            checkpointer: Optional[Checkpointer] = None):
         """ Executes the main loop, with the termination criterion usually being an evaluation budget"""
-        iterations = 0
-
+        for _ in self.run_iter(termination_criteria, verbose=verbose, checkpointer=checkpointer):
+            pass
+
+    def run_iter(self,
+                 termination_criteria: TerminationCriteria,
+                 verbose=False,
+                 checkpointer: Optional[Checkpointer] = None) -> Iterator[list[EvaluatedPS]]:
+        """Executes the main loop like .run, yielding the individuals that enter the archive at each iteration"""
+        if checkpointer is not None:
+            self.get_pickled_configuration()  # so that it fails before the run if the checkpoints can't be written
         def should_terminate():
-            return termination_criteria.met(iterations=iterations,
+            return termination_criteria.met(iterations=self.iterations,
                                             ps_evaluations=self.get_used_evaluations()) or len(self.current_population) == 0
 
         while not should_terminate():
-            self.step()
+            newly_archived = self.step(max_evaluations=termination_criteria.remaining_ps_evaluations(self.get_used_evaluations()))
             if verbose:
                 print(f"Current used budget is {self.used_evaluations}")
-            iterations += 1
+            self.iterations += 1
+            if checkpointer is not None and checkpointer.should_write(self.iterations):
+                checkpointer.write_in_background(self.get_checkpoint_state())
+            if len(newly_archived) > 0:
+                yield self.publish_results(newly_archived.to_evaluated_pss())
+
+        if checkpointer is not None:
+            checkpointer.write_in_background(self.get_checkpoint_state())
+            checkpointer.wait()
+
+    def get_pickled_configuration(self) -> bytes:
+        """The metrics and the operators as stored in the checkpoints, pickled the first time they're needed"""
+        if self.pickled_configuration is None:
+            try:
+                self.pickled_configuration = pickle.dumps(self.configuration)
+            except (pickle.PicklingError, AttributeError, TypeError) as error:
+                raise Exception(f"The configuration of the ArchivePSMiner can't be stored in a checkpoint, "
+                                f"because the metrics and the operators (get_init, get_local, selection) must be picklable, "
+                                f"which excludes lambdas and local functions: {error}")
+        return self.pickled_configuration
+
+    def get_checkpoint_state(self) -> CheckpointState:
+        """A copy of everything that is needed to continue the run, see resume_from"""
+        archive = self.archive.as_population()
+        return {"miner": np.array("ArchivePSMiner"),
+                "population_genomes": self.current_population.genomes.copy(),
+                "population_metric_scores": self.current_population.metric_scores.copy(),
+                "archive_genomes": archive.genomes.copy(),
+                "archive_metric_scores": archive.metric_scores.copy(),
+                "used_evaluations": np.array(self.used_evaluations),
+                "iterations": np.array(self.iterations),
+                "population_size": np.array(self.population_size),
+                "min_support": np.array(self.min_support),
+                "fidelity_schedule": np.zeros(0) if self.fidelity_schedule is None else self.fidelity_schedule.to_array(),
+                "configuration": np.frombuffer(self.get_pickled_configuration(), dtype=np.uint8),
+                "rng_state": get_rng_state(),
+                **pRef_to_checkpoint_state(self.pRef)}
+
+    @classmethod
+    def resume_from(cls, checkpoint: str, workers: Optional[int] = None):
+        """Constructs the miner from a checkpoint file, and calling .run will continue where the checkpoint was taken"""
+        state = load_checkpoint(checkpoint, expected_miner="ArchivePSMiner")
+        metrics, get_init, get_local, selection = from_bytes_array(state["configuration"])
+        miner = cls(pRef=pRef_from_checkpoint_state(state),
+                    metrics=metrics,
+                    get_init=get_init,
+                    get_local=get_local,
+                    population_size=int(state["population_size"]),
+                    selection=selection,
+                    workers=workers,
+                    starting_population=PSPopulation(state["population_genomes"], state["population_metric_scores"]),
+                    min_support=int(state["min_support"]),
+                    fidelity_schedule=None if len(state["fidelity_schedule"]) == 0
+                                      else FidelitySchedule.from_array(state["fidelity_schedule"]))
+        miner.archive.add(PSPopulation(state["archive_genomes"], state["archive_metric_scores"]))
+        miner.used_evaluations = int(state["used_evaluations"])
+        miner.iterations = int(state["iterations"])
+        set_rng_state(state["rng_state"])
+        return miner
 
     def get_results(self, amount: Optional[int]) -> list[EvaluatedPS]:
         """
@@ -166,33 +406,34 @@ class ArchivePSMiner(AbstractPSMiner):
         """
         if amount is None:
             amount = len(self.archive)
-        evaluated_archive = self.with_aggregated_scores(list(self.archive))
-        return self.top(n=amount, population=evaluated_archive)
-
-    @staticmethod
-    def top(n: int, population: Population) -> Population:
-        """ Same as in the paper, very straightforward"""
-        return heapq.nlargest(n=n, iterable=population)
-
-    @staticmethod
-    def without_duplicates(population: Population) -> Population:
-        return list(set(population))
+        evaluated_archive = self.with_aggregated_scores(self.archive.as_population())
+        best = evaluated_archive.top(n=amount).sorted_by_aggregated_score()
+        return best.to_evaluated_pss()
 
     @classmethod
-    def with_default_settings(cls, pRef: PRef):
+    def with_default_settings(cls, pRef: PRef,
+                              workers: Optional[int] = None,
+                              min_support: int = 0,
+                              fidelity_schedule: Optional[FidelitySchedule] = None,
+                              racing: Optional[Racing] = None):
         """ atomicity can be measured in many many ways, and the paper suggest an approach that I've improved over time"""
         """The function defined in the paper uses Atomicity(), but you should also try:
             - Linkage(): faster
             - BivariateLocalPerturbation(): much more accurate, but sloooow
             - BivariateANOVALinkage(): slow but more mathematically sound
             
+        When racing is given, the new individuals which clearly can't survive truncation are discarded
+        after looking at a part of their observations, see Racing.
         """
         return cls(population_size=300,
                    pRef=pRef,
-                   metrics=[Simplicity(), MeanFitness(), Atomicity()],
+                   metrics=[Simplicity(), MeanFitness(racing=racing), Atomicity()],
                    get_init=just_empty,
                    get_local=specialisations,
-                   selection=truncation_selection)
+                   selection=truncation_selection,
+                   workers=workers,
+                   min_support=min_support,
+                   fidelity_schedule=fidelity_schedule)
 
 
 
@@ -205,15 +446,15 @@ def measure_T2_success_rate(benchmark_problem:BenchmarkProblem):
     generations_to_evolve_for = list(range(0, 5, 5))
     budget = 10**5
 
-    ga = GA(search_space=benchmark_problem.search_space,
-            mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
-            crossover_operator=TwoPointFSCrossover(),
-            selection_operator=TournamentSelection(),
-            crossover_rate=0.5,
-            elite_proportion=3,
-            tournament_size=3,
-            population_size=pRef_size,
-            fitness_function=benchmark_problem.fitness_function)
+    ga = VectorGA(search_space=benchmark_problem.search_space,
+                  mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
+                  crossover_operator=TwoPointFSCrossover(),
+                  selection_operator=TournamentSelection(),
+                  crossover_rate=0.5,
+                  elite_proportion=3,
+                  tournament_size=3,
+                  population_size=pRef_size,
+                  fitness_function=benchmark_problem.fitness_function)
 
     total_generations = 0
 
@@ -221,11 +462,7 @@ def measure_T2_success_rate(benchmark_problem:BenchmarkProblem):
         generations_to_execute = next_generation - total_generations
         termination_criterion = IterationLimit(generations_to_execute)
         ga.run(termination_criterion)
-        population = ga.current_population
-        solutions, fitnesses = utils.unzip([(ind.full_solution, ind.fitness) for ind in population])
-        return PRef.from_full_solutions(full_solutions=solutions,
-                                        fitness_values=fitnesses,
-                                        search_space=benchmark_problem.search_space)
+        return ga.get_current_pRef()
 
 
     targets = benchmark_problem.get_targets()
@@ -1,45 +1,153 @@
-from typing import TypeAlias, Callable
+import time
+from typing import TypeAlias, Callable, Optional, Any
+
+import numpy as np
 
 from Core.EvaluatedFS import EvaluatedFS
+from Core.FitnessCache import FitnessCache
 from Core.FullSolution import FullSolution
 from Core.PRef import PRef
+from Core.ParallelFSEvaluator import ParallelFSEvaluator
 from Core.SearchSpace import SearchSpace
 
 Fitness: TypeAlias = float
 FitnessFunction: TypeAlias = Callable[[FullSolution], Fitness]
+BatchFitnessFunction: TypeAlias = Callable[[np.ndarray], np.ndarray]  # from a matrix of full solutions to their fitnesses
 
 
 class FSEvaluator:
     _fitness_function: FitnessFunction
+    _fitness_function_batch: BatchFitnessFunction
+    delta_problem: Optional[Any]  # the BenchmarkProblem whose fitness_delta is used, see evaluate_delta
+    cache: Optional[FitnessCache]
+    executor: Optional[ParallelFSEvaluator]
     used_evaluations: int
 
     def __init__(self,
-                 fitness_function: FitnessFunction):
+                 fitness_function: FitnessFunction,
+                 fitness_function_batch: Optional[BatchFitnessFunction] = None,
+                 cache: Optional[FitnessCache] = None,
+                 executor: Optional[ParallelFSEvaluator] = None):
+        """
+        When fitness_function_batch is not given and fitness_function is the method of a BenchmarkProblem
+        (eg problem.fitness_function), the fitness_function_batch of the same problem is used.
+        Similarly, the fitness_delta of that problem is used when it has one.
+        When a cache is given, evaluate and evaluate_batch only call the fitness function for the solutions not in it
+        (the deltas are not cached, since they are cheap already).
+        When an executor is given, evaluate_batch (and so the methods that use it) evaluates the rows in its worker processes,
+        which should have the same fitness function.
+        """
         self._fitness_function = fitness_function
+        self.cache = cache
+        self.executor = executor
+        owner = getattr(fitness_function, "__self__", None)
+        self.delta_problem = owner if getattr(owner, "has_fitness_delta", False) else None
+        if fitness_function_batch is None:
+            fitness_function_batch = getattr(owner, "fitness_function_batch", None)
+        if fitness_function_batch is None:
+            def fitness_function_batch(full_solution_matrix: np.ndarray) -> np.ndarray:
+                return np.array([fitness_function(FullSolution(row)) for row in full_solution_matrix], dtype=float)
+        self._fitness_function_batch = fitness_function_batch
         self.used_evaluations = 0
 
     def evaluate(self, fs: FullSolution) -> Fitness:
+        if self.cache is None:
+            self.used_evaluations += 1
+            return self._fitness_function(fs)
+
+        key = self.cache.get_keys(fs.values.reshape((1, -1)))[0]
+        fitness = self.cache.get(key)
+        if fitness is not None:
+            self.used_evaluations += int(self.cache.count_hits_as_evaluations)
+            return fitness
         self.used_evaluations += 1
-        return self._fitness_function(fs)
+        start = time.perf_counter()
+        fitness = self._fitness_function(fs)
+        self.cache.evaluation_time += time.perf_counter() - start
+        self.cache.put(key, fitness)
+        return fitness
+
+    def evaluate_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        """The fitnesses of the rows of the matrix, where each row counts as an evaluation (see FitnessCache for the hits)"""
+        if len(full_solution_matrix) == 0:
+            return np.zeros(0, dtype=float)
+        if self.cache is None:
+            self.used_evaluations += len(full_solution_matrix)
+            return self.call_fitness_function_batch(full_solution_matrix)
+
+        # the rows that are repeated within the matrix are only evaluated once, and the repetitions count as hits
+        keys = self.cache.get_keys(full_solution_matrix)
+        fitnesses = np.zeros(len(keys), dtype=float)
+        is_known = np.zeros(len(keys), dtype=bool)
+        rows_to_evaluate = {}  # key -> index of its first row
+        for index, key in enumerate(keys):
+            if key in rows_to_evaluate:
+                self.cache.hits += 1
+                continue
+            fitness = self.cache.get(key)
+            if fitness is None:
+                rows_to_evaluate[key] = index
+            else:
+                fitnesses[index] = fitness
+                is_known[index] = True
+
+        amount_of_hits = len(keys) - len(rows_to_evaluate)
+        self.used_evaluations += len(rows_to_evaluate) + amount_of_hits * int(self.cache.count_hits_as_evaluations)
+        if len(rows_to_evaluate) > 0:
+            start = time.perf_counter()
+            new_fitnesses = self.call_fitness_function_batch(full_solution_matrix[list(rows_to_evaluate.values())])
+            self.cache.evaluation_time += time.perf_counter() - start
+            fitness_of_key = dict(zip(rows_to_evaluate.keys(), new_fitnesses))
+            for key, fitness in fitness_of_key.items():
+                self.cache.put(key, float(fitness))
+            for index in np.nonzero(~is_known)[0]:
+                fitnesses[index] = fitness_of_key[keys[index]]
+        return fitnesses
+
+    def call_fitness_function_batch(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        """Without counting the evaluations or using the cache"""
+        if self.executor is not None:
+            return self.executor.evaluate(full_solution_matrix)
+        return np.asarray(self._fitness_function_batch(full_solution_matrix), dtype=float)
+
+    @property
+    def supports_fitness_delta(self) -> bool:
+        return self.delta_problem is not None
+
+    def get_delta_state(self, fs: FullSolution):
+        return self.delta_problem.get_delta_state(fs)
+
+    def evaluate_delta(self, fs: FullSolution, var: int, new_val: int, cached_state) -> Fitness:
+        """How much the fitness changes when var is set to new_val, which counts as an evaluation"""
+        self.used_evaluations += 1
+        return self.delta_problem.fitness_delta(fs, var, new_val, cached_state)
+
+    def apply_delta(self, fs: FullSolution, var: int, new_val: int, cached_state):
+        return self.delta_problem.apply_delta(fs, var, new_val, cached_state)
 
     def evaluate_population(self, population: list[EvaluatedFS]) -> list[EvaluatedFS]:
-        for individual in population:
-            individual.fitness = self.evaluate(individual.full_solution)
+        if len(population) == 0:
+            return population
+        fitnesses = self.evaluate_batch(np.array([individual.full_solution.values for individual in population]))
+        for individual, fitness in zip(population, fitnesses):
+            individual.fitness = float(fitness)
         return population
 
     def generate_pRef_from_full_solutions(self,
                                           search_space: SearchSpace,
                                           samples: list[FullSolution]) -> PRef:
-        fitnesses = [self.evaluate(sample) for sample in samples]
-        return PRef.from_full_solutions(full_solutions=samples,
-                                        fitness_values=fitnesses,
-                                        search_space=search_space)
+        full_solution_matrix = np.array([sample.values for sample in samples])
+        return PRef(fitness_array=self.evaluate_batch(full_solution_matrix),
+                    full_solution_matrix=full_solution_matrix,
+                    search_space=search_space)
 
     def generate_pRef_from_search_space(self,
                                         search_space: SearchSpace,
                                         amount_of_samples: int) -> PRef:
-        samples = [FullSolution.random(search_space) for _ in range(amount_of_samples)]
-        return self.generate_pRef_from_full_solutions(search_space, samples)
+        full_solution_matrix = search_space.random_solution_matrix(amount_of_samples)
+        return PRef(fitness_array=self.evaluate_batch(full_solution_matrix),
+                    full_solution_matrix=full_solution_matrix,
+                    search_space=search_space)
 
     def __repr__(self):
         return f"FS Evaluator, used_budget = {self.used_evaluations}"
@@ -0,0 +1,85 @@
+"""
+Multi-fidelity evaluation: in the early iterations of a miner most of the PSs are discarded,
+so they can be scored against a small subsample of the PRef, and the full PRef is used later on.
+
+The subsample is stratified by fitness, so that it keeps the distribution of the fitnesses:
+the rows are sorted by fitness and split into strata, and each stratum is shuffled once.
+The subsample for a fraction f takes the first ceil(f * size) rows of each stratum,
+which means that the subsamples for increasing fractions contain each other.
+"""
+from math import ceil
+from typing import Iterable
+
+import numpy as np
+
+from Core.PRef import PRef
+
+
+class StratifiedSubsample:
+    pRef: PRef
+    strata: list[np.ndarray]  # the (shuffled) row indices of each stratum
+    cached_pRefs: dict[float, PRef]
+
+    def __init__(self, pRef: PRef, amount_of_strata: int = 10, seed: int = 0):
+        self.pRef = pRef
+        generator = np.random.default_rng(seed)
+        by_fitness = np.argsort(pRef.fitness_array, kind="stable")
+        self.strata = [generator.permutation(stratum)
+                       for stratum in np.array_split(by_fitness, min(amount_of_strata, pRef.sample_size))]
+        self.cached_pRefs = {}
+
+    def __repr__(self):
+        return f"StratifiedSubsample({len(self.strata)} strata, {self.pRef.sample_size} rows)"
+
+    def get_rows(self, fraction: float) -> np.ndarray:
+        return np.sort(np.concatenate([stratum[:max(1, ceil(fraction * len(stratum)))] for stratum in self.strata]))
+
+    def get_pRef(self, fraction: float) -> PRef:
+        if fraction >= 1:
+            return self.pRef
+        if fraction not in self.cached_pRefs:
+            rows = self.get_rows(fraction)
+            self.cached_pRefs[fraction] = PRef(fitness_array=self.pRef.fitness_array[rows],
+                                               full_solution_matrix=self.pRef.full_solution_matrix[rows],
+                                               search_space=self.pRef.search_space)
+        return self.cached_pRefs[fraction]
+
+
+class FidelitySchedule:
+    """
+    The proportion of the PRef used at each iteration: fractions[0] for the first iterations_per_level iterations,
+    then fractions[1], and so on, until the full PRef is used.
+    An evaluation against a fraction f of the PRef costs f evaluations in the budget (rounded up for each batch).
+    """
+    fractions: list[float]
+    iterations_per_level: int
+    seed: int  # used to build the subsample, so that it's the same when resuming from a checkpoint
+
+    def __init__(self, fractions: Iterable[float], iterations_per_level: int = 1, seed: int = 0):
+        self.fractions = list(fractions)
+        self.iterations_per_level = iterations_per_level
+        self.seed = seed
+        if any(not (0 < fraction <= 1) for fraction in self.fractions):
+            raise Exception(f"The fractions of a FidelitySchedule must be in (0, 1], but they are {self.fractions}")
+
+    def __repr__(self):
+        return f"FidelitySchedule({self.fractions}, iterations_per_level = {self.iterations_per_level})"
+
+    def fraction_at(self, iteration: int) -> float:
+        level = iteration // self.iterations_per_level
+        return self.fractions[level] if level < len(self.fractions) else 1.0
+
+    def get_subsample(self, pRef: PRef) -> StratifiedSubsample:
+        return StratifiedSubsample(pRef, seed=self.seed)
+
+    def to_array(self) -> np.ndarray:
+        """For the checkpoints, see from_array"""
+        return np.array([self.iterations_per_level, self.seed] + self.fractions, dtype=float)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray):
+        return cls(fractions=[float(fraction) for fraction in array[2:]], iterations_per_level=int(array[0]), seed=int(array[1]))
+
+    @classmethod
+    def with_default_settings(cls):
+        return cls(fractions=[0.05, 0.1, 0.25, 0.5], iterations_per_level=1)
@@ -0,0 +1,144 @@
+"""
+A cache of fitnesses for FSEvaluator, for the algorithms that evaluate the same solutions many times (eg SA and GA).
+
+The solutions are stored as packed bytes: 1 bit per variable when all the variables in the search space are binary,
+otherwise 1 byte (or 8 bytes when a cardinality is above 256).
+The cache holds as many entries as fit in max_bytes (approximately, including the overhead of each entry),
+and when it's full the entries are evicted using either
+    - "lru": the least recently used entry
+    - "clock": the CLOCK approximation of LRU, where a hit only sets a reference bit, which is cheaper than reordering
+
+The time saved is estimated as the amount of hits times the average time of the evaluations that were needed.
+When count_hits_as_evaluations is True the hits still count towards FSEvaluator.used_evaluations,
+so that the budgets of the algorithms are not affected by using a cache.
+"""
+import sys
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from Core.SearchSpace import SearchSpace
+
+ENTRY_OVERHEAD = 100  # approximately, the bytes used by a dictionary entry and the float for the fitness, on top of the key
+
+
+class FitnessCache:
+    search_space: SearchSpace
+    max_bytes: int
+    policy: str  # either "lru" or "clock"
+    count_hits_as_evaluations: bool
+
+    capacity: Optional[int]  # how many entries fit in max_bytes, known after the first key is made
+
+    lru_entries: OrderedDict  # key -> fitness, from least to most recently used
+    clock_slots: dict  # key -> index in the arrays below
+    clock_keys: list
+    clock_fitnesses: list
+    clock_referenced: list[bool]
+    clock_hand: int
+
+    hits: int
+    misses: int
+    evaluation_time: float  # the total time spent on the evaluations of the misses
+
+    def __init__(self,
+                 search_space: SearchSpace,
+                 max_bytes: int = 2 ** 28,
+                 policy: str = "lru",
+                 count_hits_as_evaluations: bool = True):
+        if policy not in {"lru", "clock"}:
+            raise Exception(f"The policy of a FitnessCache should be either \"lru\" or \"clock\", but it's {policy}")
+        self.search_space = search_space
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.count_hits_as_evaluations = count_hits_as_evaluations
+        self.clear()
+
+    def clear(self):
+        self.capacity = None
+        self.lru_entries = OrderedDict()
+        self.clock_slots = {}
+        self.clock_keys = []
+        self.clock_fitnesses = []
+        self.clock_referenced = []
+        self.clock_hand = 0
+        self.hits = 0
+        self.misses = 0
+        self.evaluation_time = 0.0
+
+    def __repr__(self):
+        return (f"FitnessCache({self.policy}, {len(self)} entries, hits = {self.hits}, misses = {self.misses}, "
+                f"saved_time = {self.saved_time:.2f}s)")
+
+    def __len__(self):
+        return len(self.lru_entries) if self.policy == "lru" else len(self.clock_slots)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    @property
+    def saved_time(self) -> float:
+        return self.hits * self.evaluation_time / self.misses if self.misses > 0 else 0.0
+
+    def get_keys(self, full_solution_matrix: np.ndarray) -> list[bytes]:
+        largest_cardinality = np.max(self.search_space.cardinalities, initial=0)
+        if largest_cardinality <= 2:
+            packed = np.packbits(full_solution_matrix.astype(np.uint8), axis=1)
+        elif largest_cardinality <= 256:
+            packed = full_solution_matrix.astype(np.uint8)
+        else:
+            packed = full_solution_matrix.astype(np.int64)
+        keys = [row.tobytes() for row in packed]
+        if self.capacity is None and len(keys) > 0:
+            self.capacity = max(1, self.max_bytes // (sys.getsizeof(keys[0]) + ENTRY_OVERHEAD))
+        return keys
+
+    def get(self, key: bytes) -> Optional[float]:
+        """The cached fitness, or None if it's not in the cache. This counts as a hit or a miss"""
+        if self.policy == "lru":
+            fitness = self.lru_entries.get(key)
+            if fitness is not None:
+                self.lru_entries.move_to_end(key)
+        else:
+            slot = self.clock_slots.get(key)
+            fitness = None if slot is None else self.clock_fitnesses[slot]
+            if slot is not None:
+                self.clock_referenced[slot] = True
+
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fitness
+
+    def put(self, key: bytes, fitness: float):
+        if self.policy == "lru":
+            self.lru_entries[key] = fitness
+            self.lru_entries.move_to_end(key)
+            while len(self.lru_entries) > self.capacity:
+                self.lru_entries.popitem(last=False)
+            return
+
+        if key in self.clock_slots:
+            self.clock_fitnesses[self.clock_slots[key]] = fitness
+            return
+        if len(self.clock_keys) < self.capacity:
+            self.clock_slots[key] = len(self.clock_keys)
+            self.clock_keys.append(key)
+            self.clock_fitnesses.append(fitness)
+            self.clock_referenced.append(False)
+            return
+
+        # the hand clears the reference bits until it finds an entry that wasn't used since the last time around
+        while self.clock_referenced[self.clock_hand]:
+            self.clock_referenced[self.clock_hand] = False
+            self.clock_hand = (self.clock_hand + 1) % self.capacity
+        slot = self.clock_hand
+        del self.clock_slots[self.clock_keys[slot]]
+        self.clock_slots[key] = slot
+        self.clock_keys[slot] = key
+        self.clock_fitnesses[slot] = fitness
+        self.clock_hand = (self.clock_hand + 1) % self.capacity
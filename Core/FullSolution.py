@@ -12,7 +12,10 @@ class FullSolution:
     values: ArrayOfInts
 
     def __init__(self, values: Iterable[int]):
-        self.values = np.fromiter(values, dtype=int)
+        if isinstance(values, np.ndarray):  # much faster than iterating over it
+            self.values = np.array(values, dtype=int).reshape(-1)
+        else:
+            self.values = np.fromiter(values, dtype=int)
         self.values.setflags(write=False)
 
     def __repr__(self):
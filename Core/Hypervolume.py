@@ -0,0 +1,111 @@
+"""
+The hypervolume of a set of points (for 3 objectives, all maximised) is the volume of the region which is dominated
+by at least one of the points and which dominates the reference point.
+It never decreases when points are added, and it's used to detect when the front of a miner stops improving.
+
+The volume is calculated by sweeping along the third objective from the top, while keeping the 2D front of the
+points seen so far as a staircase where the area is updated at each insertion, which takes O(n log n) for n points.
+IncrementalHypervolume keeps the non-dominated points, and when a new point arrives only its exclusive contribution
+is calculated, which is the volume of its box minus the hypervolume of the other points when limited to that box.
+"""
+from bisect import bisect_left
+from typing import Iterable
+
+import numpy as np
+
+
+class Staircase:
+    """The 2D non-dominated points (maximised), sorted by increasing x and therefore decreasing y"""
+    xs: list[float]
+    ys: list[float]
+    reference_x: float
+    reference_y: float
+    area: float
+
+    def __init__(self, reference_x: float, reference_y: float):
+        self.xs = []
+        self.ys = []
+        self.reference_x = reference_x
+        self.reference_y = reference_y
+        self.area = 0.0
+
+    def add(self, x: float, y: float) -> float:
+        """Inserts the point and returns the area it added, which is 0 if it's dominated"""
+        if x <= self.reference_x or y <= self.reference_y:
+            return 0.0
+        position = bisect_left(self.xs, x)  # the points from here onwards have an x which is >= x
+        level = self.ys[position] if position < len(self.xs) else self.reference_y
+        if level >= y:
+            return 0.0
+
+        # the added area is calculated from right to left, where level is the height of the staircase
+        added_area = 0.0
+        right = x
+        first_dominated = position
+        while first_dominated > 0 and self.ys[first_dominated - 1] <= y:
+            first_dominated -= 1
+            added_area += (right - self.xs[first_dominated]) * (y - level)
+            level = self.ys[first_dominated]
+            right = self.xs[first_dominated]
+        left = self.xs[first_dominated - 1] if first_dominated > 0 else self.reference_x
+        added_area += (right - left) * (y - level)
+
+        self.xs[first_dominated:position] = [x]
+        self.ys[first_dominated:position] = [y]
+        self.area += added_area
+        return added_area
+
+
+def hypervolume_3d(points: np.ndarray, reference_point: np.ndarray) -> float:
+    """The hypervolume of the rows of points, where all 3 objectives are maximised"""
+    points = np.asarray(points, dtype=float).reshape((-1, 3))
+    points = points[np.all(points > reference_point, axis=1)]
+    if len(points) == 0:
+        return 0.0
+
+    points = points[np.argsort(-points[:, 2], kind="stable")]
+    staircase = Staircase(reference_point[0], reference_point[1])
+    volume = 0.0
+    for index, (x, y, _) in enumerate(points):
+        staircase.add(x, y)
+        next_z = points[index + 1, 2] if index + 1 < len(points) else reference_point[2]
+        volume += staircase.area * (points[index, 2] - next_z)
+    return volume
+
+
+class IncrementalHypervolume:
+    """The hypervolume of all the points added so far, where the dominated points are discarded"""
+    reference_point: np.ndarray
+    front: np.ndarray  # the non-dominated points, one per row
+    hypervolume: float
+
+    def __init__(self, reference_point: Iterable[float]):
+        self.reference_point = np.array(reference_point, dtype=float)
+        self.front = np.zeros(shape=(0, 3), dtype=float)
+        self.hypervolume = 0.0
+
+    def __repr__(self):
+        return f"IncrementalHypervolume({len(self.front)} points, hypervolume = {self.hypervolume})"
+
+    def is_dominated(self, point: np.ndarray) -> bool:
+        """Weakly dominated, so that duplicates are not added twice"""
+        return bool(np.any(np.all(self.front >= point, axis=1)))
+
+    def add(self, point: Iterable[float]) -> float:
+        """Adds a point, and returns how much the hypervolume increased"""
+        point = np.array(point, dtype=float)
+        if np.any(point <= self.reference_point) or self.is_dominated(point):
+            return 0.0
+
+        box_volume = float(np.prod(point - self.reference_point))
+        contribution = box_volume - hypervolume_3d(np.minimum(self.front, point), self.reference_point)
+
+        self.front = np.vstack([self.front[~np.all(point >= self.front, axis=1)], point])
+        self.hypervolume += contribution
+        return contribution
+
+    def add_many(self, points: np.ndarray) -> float:
+        """Adds the rows of points, starting from the best ones so that fewer points are discarded later"""
+        points = np.asarray(points, dtype=float).reshape((-1, 3))
+        order = np.argsort(-np.sum(points - self.reference_point, axis=1), kind="stable")
+        return sum(self.add(point) for point in points[order])
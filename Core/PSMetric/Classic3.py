@@ -16,6 +16,7 @@ from Core.PRef import PRef
 from Core.PS import PS, STAR
 from Core.PSMetric.Atomicity import Atomicity
 from Core.PSMetric.MeanFitness import MeanFitness
+from Core.PSMetric.Racing import Racing, RacingResult
 from Core.PSMetric.Simplicity import Simplicity
 from Core.custom_types import ArrayOfFloats
 from utils import announce
@@ -92,12 +93,16 @@ class Classic3PSEvaluator:
     normalised_fitnesses: ArrayOfFloats
     cached_isolated_benefits: list[list[float]]
     used_evaluations: int
+    racing: Optional[Racing]  # if present, get_S_MF_A_racing can be used
 
-    def __init__(self, pRef: PRef):
+    def __init__(self, pRef: PRef, racing: Optional[Racing] = None):
         self.pRef = pRef
         self.normalised_fitnesses = self.get_normalised_fitness_array(self.pRef.fitness_array)
         self.cached_isolated_benefits = self.calculate_isolated_benefits()
         self.used_evaluations = 0
+        self.racing = racing
+        if self.racing is not None:
+            self.racing.set_pRef(self.pRef)
 
     @classmethod
     def get_normalised_fitness_array(cls, fitness_array: ArrayOfFloats) -> ArrayOfFloats:
@@ -166,11 +171,15 @@ class Classic3PSEvaluator:
                                          rows_of_all_fixed: RowsOfPRef,
                                          except_for_one: list[RowsOfPRef]) -> float:
         pAB = self.normalised_mf_of_rows(rows_of_all_fixed)
+        excluded = np.array([self.normalised_mf_of_rows(rows) for rows in except_for_one])
+        return self.get_atomicity_from_benefits(ps, pAB, excluded)
+
+    def get_atomicity_from_benefits(self, ps: PS, pAB: float, excluded: ArrayOfFloats) -> float:
+        """pAB is the normalised benefit of the rows of ps, excluded has the one for each simplification of ps"""
         if pAB == 0.0:
             return pAB
 
         isolated = self.get_relevant_isolated_benefits(ps)
-        excluded = np.array([self.normalised_mf_of_rows(rows) for rows in except_for_one])
 
         if len(isolated) == 0:  # ie we have the empty ps
             return 0
@@ -221,6 +230,35 @@ class Classic3PSEvaluator:
         else:
             return pAB * coefficients
 
+    def get_S_MF_A_racing(self, ps: PS, mean_fitness_threshold: float, invalid_value: float = -1000.0) -> (np.ndarray, RacingResult):
+        """
+        An approximation of get_S_MF_A, where the mean fitness is raced against the threshold (see Racing),
+        and the atomicity is estimated from the same rows, by scaling the benefits to the size of the PRef.
+        Returns the 3 scores, and the racing result which contains the uncertainty of the mean fitness
+        """
+        if self.racing is None:
+            raise Exception("Classic3PSEvaluator.get_S_MF_A_racing requires the evaluator to be constructed with a Racing")
+        self.used_evaluations += 1
+        result = self.racing.race(ps, mean_fitness_threshold)
+
+        # the benefits of the rows where all the values of ps are present, or all except for one
+        processed = result.rows_processed
+        fixed = ps.get_fixed_variable_positions()
+        mismatches = self.racing.shuffled_fsm[:processed, fixed] != ps.values[fixed]
+        amount_of_mismatches = np.sum(mismatches, axis=1)
+        normalised_fitnesses = self.normalised_fitnesses[self.racing.permutation[:processed]]
+        scale = self.pRef.sample_size / processed
+        pAB = float(np.sum(normalised_fitnesses[amount_of_mismatches == 0])) * scale
+        only_mismatch = mismatches & (amount_of_mismatches == 1).reshape((-1, 1))
+        excluded = pAB + np.sum(normalised_fitnesses.reshape((-1, 1)) * only_mismatch, axis=0) * scale
+
+        simplicity = self.get_simplicity_of_PS(ps)
+        mean_fitness = result.estimate if result.observations > 0 else invalid_value
+        atomicity = self.get_atomicity_from_benefits(ps, pAB, excluded)
+        if not np.isfinite(atomicity):
+            mean_fitness = invalid_value
+        return np.array([simplicity, mean_fitness, atomicity]), result
+
 
 def test_classic3(benchmark_problem: BenchmarkProblem,sample_size: int):
     pRef = benchmark_problem.get_reference_population(sample_size)
@@ -5,6 +5,7 @@ import numpy as np
 from Core.PRef import PRef
 from Core.PS import PS
 from Core.PSMetric.Metric import Metric
+from Core.PSMetric.Racing import Racing, RacingResult
 
 
 class MeanFitness(Metric):
@@ -15,12 +16,15 @@ class MeanFitness(Metric):
     min_fitness: Optional[float]
     median_fitness: Optional[float]
 
-    def __init__(self):
+    racing: Optional[Racing]  # if present, get_racing_estimate can be used to compare against a threshold
+
+    def __init__(self, racing: Optional[Racing] = None):
         super().__init__()
         self.pRef = None
         self.normalised_pRef = None
         self.max_fitness = None
         self.min_fitness = None
+        self.racing = racing
 
     def set_pRef(self, pRef: PRef):
         self.pRef = pRef
@@ -28,6 +32,8 @@ class MeanFitness(Metric):
 
         self.max_fitness = np.max(pRef.fitness_array)
         self.min_fitness = np.min(pRef.fitness_array)
+        if self.racing is not None:
+            self.racing.set_pRef(pRef)
 
     def __repr__(self):
         return "MeanFitness"
@@ -48,6 +54,12 @@ class MeanFitness(Metric):
 
         return np.average(observed_fitnesses)
 
+    def get_racing_estimate(self, ps: PS, threshold: float) -> RacingResult:
+        """An approximation of get_single_score, which stops once it's clearly above or below threshold (see Racing)"""
+        if self.racing is None:
+            raise Exception("MeanFitness.get_racing_estimate requires the metric to be constructed with a Racing")
+        return self.racing.race(ps, threshold)
+
 
     def get_single_normalised_score(self, ps: PS) -> float:
         observed_fitnesses = self.normalised_pRef.fitnesses_of_observations(ps)
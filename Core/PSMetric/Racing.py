@@ -0,0 +1,143 @@
+"""
+Racing (sequential sampling) for the mean fitness of a PS.
+
+Most PSs only need to be compared against a threshold, such as the worst score that survives truncation,
+and for PSs with a large support that comparison is usually clear long before all their observations are seen.
+The rows of the PRef are shuffled once (using the seed, so the results are deterministic), and they are processed
+in chunks: after each chunk the mean of the matching rows is updated together with a confidence interval,
+and the race stops as soon as the interval is entirely above or below the threshold.
+
+The interval can be
+    - "hoeffding": uses the range of the fitnesses in the PRef, and it's valid for any distribution
+    - "t": the Student's t interval, which is much tighter but assumes the sample mean to be roughly normal
+
+The confidence is split evenly across the chunks (a union bound), since the interval is checked after each of them.
+When all the rows are processed the mean is exact, and its uncertainty is 0.
+"""
+from math import ceil
+from typing import Optional
+
+import numpy as np
+from scipy.stats import t
+
+from Core.PRef import PRef
+from Core.PS import PS, STAR
+
+
+class RacingResult:
+    estimate: float  # the mean fitness of the matching rows that were processed
+    uncertainty: float  # the half width of the confidence interval around the estimate
+    observations: int  # how many matching rows were processed
+    rows_processed: int  # how many rows of the shuffled PRef were processed
+    decision: int  # +1 if the mean is above the threshold, -1 if below, 0 if it could not be decided
+
+    def __init__(self, estimate: float, uncertainty: float, observations: int, rows_processed: int, decision: int):
+        self.estimate = estimate
+        self.uncertainty = uncertainty
+        self.observations = observations
+        self.rows_processed = rows_processed
+        self.decision = decision
+
+    def __repr__(self):
+        return f"RacingResult({self.estimate:.3f} ± {self.uncertainty:.3f}, decision = {self.decision}, " \
+               f"observations = {self.observations}, rows_processed = {self.rows_processed})"
+
+    @property
+    def is_exact(self) -> bool:
+        return self.uncertainty == 0
+
+
+class Racing:
+    confidence: float
+    chunk_size: int
+    bound: str  # either "hoeffding" or "t"
+    seed: int
+    min_observations: int  # no decision is made with fewer matching rows than this
+
+    permutation: Optional[np.ndarray]  # the order in which the rows of the PRef are processed
+    shuffled_fsm: Optional[np.ndarray]
+    shuffled_fitnesses: Optional[np.ndarray]
+    fitness_range: Optional[float]
+
+    def __init__(self,
+                 confidence: float = 0.95,
+                 chunk_size: int = 1000,
+                 bound: str = "hoeffding",
+                 seed: int = 0,
+                 min_observations: int = 10):
+        if bound not in {"hoeffding", "t"}:
+            raise Exception(f"The bound for Racing should be either \"hoeffding\" or \"t\", but it's {bound}")
+        if not (0 < confidence < 1):
+            raise Exception(f"The confidence for Racing should be in (0, 1), but it's {confidence}")
+        self.confidence = confidence
+        self.chunk_size = chunk_size
+        self.bound = bound
+        self.seed = seed
+        self.min_observations = min_observations
+
+        self.permutation = None
+        self.shuffled_fsm = None
+        self.shuffled_fitnesses = None
+        self.fitness_range = None
+
+    def __repr__(self):
+        return f"Racing(confidence = {self.confidence}, chunk_size = {self.chunk_size}, bound = {self.bound})"
+
+    def __getstate__(self):
+        """Only the settings are pickled (eg in the configuration of a checkpoint), set_pRef is called again after loading"""
+        state = self.__dict__.copy()
+        state.update(permutation=None, shuffled_fsm=None, shuffled_fitnesses=None, fitness_range=None)
+        return state
+
+    def set_pRef(self, pRef: PRef):
+        self.permutation = np.random.default_rng(self.seed).permutation(pRef.sample_size)
+        self.shuffled_fsm = pRef.full_solution_matrix[self.permutation]
+        self.shuffled_fitnesses = pRef.fitness_array[self.permutation].astype(float)
+        self.fitness_range = float(np.max(pRef.fitness_array) - np.min(pRef.fitness_array))
+
+    @property
+    def amount_of_chunks(self) -> int:
+        return max(1, ceil(len(self.shuffled_fitnesses) / self.chunk_size))
+
+    def get_half_width(self, observations: int, sum_of_values: float, sum_of_squares: float) -> float:
+        """The half width of the confidence interval of the mean, for a single check of the race"""
+        failure_rate = (1 - self.confidence) / self.amount_of_chunks
+        if self.bound == "hoeffding":
+            return self.fitness_range * np.sqrt(np.log(2 / failure_rate) / (2 * observations))
+
+        mean = sum_of_values / observations
+        variance = max(sum_of_squares / observations - mean ** 2, 0) * observations / (observations - 1)
+        return float(t.ppf(1 - failure_rate / 2, df=observations - 1) * np.sqrt(variance / observations))
+
+    def get_matching_rows(self, ps: PS, start: int, end: int) -> np.ndarray:
+        """Which of the shuffled rows in [start, end) match the fixed values of ps"""
+        fixed = ps.values != STAR
+        return np.all(self.shuffled_fsm[start:end, fixed] == ps.values[fixed], axis=1)
+
+    def race(self, ps: PS, threshold: float) -> RacingResult:
+        """Estimates the mean fitness of ps, stopping as soon as it's clearly above or below the threshold"""
+        if self.permutation is None:
+            raise Exception("Racing.race was called before set_pRef")
+        total_rows = len(self.shuffled_fitnesses)
+        observations = 0
+        sum_of_values = 0.0
+        sum_of_squares = 0.0
+        for start in range(0, total_rows, self.chunk_size):
+            end = min(start + self.chunk_size, total_rows)
+            values = self.shuffled_fitnesses[start:end][self.get_matching_rows(ps, start, end)]
+            observations += len(values)
+            sum_of_values += float(np.sum(values))
+            sum_of_squares += float(np.sum(np.square(values)))
+            if observations < max(self.min_observations, 2) or end == total_rows:
+                continue
+
+            estimate = sum_of_values / observations
+            half_width = self.get_half_width(observations, sum_of_values, sum_of_squares)
+            if estimate - half_width > threshold:
+                return RacingResult(estimate, half_width, observations, end, decision=1)
+            if estimate + half_width < threshold:
+                return RacingResult(estimate, half_width, observations, end, decision=-1)
+
+        # all the rows were processed, so the mean is exact (and 0 without observations, as in MeanFitness)
+        estimate = sum_of_values / observations if observations > 0 else 0.0
+        return RacingResult(estimate, 0.0, observations, total_rows, decision=int(np.sign(estimate - threshold)))
@@ -0,0 +1,195 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from Core.EvaluatedPS import EvaluatedPS
+from Core.PS import PS, STAR
+from Core.SearchSpace import SearchSpace
+from Core.custom_types import ArrayOfInts, ArrayOfFloats, ArrayOfBools
+
+
+def get_genome_dtype(search_space: SearchSpace) -> type:
+    """The smallest signed integer type which can hold STAR and every value of the search space"""
+    largest_value = int(np.max(search_space.cardinalities, initial=1)) - 1
+    for dtype in (np.int8, np.int16, np.int32):
+        if largest_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def get_packed_rows(genomes: np.ndarray) -> np.ndarray:
+    """Each row of the matrix is viewed as a single opaque value, so that rows can be compared and hashed in one go"""
+    contiguous = np.ascontiguousarray(genomes)
+    row_type = np.dtype((np.void, contiguous.dtype.itemsize * contiguous.shape[1]))
+    return contiguous.view(row_type).ravel()
+
+
+def get_row_keys(genomes: np.ndarray) -> list[bytes]:
+    """The bytes of each row, which are used as the keys of the hashed indexes"""
+    if len(genomes) == 0:
+        return []
+    return get_packed_rows(genomes).tolist()
+
+
+class PSPopulation:
+    """
+    A population of PSs stored as a struct of arrays, which is what ArchivePSMiner uses internally.
+     - genomes: a matrix where each row is a PS (STAR is still -1), using a small integer type
+     - metric_scores: a matrix where each row contains the metrics of the PS. NaN means that it was not evaluated yet
+     - aggregated_scores: the output of ArchivePSMiner.with_aggregated_scores, NaN if not calculated
+
+    EvaluatedPS objects are only created when the results are requested, via to_evaluated_pss.
+    """
+    genomes: np.ndarray
+    metric_scores: np.ndarray
+    aggregated_scores: ArrayOfFloats
+
+    def __init__(self,
+                 genomes: np.ndarray,
+                 metric_scores: np.ndarray,
+                 aggregated_scores: Optional[ArrayOfFloats] = None):
+        self.genomes = genomes
+        self.metric_scores = metric_scores
+        if aggregated_scores is None:
+            aggregated_scores = np.full(shape=len(genomes), fill_value=np.nan)
+        self.aggregated_scores = aggregated_scores
+
+    def __len__(self):
+        return len(self.genomes)
+
+    def __repr__(self):
+        return f"PSPopulation({len(self)} individuals, {self.amount_of_metrics} metrics)"
+
+    @property
+    def amount_of_metrics(self) -> int:
+        return self.metric_scores.shape[1]
+
+    @classmethod
+    def empty(cls, search_space: SearchSpace, amount_of_metrics: int):
+        genomes = np.zeros(shape=(0, search_space.amount_of_parameters), dtype=get_genome_dtype(search_space))
+        return cls(genomes, np.zeros(shape=(0, amount_of_metrics), dtype=float))
+
+    @classmethod
+    def from_genomes(cls, genomes: np.ndarray, amount_of_metrics: int):
+        """The resulting individuals are unevaluated"""
+        metric_scores = np.full(shape=(len(genomes), amount_of_metrics), fill_value=np.nan)
+        return cls(genomes, metric_scores)
+
+    @classmethod
+    def from_pss(cls, pss: Iterable[PS], search_space: SearchSpace, amount_of_metrics: int):
+        rows = [ps.values for ps in pss]
+        if len(rows) == 0:
+            return cls.empty(search_space, amount_of_metrics)
+        genomes = np.array(rows, dtype=get_genome_dtype(search_space))
+        return cls.from_genomes(genomes, amount_of_metrics)
+
+    @classmethod
+    def concatenate(cls, populations: list):
+        return cls(genomes=np.vstack([population.genomes for population in populations]),
+                   metric_scores=np.vstack([population.metric_scores for population in populations]),
+                   aggregated_scores=np.concatenate([population.aggregated_scores for population in populations]))
+
+    def subset(self, indices: ArrayOfInts | ArrayOfBools):
+        return PSPopulation(self.genomes[indices],
+                            self.metric_scores[indices],
+                            self.aggregated_scores[indices])
+
+    @property
+    def is_evaluated(self) -> ArrayOfBools:
+        return np.logical_not(np.any(np.isnan(self.metric_scores), axis=1))
+
+    def row_keys(self) -> list[bytes]:
+        return get_row_keys(self.genomes)
+
+    def without_duplicates(self):
+        """Keeps the first occurrence of each PS, and the relative order of the population is preserved"""
+        if len(self) == 0:
+            return self
+        _, first_occurrences = np.unique(get_packed_rows(self.genomes), return_index=True)
+        return self.subset(np.sort(first_occurrences))
+
+    def top(self, n: int):
+        """Returns the n individuals with the highest aggregated score, in no particular order"""
+        if n >= len(self):
+            return self
+        return self.subset(np.argpartition(-self.aggregated_scores, n)[:n])
+
+    def sorted_by_aggregated_score(self):
+        return self.subset(np.argsort(-self.aggregated_scores, kind="stable"))
+
+    def specialisations(self, search_space: SearchSpace):
+        """
+        The equivalent of [child for parent in self for child in parent.specialisations(search_space)],
+        where all the children are generated at once. The children are unevaluated.
+        """
+        parent_indices, variables = np.nonzero(self.genomes == STAR)
+        amounts_per_variable = search_space.cardinalities[variables]
+        total_children = int(np.sum(amounts_per_variable))
+
+        child_parents = np.repeat(parent_indices, amounts_per_variable)
+        child_variables = np.repeat(variables, amounts_per_variable)
+        group_starts = np.repeat(np.cumsum(amounts_per_variable) - amounts_per_variable, amounts_per_variable)
+        child_values = np.arange(total_children) - group_starts
+
+        children = self.genomes[child_parents]
+        children[np.arange(total_children), child_variables] = child_values
+        return PSPopulation.from_genomes(children, self.amount_of_metrics)
+
+    def ps_at(self, index: int) -> PS:
+        return PS(self.genomes[index])
+
+    def to_evaluated_pss(self) -> list[EvaluatedPS]:
+        def aggregated_score_at(index: int) -> Optional[float]:
+            score = self.aggregated_scores[index]
+            return None if np.isnan(score) else float(score)
+
+        def metric_scores_at(index: int) -> Optional[list[float]]:
+            scores = self.metric_scores[index]
+            return None if np.any(np.isnan(scores)) else list(scores)
+
+        return [EvaluatedPS(self.genomes[index],
+                            metric_scores=metric_scores_at(index),
+                            aggregated_score=aggregated_score_at(index))
+                for index in range(len(self))]
+
+
+class PSArchive:
+    """
+    The archive of ArchivePSMiner, which stores the archived individuals as a PSPopulation,
+    and uses a hashed index of the packed rows to check membership.
+    """
+    search_space: SearchSpace
+    keys: set[bytes]
+    chunks: list[PSPopulation]
+
+    def __init__(self, search_space: SearchSpace, amount_of_metrics: int):
+        self.search_space = search_space
+        self.keys = set()
+        self.chunks = [PSPopulation.empty(search_space, amount_of_metrics)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"PSArchive({len(self)} individuals)"
+
+    def contains(self, population: PSPopulation) -> ArrayOfBools:
+        return np.fromiter((key in self.keys for key in population.row_keys()), dtype=bool, count=len(population))
+
+    def add(self, population: PSPopulation) -> PSPopulation:
+        """Adds the individuals which are not already present, and returns them"""
+        keys = population.row_keys()
+        is_new = np.zeros(len(population), dtype=bool)
+        for index, key in enumerate(keys):
+            if key not in self.keys:
+                self.keys.add(key)
+                is_new[index] = True
+        added = population.subset(is_new)
+        if len(added) > 0:
+            self.chunks.append(added)
+        return added
+
+    def as_population(self) -> PSPopulation:
+        if len(self.chunks) > 1:
+            self.chunks = [PSPopulation.concatenate(self.chunks)]
+        return self.chunks[0]
@@ -0,0 +1,90 @@
+"""
+This file allows the fitnesses of many full solutions to be calculated in parallel, for the expensive problems.
+The fitness function (usually the method of a BenchmarkProblem, and so the whole problem) is pickled once
+and sent to each worker process when it starts, so that only the solutions and the fitnesses are sent afterwards.
+Pass it to FSEvaluator (or to the algorithms that accept an executor) to use it.
+"""
+import multiprocessing
+import pickle
+import weakref
+from typing import Optional, Callable
+
+import numpy as np
+
+from Core.FullSolution import FullSolution
+
+# the state of each worker process, set by initialise_worker
+worker_fitness_function: Optional[Callable] = None
+worker_fitness_function_batch: Optional[Callable] = None
+
+
+def initialise_worker(pickled_functions: bytes):
+    global worker_fitness_function, worker_fitness_function_batch
+    worker_fitness_function, worker_fitness_function_batch = pickle.loads(pickled_functions)
+
+
+def evaluate_chunk(full_solution_matrix: np.ndarray) -> np.ndarray:
+    if worker_fitness_function_batch is not None:
+        return np.asarray(worker_fitness_function_batch(full_solution_matrix), dtype=float)
+    return np.array([worker_fitness_function(FullSolution(row)) for row in full_solution_matrix], dtype=float)
+
+
+def release_resources(pool):
+    pool.terminate()
+    pool.join()
+
+
+class ParallelFSEvaluator:
+    """
+    A pool of worker processes, each holding its own copy of the fitness function.
+    The workers are started once, so the start-up cost is paid only once per run (reuse the same instance for all the evaluators).
+    As in FSEvaluator, when fitness_function_batch is not given the one of the problem that owns fitness_function is used.
+    Call close() when you're done, although the resources are also released when this object is garbage collected.
+    """
+    workers: int
+    chunks_per_worker: int
+    min_rows_per_chunk: int  # smaller batches are split in fewer chunks, since each chunk has a communication cost
+
+    def __init__(self,
+                 fitness_function: Callable,
+                 workers: int,
+                 fitness_function_batch: Optional[Callable] = None,
+                 chunks_per_worker: int = 4,
+                 min_rows_per_chunk: int = 1):
+        self.workers = workers
+        self.chunks_per_worker = chunks_per_worker
+        self.min_rows_per_chunk = min_rows_per_chunk
+
+        if fitness_function_batch is None:
+            fitness_function_batch = getattr(getattr(fitness_function, "__self__", None), "fitness_function_batch", None)
+        try:
+            pickled_functions = pickle.dumps((fitness_function, fitness_function_batch))
+        except (pickle.PicklingError, AttributeError, TypeError) as error:
+            raise Exception(f"The fitness function {fitness_function} can't be sent to the worker processes: {error}")
+
+        pool = multiprocessing.Pool(processes=workers,
+                                    initializer=initialise_worker,
+                                    initargs=(pickled_functions,))
+        self.pool = pool
+        self.finalizer = weakref.finalize(self, release_resources, pool)
+
+    def __repr__(self):
+        return f"ParallelFSEvaluator(workers = {self.workers})"
+
+    def evaluate(self, full_solution_matrix: np.ndarray) -> np.ndarray:
+        """Returns the fitnesses of the rows of the matrix, preserving the order"""
+        if len(full_solution_matrix) == 0:
+            return np.zeros(0, dtype=float)
+        amount_of_chunks = min(max(1, len(full_solution_matrix) // self.min_rows_per_chunk),
+                               self.workers * self.chunks_per_worker)
+        chunks = np.array_split(full_solution_matrix, amount_of_chunks)
+        return np.concatenate(self.pool.map(evaluate_chunk, chunks))
+
+    def close(self):
+        self.finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,117 @@
+"""
+This file allows the metrics of many PSs to be calculated in parallel.
+The PRef is placed in shared memory once, and each worker process builds its own metric instances over it
+when it starts, so that only the genomes and the scores are sent between processes.
+"""
+import multiprocessing
+import pickle
+import weakref
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from Core.PRef import PRef
+from Core.PS import PS
+from Core.PSMetric.Metric import Metric
+from Core.SearchSpace import SearchSpace
+
+
+# the state of each worker process, set by initialise_worker
+worker_metrics: Optional[list[Metric]] = None
+worker_shared_blocks: list[shared_memory.SharedMemory] = []
+
+
+def array_to_shared_memory(array: np.ndarray) -> (shared_memory.SharedMemory, np.ndarray):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared_array[...] = array
+    return block, shared_array
+
+
+def array_from_shared_memory(block_name: str, shape: tuple, dtype: np.dtype) -> (shared_memory.SharedMemory, np.ndarray):
+    block = shared_memory.SharedMemory(name=block_name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def initialise_worker(fsm_description: tuple,
+                      fitness_description: tuple,
+                      cardinalities: np.ndarray,
+                      pickled_metrics: bytes):
+    global worker_metrics, worker_shared_blocks
+    fsm_block, fsm = array_from_shared_memory(*fsm_description)
+    fitness_block, fitnesses = array_from_shared_memory(*fitness_description)
+    worker_shared_blocks = [fsm_block, fitness_block]  # they need to stay referenced while the arrays are in use
+
+    pRef = PRef(fitness_array=fitnesses, full_solution_matrix=fsm, search_space=SearchSpace(cardinalities))
+    worker_metrics = pickle.loads(pickled_metrics)
+    for metric in worker_metrics:
+        metric.set_pRef(pRef)
+
+
+def evaluate_chunk(genomes: np.ndarray) -> np.ndarray:
+    scores = np.zeros(shape=(len(genomes), len(worker_metrics)), dtype=float)
+    for row_index, row in enumerate(genomes):
+        ps = PS(row)
+        scores[row_index] = [metric.get_single_score(ps) for metric in worker_metrics]
+    return scores
+
+
+def release_resources(pool, blocks: list[shared_memory.SharedMemory]):
+    pool.terminate()
+    pool.join()
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+class ParallelPSEvaluator:
+    """
+    A pool of worker processes, each holding its own copy of the metrics over a PRef in shared memory.
+    The workers are started once, so the start-up cost is paid only once per miner.
+    Call close() when you're done, although the resources are also released when this object is garbage collected.
+    """
+    workers: int
+    chunks_per_worker: int
+    amount_of_metrics: int
+
+    def __init__(self,
+                 pRef: PRef,
+                 metrics: list[Metric],
+                 workers: int,
+                 chunks_per_worker: int = 4):
+        self.workers = workers
+        self.chunks_per_worker = chunks_per_worker
+        self.amount_of_metrics = len(metrics)
+
+        fsm_block, fsm = array_to_shared_memory(np.ascontiguousarray(pRef.full_solution_matrix))
+        fitness_block, fitnesses = array_to_shared_memory(np.ascontiguousarray(pRef.fitness_array))
+
+        pool = multiprocessing.Pool(processes=workers,
+                                    initializer=initialise_worker,
+                                    initargs=((fsm_block.name, fsm.shape, fsm.dtype),
+                                              (fitness_block.name, fitnesses.shape, fitnesses.dtype),
+                                              pRef.search_space.cardinalities,
+                                              pickle.dumps(metrics)))
+        self.pool = pool
+        self.finalizer = weakref.finalize(self, release_resources, pool, [fsm_block, fitness_block])
+
+    def __repr__(self):
+        return f"ParallelPSEvaluator(workers = {self.workers})"
+
+    def evaluate(self, genomes: np.ndarray) -> np.ndarray:
+        """Returns a matrix where each row contains the metrics of the corresponding genome, preserving the order"""
+        if len(genomes) == 0:
+            return np.zeros(shape=(0, self.amount_of_metrics), dtype=float)
+        amount_of_chunks = min(len(genomes), self.workers * self.chunks_per_worker)
+        chunks = np.array_split(genomes, amount_of_chunks)
+        return np.vstack(self.pool.map(evaluate_chunk, chunks))
+
+    def close(self):
+        self.finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
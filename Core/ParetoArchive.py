@@ -0,0 +1,195 @@
+"""
+An archive of PSs with their objective scores, which keeps track of which of them are non-dominated.
+
+The PSs are stored as a genome matrix and a score matrix that grow by doubling their capacity,
+and for each objective the order of the entries from best to worst is kept by merging each new batch into it.
+The non-dominated front is usually much smaller than the archive, so checking whether a new entry is dominated
+(and which front entries it dominates) only compares it against the front, not against the whole archive.
+This means that extracting the front or the top k for an objective doesn't require sorting or aggregating the archive.
+
+When max_size is given and the archive grows past it, the dominated entries are evicted first
+(keeping those that rank best in at least one objective), and if the front alone is too large,
+the front entries with the smallest crowding distance are evicted.
+"""
+from typing import Optional, Iterable
+
+import numpy as np
+
+from Core.EvaluatedPS import EvaluatedPS
+from Core.SearchSpace import SearchSpace
+from Core.custom_types import ArrayOfInts, ArrayOfBools
+
+
+def get_crowding_distances(objectives: np.ndarray) -> np.ndarray:
+    """The usual NSGA-II crowding distance, where the extremes of each objective have an infinite distance"""
+    amount, amount_of_objectives = objectives.shape
+    distances = np.zeros(amount, dtype=float)
+    if amount <= 2:
+        return np.full(amount, np.inf)
+    for objective in range(amount_of_objectives):
+        order = np.argsort(objectives[:, objective], kind="stable")
+        values = objectives[order, objective]
+        value_range = values[-1] - values[0]
+        distances[order[[0, -1]]] = np.inf
+        if value_range > 0:
+            distances[order[1:-1]] += (values[2:] - values[:-2]) / value_range
+    return distances
+
+
+class ParetoArchive:
+    search_space: SearchSpace
+    directions: np.ndarray  # +1 for the objectives that are maximised, -1 for those that are minimised
+    max_size: Optional[int]
+
+    amount: int
+    stored_genomes: np.ndarray  # only the first .amount rows are valid
+    stored_scores: np.ndarray
+    is_dominated: ArrayOfBools
+    orders: list[ArrayOfInts]  # for each objective, the indices of the entries from best to worst
+
+    def __init__(self, search_space: SearchSpace,
+                 directions: Iterable[int],
+                 max_size: Optional[int] = None):
+        self.search_space = search_space
+        self.directions = np.array(directions, dtype=float)
+        self.max_size = max_size
+
+        self.amount = 0
+        self.stored_genomes = np.zeros(shape=(16, search_space.amount_of_parameters), dtype=int)
+        self.stored_scores = np.zeros(shape=(16, len(self.directions)), dtype=float)
+        self.is_dominated = np.zeros(16, dtype=bool)
+        self.orders = [np.zeros(0, dtype=int) for _ in self.directions]
+
+    def __len__(self):
+        return self.amount
+
+    def __repr__(self):
+        return f"ParetoArchive({self.amount} entries, {len(self.front_indices)} non-dominated)"
+
+    @property
+    def genomes(self) -> np.ndarray:
+        return self.stored_genomes[:self.amount]
+
+    @property
+    def metric_scores(self) -> np.ndarray:
+        return self.stored_scores[:self.amount]
+
+    @property
+    def objectives(self) -> np.ndarray:
+        """The scores, where all the objectives are maximised"""
+        return self.metric_scores * self.directions
+
+    @property
+    def front_indices(self) -> ArrayOfInts:
+        return np.nonzero(~self.is_dominated[:self.amount])[0]
+
+    def ensure_capacity(self, required: int):
+        if required <= len(self.stored_genomes):
+            return
+        capacity = max(required, 2 * len(self.stored_genomes))
+
+        def grown(array: np.ndarray) -> np.ndarray:
+            result = np.zeros(shape=(capacity,) + array.shape[1:], dtype=array.dtype)
+            result[:self.amount] = array[:self.amount]
+            return result
+
+        self.stored_genomes = grown(self.stored_genomes)
+        self.stored_scores = grown(self.stored_scores)
+        self.is_dominated = grown(self.is_dominated)
+
+    def update_front(self, new_indices: ArrayOfInts):
+        """Checks each new entry against the current front, in order"""
+        objectives = self.objectives
+        front = self.front_indices[~np.isin(self.front_indices, new_indices)]
+
+        # most of the new entries are dominated by the current front, which is checked for all of them at once
+        front_points = objectives[front].reshape((1, -1, objectives.shape[1]))
+        new_points = objectives[new_indices].reshape((-1, 1, objectives.shape[1]))
+        is_dominated = np.any(np.all(front_points >= new_points, axis=2) & np.any(front_points > new_points, axis=2), axis=1)
+        self.is_dominated[new_indices[is_dominated]] = True
+
+        front = list(front)
+        for index in new_indices[~is_dominated]:
+            point = objectives[index]
+            front_points = objectives[front]
+            if np.any(np.all(front_points >= point, axis=1) & np.any(front_points > point, axis=1)):
+                self.is_dominated[index] = True
+                continue
+            now_dominated = np.all(point >= front_points, axis=1) & np.any(point > front_points, axis=1)
+            self.is_dominated[np.array(front, dtype=int)[now_dominated]] = True
+            front = [front_index for front_index, dominated in zip(front, now_dominated) if not dominated]
+            front.append(index)
+
+    def add(self, genomes: np.ndarray, metric_scores: np.ndarray) -> ArrayOfInts:
+        """Adds the entries, and returns the indices of those that are in the front afterwards"""
+        genomes = np.asarray(genomes, dtype=int).reshape((-1, self.search_space.amount_of_parameters))
+        metric_scores = np.asarray(metric_scores, dtype=float).reshape((-1, len(self.directions)))
+        if len(genomes) == 0:
+            return np.zeros(0, dtype=int)
+
+        new_indices = np.arange(self.amount, self.amount + len(genomes))
+        self.ensure_capacity(self.amount + len(genomes))
+        self.stored_genomes[new_indices] = genomes
+        self.stored_scores[new_indices] = metric_scores
+        self.is_dominated[new_indices] = False
+        self.amount += len(genomes)
+
+        # the new entries are merged into the orders, after the existing entries with the same score
+        for objective, direction in enumerate(self.directions):
+            keys = -direction * self.stored_scores[:self.amount, objective]
+            old_order = self.orders[objective]
+            new_order = new_indices[np.argsort(keys[new_indices], kind="stable")]
+            positions = np.searchsorted(keys[old_order], keys[new_order], side="right")
+            self.orders[objective] = np.insert(old_order, positions, new_order)
+
+        self.update_front(new_indices)
+        if self.max_size is not None and self.amount > self.max_size:
+            new_index_of = self.evict(self.amount - self.max_size)
+            new_indices = new_index_of[new_indices]
+            new_indices = new_indices[new_indices >= 0]
+
+        return new_indices[~self.is_dominated[new_indices]]
+
+    def evict(self, amount_to_evict: int) -> ArrayOfInts:
+        """
+        Removes the dominated entries that rank worst in all objectives, then the most crowded front entries.
+        Returns the new index of each entry, which is -1 for the evicted ones
+        """
+        ranks = np.empty(shape=(self.amount, len(self.directions)), dtype=int)
+        for objective, order in enumerate(self.orders):
+            ranks[order, objective] = np.arange(self.amount)
+        best_ranks = np.min(ranks, axis=1)
+
+        dominated = np.nonzero(self.is_dominated[:self.amount])[0]
+        to_evict = dominated[np.argsort(-best_ranks[dominated], kind="stable")][:amount_to_evict]
+        if len(to_evict) < amount_to_evict:
+            front = self.front_indices
+            crowding = get_crowding_distances(self.objectives[front])
+            to_evict = np.concatenate([to_evict,
+                                       front[np.argsort(crowding, kind="stable")][:amount_to_evict - len(to_evict)]])
+
+        to_keep = np.ones(self.amount, dtype=bool)
+        to_keep[to_evict] = False
+        new_index_of = np.where(to_keep, np.cumsum(to_keep) - 1, -1)
+        kept = np.nonzero(to_keep)[0]
+        self.stored_genomes[:len(kept)] = self.stored_genomes[kept]
+        self.stored_scores[:len(kept)] = self.stored_scores[kept]
+        self.is_dominated[:len(kept)] = self.is_dominated[kept]
+        self.orders = [new_index_of[order[to_keep[order]]] for order in self.orders]
+        self.amount = len(kept)  # front entries are only evicted when no dominated ones are left, so the front is valid
+        return new_index_of
+
+    def get_front(self) -> (np.ndarray, np.ndarray):
+        """The genomes and the metric scores of the non-dominated entries"""
+        front = self.front_indices
+        return self.genomes[front], self.metric_scores[front]
+
+    def top_k_indices(self, objective: int, k: Optional[int] = None) -> ArrayOfInts:
+        """The indices of the k best entries for the objective, from best to worst"""
+        return self.orders[objective][:k]
+
+    def to_evaluated_pss(self, indices: Optional[ArrayOfInts] = None) -> list[EvaluatedPS]:
+        if indices is None:
+            indices = np.arange(self.amount)
+        return [EvaluatedPS(self.stored_genomes[index].copy(), metric_scores=self.stored_scores[index].copy())
+                for index in indices]
@@ -42,3 +42,7 @@ class SearchSpace(Sized):
 
     def random_digit(self, position: int) -> int:
         return random.randrange(self.cardinalities[position])
+
+    def random_solution_matrix(self, amount: int) -> np.ndarray:
+        """Uniformly sampled full solutions, one per row (using numpy's random generator)"""
+        return np.random.randint(0, self.cardinalities, size=(amount, self.dimensions))
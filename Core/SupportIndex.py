@@ -0,0 +1,99 @@
+"""
+The support of a PS is the amount of observations it has in the PRef, ie how many rows of the PRef contain it.
+Many of the PSs generated by the miners have no (or very few) observations, and calculating their metrics is wasteful,
+so this index allows the miners to check the support of a PS much more cheaply than calculating its metrics.
+
+For each (variable, value) pair, the index stores a bitset of the rows of the PRef where that variable has that value,
+so the support of a PS is the popcount of the AND of the bitsets of its fixed variables.
+"""
+import random
+
+import numpy as np
+from numba import njit
+
+from Core.PRef import PRef
+from Core.PS import STAR
+from Core.custom_types import ArrayOfInts, ArrayOfBools
+
+# the amount of bits set in each possible byte
+POPCOUNT_TABLE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int64)
+
+
+@njit
+def count_supports(genomes: np.ndarray,
+                   offsets: np.ndarray,
+                   bitsets: np.ndarray,
+                   popcount_table: np.ndarray,
+                   sample_size: int) -> np.ndarray:
+    amount_of_bytes = bitsets.shape[1]
+    result = np.empty(len(genomes), dtype=np.int64)
+    accumulator = np.empty(amount_of_bytes, dtype=np.uint8)
+    for row in range(len(genomes)):
+        genome = genomes[row]
+        is_first = True
+        for var in range(len(genome)):
+            if genome[var] == STAR:
+                continue
+            bitset = bitsets[offsets[var] + genome[var]]
+            if is_first:
+                accumulator[:] = bitset
+                is_first = False
+            else:
+                for byte in range(amount_of_bytes):
+                    accumulator[byte] &= bitset[byte]
+        if is_first:  # the empty PS appears in every row
+            result[row] = sample_size
+            continue
+        total = 0
+        for byte in range(amount_of_bytes):
+            total += popcount_table[accumulator[byte]]
+        result[row] = total
+    return result
+
+
+class SupportIndex:
+    offsets: ArrayOfInts
+    bitsets: np.ndarray  # one row for each (var, val) pair, each containing the packed bits of the rows of the PRef
+    sample_size: int
+
+    def __init__(self, pRef: PRef):
+        search_space = pRef.search_space
+        self.offsets = search_space.precomputed_offsets[:-1].astype(np.int64)
+        self.sample_size = pRef.sample_size
+
+        one_hot = np.zeros(shape=(search_space.precomputed_offsets[-1], pRef.sample_size), dtype=bool)
+        for var in range(search_space.amount_of_parameters):
+            one_hot[self.offsets[var] + pRef.full_solution_matrix[:, var], np.arange(pRef.sample_size)] = True
+        self.bitsets = np.packbits(one_hot, axis=1)
+
+    def __repr__(self):
+        return f"SupportIndex({self.bitsets.shape[0]} values, {self.sample_size} rows)"
+
+    def get_supports(self, genomes: np.ndarray) -> ArrayOfInts:
+        """The amount of observations of each row of the genome matrix"""
+        genomes = np.asarray(genomes, dtype=np.int64).reshape((-1, len(self.offsets)))
+        return count_supports(genomes, self.offsets, self.bitsets, POPCOUNT_TABLE, self.sample_size)
+
+    def get_support(self, genome: np.ndarray) -> int:
+        return int(self.get_supports(genome)[0])
+
+    def has_enough_support(self, genomes: np.ndarray, min_support: int) -> ArrayOfBools:
+        return self.get_supports(genomes) >= min_support
+
+    def generalise_until_supported(self, genome: np.ndarray, min_support: int) -> np.ndarray:
+        """
+        Repairs a PS by freeing randomly chosen fixed variables, until it has at least min_support observations.
+        Freeing a variable can only increase the support, and the empty PS is observed in every row.
+        """
+        genome = np.array(genome)
+        while self.get_support(genome) < min_support:
+            fixed_variables = np.nonzero(genome != STAR)[0]
+            genome[random.choice(fixed_variables)] = STAR
+        return genome
+
+    def repaired(self, genomes: np.ndarray, min_support: int) -> np.ndarray:
+        """A copy of the genome matrix, where the rows with too little support are generalised"""
+        result = np.array(genomes)
+        for row in np.nonzero(~self.has_enough_support(result, min_support))[0]:
+            result[row] = self.generalise_until_supported(result[row], min_support)
+        return result
@@ -1,7 +1,10 @@
-from typing import Iterable, Any
+from typing import Iterable, Any, Optional
+
+import numpy as np
 
 import utils
 from Core.FSEvaluator import Fitness
+from Core.Hypervolume import IncrementalHypervolume
 
 
 class TerminationCriteria:
@@ -17,6 +20,10 @@ class TerminationCriteria:
     def met(self, **kwargs):
         raise Exception("Implementation of TerminationCriteria does not implement termination_criteria_met")
 
+    def remaining_ps_evaluations(self, ps_evaluations: int) -> Optional[int]:
+        """How many PS evaluations can still happen before this criterion is met, None if it does not limit them"""
+        return None
+
 
 class AsLongAsWanted(TerminationCriteria):
     def __init__(self):
@@ -103,6 +110,11 @@ class UnionOfCriteria(TerminationCriteria):
     def met(self, **kwargs):
         return any(sc.met(**kwargs) for sc in self.subcriteria)
 
+    def remaining_ps_evaluations(self, ps_evaluations: int) -> Optional[int]:
+        limits = [sc.remaining_ps_evaluations(ps_evaluations) for sc in self.subcriteria]
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if len(limits) > 0 else None
+
 
 class FullSolutionEvaluationLimit(TerminationCriteria):
     fs_limit: int
@@ -131,10 +143,13 @@ class PSEvaluationLimit(TerminationCriteria):
     def met(self, **kwargs):
         return kwargs["ps_evaluations"] >= self.ps_limit
 
+    def remaining_ps_evaluations(self, ps_evaluations: int) -> Optional[int]:
+        return max(self.ps_limit - ps_evaluations, 0)
 
-class SearchSpaceIsCovered:
+
+class SearchSpaceIsCovered(TerminationCriteria):
     def __init__(self):
-        pass
+        super().__init__()
 
     def __repr__(self):
         return f"SearchSpaceIsCovered"
@@ -145,9 +160,10 @@ class SearchSpaceIsCovered:
         return all(x > 0 for x in coverage)
 
 
-class ArchiveSizeLimit:
+class ArchiveSizeLimit(TerminationCriteria):
     max_archive_size: int
     def __init__(self, max_archive_size: int):
+        super().__init__()
         self.max_archive_size = max_archive_size
 
 
@@ -156,4 +172,42 @@ class ArchiveSizeLimit:
 
 
     def met(self, **kwargs):
-        return len(kwargs["archive"] > self.max_archive_size)
\ No newline at end of file
+        return len(kwargs["archive"] > self.max_archive_size)
+
+
+class HypervolumeStagnation(TerminationCriteria):
+    """
+    Met when the hypervolume of all the fronts seen so far has improved by less than epsilon (relative to its value)
+    in the last window calls, where each call receives kwargs["front"], a matrix with one row of 3 maximised objectives
+    for each individual (the dominated ones are ignored).
+    Note that this is stateful: each call counts as a generation, so a new criterion should be used for each run.
+    If reference_point is not given, the worst value of each objective in the first front is used.
+    """
+    window: int
+    epsilon: float
+    hypervolume: Optional[IncrementalHypervolume]
+    history: list[float]
+
+    def __init__(self, window: int, epsilon: float, reference_point: Optional[Iterable[float]] = None):
+        super().__init__()
+        self.window = window
+        self.epsilon = epsilon
+        self.hypervolume = None if reference_point is None else IncrementalHypervolume(reference_point)
+        self.history = []
+
+    def __repr__(self):
+        return f"HypervolumeStagnation(window = {self.window}, epsilon = {self.epsilon})"
+
+    def met(self, **kwargs):
+        front = np.asarray(kwargs["front"], dtype=float).reshape((-1, 3))
+        if self.hypervolume is None:
+            if len(front) == 0:
+                return False
+            self.hypervolume = IncrementalHypervolume(np.min(front, axis=0))
+        self.hypervolume.add_many(front)
+        self.history.append(float(self.hypervolume.hypervolume))
+
+        if len(self.history) <= self.window:
+            return False
+        improvement = self.history[-1] - self.history[-1 - self.window]
+        return self.history[-1] > 0 and improvement <= self.epsilon * self.history[-1]
@@ -1,6 +1,13 @@
-from Core.PS import PS
+import random
+import weakref
+from typing import Optional
+
+import numpy as np
+
+from Core.PS import PS, STAR
 from Core.EvaluatedFS import EvaluatedFS
 from Core.PRef import PRef
+from Core.PSMetric.Linkage import Linkage
 
 
 def just_empty(pRef: PRef, quantity: int) -> list[PS]:
@@ -16,3 +23,80 @@ def from_best_of_PRef(pRef: PRef, quantity: int) -> list[PS]:
 
 def from_random(pRef: PRef, quantity: int) -> list[PS]:
     return [PS.random(pRef.search_space) for _ in range(quantity)]
+
+
+def get_linkage_tree(linkage_table: np.ndarray) -> list[list[int]]:
+    """
+    The clusters of variables obtained by agglomerative clustering, where the linkage between two clusters
+    is the average linkage between their variables (UPGMA). The clusters are returned in the order they are merged,
+    so the most tightly linked ones come first. The singletons and the cluster with all the variables are not included.
+    """
+    amount_of_variables = len(linkage_table)
+    clusters: list[list[int]] = [[var] for var in range(amount_of_variables)]
+    similarities = np.array(linkage_table, dtype=float)
+    np.fill_diagonal(similarities, -np.inf)
+    is_active = np.ones(amount_of_variables, dtype=bool)
+
+    merged = []
+    for _ in range(amount_of_variables - 2):
+        masked = np.where(np.outer(is_active, is_active), similarities, -np.inf)
+        a, b = np.unravel_index(np.argmax(masked), masked.shape)
+        size_a, size_b = len(clusters[a]), len(clusters[b])
+
+        # the merged cluster replaces a, and b is deactivated
+        similarities[a, :] = (size_a * similarities[a, :] + size_b * similarities[b, :]) / (size_a + size_b)
+        similarities[:, a] = similarities[a, :]
+        similarities[a, a] = -np.inf
+        is_active[b] = False
+        clusters[a] = clusters[a] + clusters[b]
+        merged.append(sorted(clusters[a]))
+    return merged
+
+
+class LinkageTreeInit:
+    """
+    Generates PSs where the fixed variables are the clusters of a linkage tree (see get_linkage_tree),
+    and the values are taken from a randomly chosen row among the best elite_proportion of the PRef.
+    It's an instance so that the linkage table is calculated once for the PRef, and it can be used as get_init.
+    """
+    elite_proportion: float
+    cached_pRef: Optional[weakref.ref]  # weak, so that the module level instance doesn't keep the PRef alive
+    cached_clusters: Optional[list[list[int]]]
+
+    def __init__(self, elite_proportion: float = 0.1):
+        self.elite_proportion = elite_proportion
+        self.cached_pRef = None
+        self.cached_clusters = None
+
+    def __repr__(self):
+        return f"LinkageTreeInit(elite_proportion = {self.elite_proportion})"
+
+    def __getstate__(self):
+        """The cache is not pickled (eg in the checkpoints), since a weak reference can't be"""
+        return {"elite_proportion": self.elite_proportion, "cached_pRef": None, "cached_clusters": None}
+
+    def get_clusters(self, pRef: PRef) -> list[list[int]]:
+        if self.cached_pRef is None or self.cached_pRef() is not pRef:
+            self.cached_clusters = get_linkage_tree(Linkage.get_linkage_table_fast(pRef))
+            self.cached_pRef = weakref.ref(pRef)
+        return self.cached_clusters
+
+    def get_seed_genomes(self, pRef: PRef, quantity: int) -> np.ndarray:
+        clusters = self.get_clusters(pRef)
+        result = np.full(shape=(quantity, pRef.search_space.amount_of_parameters), fill_value=STAR)
+        if len(clusters) == 0:
+            return result
+
+        amount_of_elite = max(1, int(pRef.sample_size * self.elite_proportion))
+        elite_rows = np.argsort(-pRef.fitness_array, kind="stable")[:amount_of_elite]
+        for genome in result:
+            cluster = random.choice(clusters)
+            row = pRef.full_solution_matrix[random.choice(elite_rows)]
+            genome[cluster] = row[cluster]
+        return result
+
+    def __call__(self, pRef: PRef, quantity: int) -> list[PS]:
+        return [PS(genome) for genome in self.get_seed_genomes(pRef, quantity)]
+
+
+from_linkage_tree = LinkageTreeInit()
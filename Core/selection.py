@@ -1,4 +1,10 @@
+import functools
 import random
+from typing import Callable
+
+import numpy as np
+
+from Core.custom_types import ArrayOfFloats, ArrayOfInts
 
 
 def truncation_selection(population: list, amount: int) -> list:
@@ -10,3 +16,40 @@ def tournament_selection(population: list, amount: int, tournament_size=3) -> li
         return max(random.choices(population, k=tournament_size))  # isn't this beautiful? God bless comparable objects
 
     return [select_one() for _ in range(amount)]
+
+
+"""
+The functions below are the equivalents of the ones above, but they operate on an array of scores
+and return the indices of the selected individuals. These are used by the miners that store populations as arrays.
+"""
+
+
+def truncation_selection_indices(scores: ArrayOfFloats, amount: int) -> ArrayOfInts:
+    return np.argsort(-scores, kind="stable")[:amount]
+
+
+def tournament_selection_indices(scores: ArrayOfFloats, amount: int, tournament_size=3) -> ArrayOfInts:
+    if len(scores) == 0 or amount == 0:
+        return np.zeros(0, dtype=int)
+    contestants = np.array([random.choices(range(len(scores)), k=tournament_size) for _ in range(amount)], dtype=int)
+    winners_within_tournament = np.argmax(scores[contestants], axis=1)
+    return contestants[np.arange(amount), winners_within_tournament]
+
+
+def as_index_based_selection(selection: Callable) -> Callable:
+    """
+    If the selection operator is one of the list based ones, its index based equivalent is returned.
+    The index based ones are returned as they are, and so are the functools.partial of either (eg to set the tournament_size).
+    Other operators raise an exception, since there's no way to tell whether they expect a list or an array of scores
+    """
+    index_based_equivalents = {truncation_selection: truncation_selection_indices,
+                               tournament_selection: tournament_selection_indices}
+    if isinstance(selection, functools.partial):
+        return functools.partial(as_index_based_selection(selection.func), *selection.args, **selection.keywords)
+    if selection in index_based_equivalents:
+        return index_based_equivalents[selection]
+    if selection in index_based_equivalents.values():
+        return selection
+    raise Exception(f"The selection operator {selection} is not recognised, "
+                    f"use one of {[operator.__name__ for operator in index_based_equivalents.values()]} "
+                    f"(or one of their list based equivalents)")
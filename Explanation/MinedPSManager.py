@@ -1,4 +1,4 @@
-from typing import Optional, Literal
+from typing import Optional, Literal, Iterator
 
 import numpy as np
 
@@ -69,11 +69,12 @@ class MinedPSManager:
         with announce(f"Writing the PSs onto {self.mined_ps_file}", self.verbose):
             write_evaluated_pss_to_file(self.cached_pss, self.mined_ps_file)
 
-    def mine_pss(self,
-                 pRef: PRef,
-                 population_size: int,
-                 ps_budget_per_run: int,
-                 ps_budget_in_total: int) -> list[EvaluatedPS]:
+    def mine_pss_iter(self,
+                      pRef: PRef,
+                      population_size: int,
+                      ps_budget_per_run: int,
+                      ps_budget_in_total: int) -> Iterator[list[EvaluatedPS]]:
+        """Yields the catalog found so far (without duplicates and empty PSs) every time the miner finds new PSs"""
         algorithm = SequentialCrowdingMiner(pRef = pRef,
                                             budget_per_run=ps_budget_per_run,
                                             population_size_per_run=population_size,
@@ -83,12 +84,28 @@ class MinedPSManager:
             budget_limit = TerminationCriteria.PSEvaluationLimit(ps_limit=ps_budget_in_total)
             coverage_limit = TerminationCriteria.SearchSpaceIsCovered()
             termination_criterion = budget_limit #TerminationCriteria.UnionOfCriteria(budget_limit, coverage_limit)
-            algorithm.run(termination_criterion, verbose=self.verbose)
 
-        result_ps = algorithm.get_results(None)
-        result_ps = AbstractPSMiner.without_duplicates(result_ps)
-        result_ps = [ps for ps in result_ps if not ps.is_empty()]
+            result_ps = []
+            already_found = set()
+            for new_pss in algorithm.run_iter(termination_criterion, verbose=self.verbose):
+                new_pss = [ps for ps in new_pss if not ps.is_empty() and ps not in already_found]
+                if len(new_pss) == 0:
+                    continue
+                already_found.update(new_pss)
+                result_ps.extend(new_pss)
+                yield result_ps
 
+    def mine_pss(self,
+                 pRef: PRef,
+                 population_size: int,
+                 ps_budget_per_run: int,
+                 ps_budget_in_total: int) -> list[EvaluatedPS]:
+        result_ps = []
+        for result_ps in self.mine_pss_iter(pRef=pRef,
+                                            population_size=population_size,
+                                            ps_budget_per_run=ps_budget_per_run,
+                                            ps_budget_in_total=ps_budget_in_total):
+            pass
         return result_ps
 
 
@@ -97,16 +114,22 @@ class MinedPSManager:
                          population_size: int,
                          ps_budget_per_run: int,
                          ps_budget_in_total: int):
-
+        """
+        The file is rewritten every time new PSs are found, so that the later stages can start on partial results.
+        Each write replaces the file in one go, so the file is always a valid catalog.
+        """
+        self.cached_pss = []
         with announce(f"Mining the partial solutions using the sequential miner"):
-            self.cached_pss = self.mine_pss(pRef=pRef,
-                                                population_size=population_size,
-                                                ps_budget_in_total=ps_budget_in_total,
-                                                ps_budget_per_run=ps_budget_per_run)
-
-
-
-        with announce(f"Writing the PSs onto {self.mined_ps_file}", self.verbose):
+            for pss_so_far in self.mine_pss_iter(pRef=pRef,
+                                                 population_size=population_size,
+                                                 ps_budget_in_total=ps_budget_in_total,
+                                                 ps_budget_per_run=ps_budget_per_run):
+                self.cached_pss = list(pss_so_far)
+                write_evaluated_pss_to_file(self.cached_pss, self.mined_ps_file)
+                if self.verbose:
+                    print(f"Wrote {len(self.cached_pss)} PSs onto {self.mined_ps_file}")
+
+        if len(self.cached_pss) == 0:  # so that the file exists even if nothing was found
             write_evaluated_pss_to_file(self.cached_pss, self.mined_ps_file)
 
 
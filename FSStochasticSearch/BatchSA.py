@@ -0,0 +1,202 @@
+"""
+Many independent runs of simulated annealing, advanced in lock-step.
+
+The current solutions of all the chains are the rows of a matrix, so that each step mutates all of them at once,
+evaluates the candidates with the batch fitness function and decides the Metropolis acceptance for all of them.
+Each chain behaves like a run of SA: it starts from a uniformly random solution, mutates each variable
+with the given probability (1/n by default), accepts the candidate when it's better or with probability
+exp((f_new - f_current) / temperature), and stops when its temperature drops to final_temperature or its trace is full.
+
+The trace of a chain is the list of solutions it accepted (starting from the initial one), as in SA.get_one_with_attempts.
+
+Optionally the chains can exchange temperatures every swap_interval steps (parallel tempering):
+the active chains are sorted by temperature, and neighbouring chains with temperatures T_i, T_j
+and fitnesses f_i, f_j swap with probability min(1, exp((f_j - f_i) * (1/T_i - 1/T_j))).
+This is only useful when the chains have different temperatures, see with_temperature_ladder.
+"""
+from typing import Callable, Optional, Iterable
+
+import numpy as np
+
+from Core.FSEvaluator import FSEvaluator
+from Core.FitnessCache import FitnessCache
+from Core.ParallelFSEvaluator import ParallelFSEvaluator
+from Core.PRef import PRef
+from Core.SearchSpace import SearchSpace
+
+
+class BatchSA:
+    search_space: SearchSpace
+    evaluator: FSEvaluator
+    amount_of_chains: int
+    cooling_coefficient: float
+    mutation_probability: float
+    initial_temperatures: np.ndarray
+    final_temperature: float
+    swap_interval: Optional[int]
+    generator: np.random.Generator
+
+    def __init__(self,
+                 search_space: SearchSpace,
+                 fitness_function: Callable,
+                 amount_of_chains: int,
+                 cooling_coefficient: float = 0.99995,
+                 mutation_probability: Optional[float] = None,
+                 initial_temperatures: Optional[Iterable[float]] = None,
+                 final_temperature: float = 0.01,
+                 swap_interval: Optional[int] = None,
+                 seed: Optional[int] = None,
+                 fitness_cache: Optional[FitnessCache] = None,
+                 executor: Optional[ParallelFSEvaluator] = None):
+        self.search_space = search_space
+        self.evaluator = FSEvaluator(fitness_function, cache=fitness_cache, executor=executor)
+        self.amount_of_chains = amount_of_chains
+        self.cooling_coefficient = cooling_coefficient
+        if mutation_probability is None:
+            mutation_probability = 1 / search_space.amount_of_parameters
+        self.mutation_probability = mutation_probability
+        if initial_temperatures is None:
+            self.initial_temperatures = np.ones(amount_of_chains, dtype=float)
+        else:
+            self.initial_temperatures = np.array(initial_temperatures, dtype=float)
+        if len(self.initial_temperatures) != amount_of_chains:
+            raise Exception(f"BatchSA received {len(self.initial_temperatures)} temperatures for {amount_of_chains} chains")
+        self.final_temperature = final_temperature
+        self.swap_interval = swap_interval
+        self.generator = np.random.default_rng(seed)
+
+    def __repr__(self):
+        return f"BatchSA({self.amount_of_chains} chains, cooling = {self.cooling_coefficient}, swap_interval = {self.swap_interval})"
+
+    @classmethod
+    def with_temperature_ladder(cls,
+                                search_space: SearchSpace,
+                                fitness_function: Callable,
+                                amount_of_chains: int,
+                                highest_temperature: float = 1,
+                                lowest_temperature: float = 0.1,
+                                swap_interval: int = 10,
+                                **kwargs):
+        """Parallel tempering, where the initial temperatures are spread geometrically between the given extremes"""
+        temperatures = np.geomspace(highest_temperature, lowest_temperature, num=amount_of_chains)
+        return cls(search_space=search_space,
+                   fitness_function=fitness_function,
+                   amount_of_chains=amount_of_chains,
+                   initial_temperatures=temperatures,
+                   swap_interval=swap_interval,
+                   **kwargs)
+
+    def get_mutations(self, amount_of_rows: int) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        For each row, each position is chosen with mutation_probability and gets a uniformly random value.
+        Returns the rows, positions and new values of the mutations, where the positions within a row are distinct
+        """
+        amount_of_parameters = self.search_space.amount_of_parameters
+        amounts = self.generator.binomial(amount_of_parameters, self.mutation_probability, size=amount_of_rows)
+        rows = np.repeat(np.arange(amount_of_rows), amounts)
+        positions = self.generator.integers(0, amount_of_parameters, size=len(rows))
+        while True:  # the repeated positions are redrawn, which makes each set of positions equally likely
+            is_repeated = np.ones(len(rows), dtype=bool)
+            is_repeated[np.unique(rows * amount_of_parameters + positions, return_index=True)[1]] = False
+            if not np.any(is_repeated):
+                break
+            positions[is_repeated] = self.generator.integers(0, amount_of_parameters, size=np.sum(is_repeated))
+        cardinalities = self.search_space.cardinalities[positions]
+        new_values = np.floor(self.generator.random(len(rows)) * cardinalities).astype(int)
+        return rows, positions, new_values
+
+    def swap_temperatures(self, temperatures: np.ndarray, fitnesses: np.ndarray, active: np.ndarray, parity: int):
+        """The replica exchange between neighbouring temperatures, which modifies temperatures in place"""
+        chains = np.nonzero(active)[0]
+        chains = chains[np.argsort(temperatures[chains], kind="stable")][parity:]
+        pairs = chains[:len(chains) // 2 * 2].reshape((-1, 2))
+        if len(pairs) == 0:
+            return
+        first, second = pairs[:, 0], pairs[:, 1]
+        exponents = (fitnesses[second] - fitnesses[first]) * (1 / temperatures[first] - 1 / temperatures[second])
+        swaps = self.generator.random(len(pairs)) < np.exp(np.minimum(exponents, 0))
+        first, second = first[swaps], second[swaps]
+        temperatures[first], temperatures[second] = temperatures[second], temperatures[first].copy()
+
+    def run(self,
+            max_trace: Optional[int] = None,
+            max_total_trace: Optional[int] = None,
+            record_traces: bool = True) -> (PRef, PRef):
+        """
+        Runs all the chains until they finish, each keeping at most max_trace accepted solutions,
+        or until the traces add up to max_total_trace.
+        Returns the traces (chain by chain, in order of acceptance) and the best solution found by each chain.
+        When record_traces is False the traces are only counted, and the returned traces only contain the initial solutions
+        """
+        amount_of_chains = self.amount_of_chains
+        current = self.generator.integers(0, self.search_space.cardinalities, size=(amount_of_chains, self.search_space.amount_of_parameters))
+        current_fitnesses = self.evaluator.evaluate_batch(current)
+        best = current.copy()
+        best_fitnesses = current_fitnesses.copy()
+        temperatures = self.initial_temperatures.copy()
+        trace_lengths = np.ones(amount_of_chains, dtype=int)
+
+        # the traces are stored in chunks as they are produced, and sorted by chain at the end
+        trace_chunks = [current.copy()]
+        trace_fitness_chunks = [current_fitnesses.copy()]
+        trace_chain_chunks = [np.arange(amount_of_chains)]
+
+        def is_active() -> np.ndarray:
+            result = temperatures > self.final_temperature
+            if max_trace is not None:
+                result &= trace_lengths < max_trace
+            return result
+
+        active = is_active()
+        iteration = 0
+        while np.any(active) and (max_total_trace is None or np.sum(trace_lengths) < max_total_trace):
+            chains = np.nonzero(active)[0]
+            candidates = current[chains]
+            rows, positions, new_values = self.get_mutations(len(chains))
+            candidates[rows, positions] = new_values
+
+            # the candidates that are the same as the current solution are not evaluated, but still count as evaluations
+            changed = np.any(candidates != current[chains], axis=1)
+            candidate_fitnesses = current_fitnesses[chains]
+            candidate_fitnesses[changed] = self.evaluator.evaluate_batch(candidates[changed])
+            self.evaluator.used_evaluations += int(np.sum(~changed))
+
+            differences = candidate_fitnesses - current_fitnesses[chains]
+            passing_probabilities = np.exp(np.minimum(differences, 0) / temperatures[chains])
+            accepted = (differences > 0) | (self.generator.random(len(chains)) < passing_probabilities)
+
+            accepted_chains = chains[accepted]
+            current[accepted_chains] = candidates[accepted]
+            current_fitnesses[accepted_chains] = candidate_fitnesses[accepted]
+            trace_lengths[accepted_chains] += 1
+            if record_traces:
+                trace_chunks.append(candidates[accepted])
+                trace_fitness_chunks.append(candidate_fitnesses[accepted])
+                trace_chain_chunks.append(accepted_chains)
+
+            improved = current_fitnesses > best_fitnesses
+            best[improved] = current[improved]
+            best_fitnesses[improved] = current_fitnesses[improved]
+
+            temperatures *= self.cooling_coefficient
+            iteration += 1
+            active = is_active()
+            if self.swap_interval is not None and iteration % self.swap_interval == 0:
+                self.swap_temperatures(temperatures, current_fitnesses, active, parity=(iteration // self.swap_interval) % 2)
+
+        trace_chains = np.concatenate(trace_chain_chunks)
+        order = np.argsort(trace_chains, kind="stable")
+        if max_total_trace is not None and len(order) > max_total_trace:
+            # the excess comes from the last step, whose rows are removed starting from the last chain
+            in_last_step = np.zeros(len(trace_chains), dtype=bool)
+            in_last_step[len(trace_chains) - len(trace_chain_chunks[-1]):] = True
+            to_remove = np.nonzero(in_last_step)[0][::-1][:len(order) - max_total_trace]
+            order = order[~np.isin(order, to_remove)]
+
+        traces = PRef(fitness_array=np.concatenate(trace_fitness_chunks)[order],
+                      full_solution_matrix=np.concatenate(trace_chunks)[order],
+                      search_space=self.search_space)
+        bests = PRef(fitness_array=best_fitnesses,
+                     full_solution_matrix=best,
+                     search_space=self.search_space)
+        return traces, bests
@@ -1,12 +1,14 @@
 import heapq
 import random
 from math import floor
-from typing import Callable, TypeAlias
+from typing import Callable, TypeAlias, Optional
 
 from Core import TerminationCriteria
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core.EvaluatedFS import EvaluatedFS
 from Core.FSEvaluator import FSEvaluator
+from Core.FitnessCache import FitnessCache
+from Core.ParallelFSEvaluator import ParallelFSEvaluator
 from Core.FullSolution import FullSolution
 from Core.SearchSpace import SearchSpace
 from FSStochasticSearch.Operators import FSMutationOperator, FSCrossoverOperator, FSSelectionOperator, TournamentSelection, \
@@ -40,7 +42,9 @@ class GA:
                  tournament_size: int,
                  population_size: int,
                  fitness_function: Callable[[FullSolution], float],
-                 starting_population=None):
+                 starting_population=None,
+                 fitness_cache: Optional[FitnessCache] = None,
+                 executor: Optional[ParallelFSEvaluator] = None):
         self.search_space = search_space
         self.mutation_operator = mutation_operator
         self.crossover_operator = crossover_operator
@@ -49,7 +53,7 @@ class GA:
         self.elite_proportion = elite_proportion
         self.tournament_size = tournament_size
         self.population_size = population_size
-        self.evaluator = FSEvaluator(fitness_function)
+        self.evaluator = FSEvaluator(fitness_function, cache=fitness_cache, executor=executor)
 
         if starting_population is None:
             self.current_population = self.get_initial_population()
@@ -73,6 +77,10 @@ class GA:
         return self.selection_operator.select_single(population=self.current_population)
 
     def make_new_child(self) -> EvaluatedFS:
+        """
+        The fitness of the child is None (it is evaluated in the batch of the generation), unless it's an unchanged parent.
+        The fitness_delta is not used here, since a delta per child is slower than its share of the vectorised batch
+        """
         if random.random() < self.crossover_rate:
             # do crossover
             mother = self.select_one().full_solution
@@ -80,14 +88,18 @@ class GA:
 
             child_ps = self.mutation_operator.mutated(self.crossover_operator.crossed(mother, father))
         else:
-            child_ps = self.mutation_operator.mutated(self.select_one().full_solution)
-        return EvaluatedFS(child_ps, 0)
+            parent = self.select_one()
+            child_ps, changes = self.mutation_operator.mutated_with_changes(parent.full_solution)
+            if self.evaluator.supports_fitness_delta and len(changes) == 0:
+                self.evaluator.used_evaluations += 1  # the fitness is known, but it still counts as an evaluation
+                return EvaluatedFS(child_ps, parent.fitness)
+        return EvaluatedFS(child_ps, None)
 
     def make_new_evaluated_population(self) -> list[EvaluatedFS]:
         elite = self.get_elite()
         children = [self.make_new_child()
                     for _ in range(self.population_size - len(elite))]
-        children = self.evaluator.evaluate_population(children)
+        self.evaluator.evaluate_population([child for child in children if child.fitness is None])
         return elite + children
 
     def step(self):
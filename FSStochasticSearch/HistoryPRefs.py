@@ -1,43 +1,71 @@
+from typing import Optional
+
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core import TerminationCriteria
 from Core.EvaluatedFS import EvaluatedFS
+from Core.FSEvaluator import FSEvaluator
+from Core.ParallelFSEvaluator import ParallelFSEvaluator
 from Core.PRef import PRef
-from FSStochasticSearch.GA import GA
+from FSStochasticSearch.BatchSA import BatchSA
 from FSStochasticSearch.Operators import SinglePointFSMutation, TwoPointFSCrossover, TournamentSelection
 from FSStochasticSearch.SA import SA
+from FSStochasticSearch.VectorGA import VectorGA
 
 
 def uniformly_random_distribution_pRef(benchmark_problem: BenchmarkProblem,
-                                       sample_size: int) -> PRef:
+                                       sample_size: int,
+                                       executor: Optional[ParallelFSEvaluator] = None) -> PRef:
+    if executor is not None:
+        evaluator = FSEvaluator(benchmark_problem.fitness_function, executor=executor)
+        return evaluator.generate_pRef_from_search_space(benchmark_problem.search_space, sample_size)
     return benchmark_problem.get_reference_population(sample_size=sample_size)
 
 
 def pRef_from_GA(benchmark_problem: BenchmarkProblem,
                  ga_population_size: int,
-                 sample_size: int) -> PRef:
+                 sample_size: int,
+                 executor: Optional[ParallelFSEvaluator] = None) -> PRef:
     """returns the population obtained by concatenating all the generations the GA will go through"""
-    algorithm = GA(search_space=benchmark_problem.search_space,
-                   mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
-                   crossover_operator=TwoPointFSCrossover(),
-                   selection_operator=TournamentSelection(),
-                   crossover_rate=0.5,
-                   elite_proportion=0.02,
-                   tournament_size=3,
-                   population_size=ga_population_size,
-                   fitness_function=benchmark_problem.fitness_function)
-
-    solutions : list[EvaluatedFS] = []
-    solutions.extend(algorithm.current_population)
-
-    while len(solutions) < sample_size:
+    algorithm = VectorGA(search_space=benchmark_problem.search_space,
+                         mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
+                         crossover_operator=TwoPointFSCrossover(),
+                         selection_operator=TournamentSelection(),
+                         crossover_rate=0.5,
+                         elite_proportion=0.02,
+                         tournament_size=3,
+                         population_size=ga_population_size,
+                         fitness_function=benchmark_problem.fitness_function,
+                         executor=executor)
+
+    generations = [algorithm.get_current_pRef()]
+
+    while sum(generation.sample_size for generation in generations) < sample_size:
         algorithm.step()
-        solutions.extend(algorithm.current_population)
+        generations.append(algorithm.get_current_pRef())
 
-    return PRef.from_evaluated_full_solutions(solutions, benchmark_problem.search_space)
+    return PRef.concat(generations)
 
 def pRef_from_SA(benchmark_problem: BenchmarkProblem,
                  sample_size: int,
-                 max_trace: int) -> PRef:
+                 max_trace: int,
+                 amount_of_chains: Optional[int] = None) -> PRef:
+    """
+    Returns the traces of runs of SA, one after the other.
+    When amount_of_chains is given, that many runs are advanced together using BatchSA, which is much faster,
+    but since the traces are collected as they are produced each of them covers less of the cooling schedule.
+    """
+    if amount_of_chains is not None:
+        traces = []
+        remaining = sample_size
+        while remaining > 0:
+            algorithm = BatchSA(fitness_function=benchmark_problem.fitness_function,
+                                search_space=benchmark_problem.search_space,
+                                amount_of_chains=amount_of_chains,
+                                cooling_coefficient=0.99995)
+            traces.append(algorithm.run(max_trace=max_trace, max_total_trace=remaining)[0])
+            remaining -= traces[-1].sample_size
+        return PRef.concat(traces)
+
     algorithm = SA(fitness_function=benchmark_problem.fitness_function,
                    search_space=benchmark_problem.search_space,
                    mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
@@ -58,19 +86,21 @@ def pRef_from_SA(benchmark_problem: BenchmarkProblem,
 
 def pRef_from_GA_best(benchmark_problem: BenchmarkProblem,
                       fs_evaluation_budget: int,
-                      sample_size: int) -> PRef:
+                      sample_size: int,
+                      executor: Optional[ParallelFSEvaluator] = None) -> PRef:
     """
     Returns the population of the last iteration of the algorithm, after having used the given evaluation budget.
     """
-    algorithm =  GA(search_space=benchmark_problem.search_space,
-                   mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
-                   crossover_operator=TwoPointFSCrossover(),
-                   selection_operator=TournamentSelection(),
-                   crossover_rate=0.5,
-                   elite_proportion=0.02,
-                   tournament_size=3,
-                   population_size=sample_size,
-                   fitness_function=benchmark_problem.fitness_function)
+    algorithm = VectorGA(search_space=benchmark_problem.search_space,
+                         mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
+                         crossover_operator=TwoPointFSCrossover(),
+                         selection_operator=TournamentSelection(),
+                         crossover_rate=0.5,
+                         elite_proportion=0.02,
+                         tournament_size=3,
+                         population_size=sample_size,
+                         fitness_function=benchmark_problem.fitness_function,
+                         executor=executor)
 
 
     algorithm.run(termination_criteria=TerminationCriteria.FullSolutionEvaluationLimit(fs_evaluation_budget))
@@ -81,12 +111,11 @@ def pRef_from_GA_best(benchmark_problem: BenchmarkProblem,
 def pRef_from_SA_best(benchmark_problem: BenchmarkProblem,
                  sample_size: int) -> PRef:
     """returns only the end results of each run of SA. There will be _sample\_size_ runs in total.
-    Note that this is significantly slower that using all of the attempts"""
+    The runs are advanced together using BatchSA, but this is still slower than using all of the attempts"""
 
-    algorithm = SA(fitness_function=benchmark_problem.fitness_function,
-                   search_space=benchmark_problem.search_space,
-                   mutation_operator=SinglePointFSMutation(benchmark_problem.search_space),
-                   cooling_coefficient=0.9995)
+    algorithm = BatchSA(fitness_function=benchmark_problem.fitness_function,
+                        search_space=benchmark_problem.search_space,
+                        amount_of_chains=sample_size,
+                        cooling_coefficient=0.9995)
 
-    solutions = [algorithm.get_one() for _ in range(sample_size)]
-    return PRef.from_evaluated_full_solutions(solutions, benchmark_problem.search_space)
+    return algorithm.run(record_traces=False)[1]
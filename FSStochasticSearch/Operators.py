@@ -1,6 +1,9 @@
 import heapq
+import math
 import random
 
+import numpy as np
+
 from Core.FullSolution import FullSolution
 from Core.SearchSpace import SearchSpace
 
@@ -20,6 +23,11 @@ class FSMutationOperator:
     def mutated(self, fs: FullSolution) -> FullSolution:
         raise Exception(f"The class {self.__repr__()} does not implement .mutated")
 
+    def mutated_with_changes(self, fs: FullSolution) -> (FullSolution, np.ndarray):
+        """The mutated solution and the positions that were changed, so that a single point change can use fitness_delta"""
+        result = self.mutated(fs)
+        return result, np.nonzero(result.values != fs.values)[0]
+
 
 class SinglePointFSMutation(FSMutationOperator):
     probability: float
@@ -31,12 +39,33 @@ class SinglePointFSMutation(FSMutationOperator):
             self.probability = probability
 
 
-    def mutated(self, fs: FullSolution) -> FullSolution:
+    def get_positions_to_mutate(self) -> list[int]:
+        """
+        Each position is chosen independently with self.probability, but instead of checking each of them
+        the gaps between the chosen positions are sampled (they are geometrically distributed)
+        """
+        amount_of_parameters = self.search_space.amount_of_parameters
+        if self.probability >= 1:
+            return list(range(amount_of_parameters))
+        if self.probability <= 0:
+            return []
+        log_of_failure = math.log(1 - self.probability)
+        positions = []
+        position = -1
+        while True:
+            position += 1 + int(math.log(1 - random.random()) / log_of_failure)
+            if position >= amount_of_parameters:
+                return positions
+            positions.append(position)
+
+    def mutated_with_changes(self, fs: FullSolution) -> (FullSolution, np.ndarray):
         new_values = fs.values.copy()
-        for index, _ in enumerate(fs.values):
-            if random.random() < self.probability:
-                new_values[index] = random.randrange(self.search_space.cardinalities[index])
-        return FullSolution(new_values)
+        for index in self.get_positions_to_mutate():
+            new_values[index] = random.randrange(self.search_space.cardinalities[index])
+        return FullSolution(new_values), np.nonzero(new_values != fs.values)[0]
+
+    def mutated(self, fs: FullSolution) -> FullSolution:
+        return self.mutated_with_changes(fs)[0]
 
 
     def __repr__(self):
@@ -1,11 +1,12 @@
 import copy
 import random
-from typing import Callable
+from typing import Callable, Optional
 
 import numpy as np
 
 from Core.EvaluatedFS import EvaluatedFS
 from Core.FSEvaluator import FSEvaluator
+from Core.FitnessCache import FitnessCache
 from Core.FullSolution import FullSolution
 
 from FSStochasticSearch.Operators import FSMutationOperator
@@ -24,30 +25,60 @@ class SA:
                  search_space: SearchSpace,
                  fitness_function: Callable,
                  mutation_operator: FSMutationOperator,
-                 cooling_coefficient = 0.99995):
+                 cooling_coefficient = 0.99995,
+                 fitness_cache: Optional[FitnessCache] = None):
         self.search_space = search_space
-        self.evaluator = FSEvaluator(fitness_function)
+        self.evaluator = FSEvaluator(fitness_function, cache=fitness_cache)
 
         self.mutation_operator = mutation_operator
         self.cooling_coefficient = cooling_coefficient
 
 
 
+    def get_candidate(self, current_individual: EvaluatedFS, delta_state) -> (EvaluatedFS, Optional[list[tuple[int, int]]]):
+        """
+        Mutates the current individual, and when at most one variable changed (and the problem supports it)
+        the fitness is calculated using fitness_delta, in which case the changes [(var, new_val)] are also returned
+        """
+        new_candidate_solution, changes = self.mutation_operator.mutated_with_changes(current_individual.full_solution)
+        if self.evaluator.supports_fitness_delta and len(changes) == 0:
+            self.evaluator.used_evaluations += 1  # the fitness is known, but it still counts as an evaluation
+            return EvaluatedFS(new_candidate_solution, current_individual.fitness), []
+        if self.evaluator.supports_fitness_delta and len(changes) == 1:
+            var = int(changes[0])
+            new_val = int(new_candidate_solution.values[var])
+            delta = self.evaluator.evaluate_delta(current_individual.full_solution, var, new_val, delta_state)
+            return EvaluatedFS(new_candidate_solution, current_individual.fitness + delta), [(var, new_val)]
+
+        new_fitness = self.evaluator.evaluate(new_candidate_solution)
+        return EvaluatedFS(new_candidate_solution, new_fitness), None
+
+    def get_delta_state_after_move(self, current_individual: EvaluatedFS, new_individual: EvaluatedFS,
+                                   changes: Optional[list[tuple[int, int]]], delta_state):
+        """The delta state for new_individual, which is updated incrementally if the changes are known"""
+        if not self.evaluator.supports_fitness_delta:
+            return None
+        if changes is None:
+            return self.evaluator.get_delta_state(new_individual.full_solution)
+        for var, new_val in changes:
+            delta_state = self.evaluator.apply_delta(current_individual.full_solution, var, new_val, delta_state)
+        return delta_state
+
     def get_one(self):
         current_individual = EvaluatedFS(FullSolution.random(self.search_space), 0)
         current_individual.fitness = self.evaluator.evaluate(current_individual.full_solution)
+        delta_state = self.get_delta_state_after_move(current_individual, current_individual, None, None)
 
         current_best = current_individual
 
         temperature = 1
 
         while temperature > 0.01:
-            new_candidate_solution = self.mutation_operator.mutated(current_individual.full_solution)
-            new_fitness = self.evaluator.evaluate(new_candidate_solution)
-            new_candidate = EvaluatedFS(new_candidate_solution, new_fitness)
+            new_candidate, changes = self.get_candidate(current_individual, delta_state)
 
             passing_probability = acceptance_proability(new_candidate.fitness, current_individual.fitness, temperature)
             if new_candidate > current_individual or random.random() < passing_probability:
+                delta_state = self.get_delta_state_after_move(current_individual, new_candidate, changes, delta_state)
                 current_individual = new_candidate
                 if current_individual > current_best:
                     current_best = current_individual
@@ -61,18 +92,18 @@ class SA:
         trace = []
         current_individual = EvaluatedFS(FullSolution.random(self.search_space), 0)
         current_individual.fitness = self.evaluator.evaluate(current_individual.full_solution)
+        delta_state = self.get_delta_state_after_move(current_individual, current_individual, None, None)
 
         #current_best = current_individual
         trace.append(copy.copy(current_individual))
         temperature = 1
 
         while temperature > 0.01 and len(trace) < max_trace:
-            new_candidate_solution = self.mutation_operator.mutated(current_individual.full_solution)
-            new_fitness = self.evaluator.evaluate(new_candidate_solution)
-            new_candidate = EvaluatedFS(new_candidate_solution, new_fitness)
+            new_candidate, changes = self.get_candidate(current_individual, delta_state)
 
             passing_probability = acceptance_proability(new_candidate.fitness, current_individual.fitness, temperature)
             if new_candidate > current_individual or random.random() < passing_probability:
+                delta_state = self.get_delta_state_after_move(current_individual, new_candidate, changes, delta_state)
                 current_individual = new_candidate
                 trace.append(copy.copy(current_individual))
                 #if current_individual > current_best:
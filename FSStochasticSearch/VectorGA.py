@@ -0,0 +1,174 @@
+"""
+The same generational GA as GA, where the population is an int matrix (one row per individual) and a fitness vector.
+
+Each generation keeps the elite, and produces the rest of the population as a single batch of children:
+    - the parents are chosen by tournaments, all at once
+    - with probability crossover_rate a child is the two point crossover of two parents, otherwise it's a copy of one parent
+    - then each variable of each child is mutated with the probability of the mutation operator
+    - the children are evaluated with the batch fitness function
+
+The operators are given as in GA, but only their parameters are used, so only
+SinglePointFSMutation, TwoPointFSCrossover and TournamentSelection are supported.
+"""
+from math import floor
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from Core import TerminationCriteria
+from Core.EvaluatedFS import EvaluatedFS
+from Core.FSEvaluator import FSEvaluator
+from Core.FitnessCache import FitnessCache
+from Core.ParallelFSEvaluator import ParallelFSEvaluator
+from Core.FullSolution import FullSolution
+from Core.PRef import PRef
+from Core.SearchSpace import SearchSpace
+from FSStochasticSearch.GA import Population
+from FSStochasticSearch.Operators import FSMutationOperator, FSCrossoverOperator, FSSelectionOperator, \
+    SinglePointFSMutation, TwoPointFSCrossover, TournamentSelection
+
+
+class PopulationView(Sequence):
+    """The rows of a population matrix as EvaluatedFSs, which are only built when they are accessed"""
+    population_matrix: np.ndarray
+    fitnesses: np.ndarray
+
+    def __init__(self, population_matrix: np.ndarray, fitnesses: np.ndarray):
+        self.population_matrix = population_matrix
+        self.fitnesses = fitnesses
+
+    def __len__(self):
+        return len(self.fitnesses)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return EvaluatedFS(FullSolution(self.population_matrix[index]), float(self.fitnesses[index]))
+
+
+class VectorGA:
+    search_space: SearchSpace
+    mutation_probability: float
+    crossover_rate: float
+    selection_tournament_size: int
+
+    elite_proportion: float
+    tournament_size: int
+    population_size: int
+
+    evaluator: FSEvaluator
+    generator: np.random.Generator
+
+    population_matrix: np.ndarray
+    fitnesses: np.ndarray
+
+    def __init__(self,
+                 search_space: SearchSpace,
+                 mutation_operator: FSMutationOperator,
+                 crossover_operator: FSCrossoverOperator,
+                 selection_operator: FSSelectionOperator,
+                 crossover_rate: float,
+                 elite_proportion: float,
+                 tournament_size: int,
+                 population_size: int,
+                 fitness_function: Callable[[FullSolution], float],
+                 starting_population: Optional[Population] = None,
+                 seed: Optional[int] = None,
+                 fitness_cache: Optional[FitnessCache] = None,
+                 executor: Optional[ParallelFSEvaluator] = None):
+        if not isinstance(mutation_operator, SinglePointFSMutation):
+            raise Exception(f"VectorGA only supports SinglePointFSMutation, but received {mutation_operator}")
+        if not isinstance(crossover_operator, TwoPointFSCrossover):
+            raise Exception(f"VectorGA only supports TwoPointFSCrossover, but received {crossover_operator}")
+        if not isinstance(selection_operator, TournamentSelection):
+            raise Exception(f"VectorGA only supports TournamentSelection, but received {selection_operator}")
+
+        self.search_space = search_space
+        self.mutation_probability = mutation_operator.probability
+        self.selection_tournament_size = selection_operator.tournament_size  # as in GA, this is the one that is used
+        self.crossover_rate = crossover_rate
+        self.elite_proportion = elite_proportion
+        self.tournament_size = tournament_size
+        self.population_size = population_size
+        self.evaluator = FSEvaluator(fitness_function, cache=fitness_cache, executor=executor)
+        self.generator = np.random.default_rng(seed)
+
+        if starting_population is None:
+            self.population_matrix = self.generator.integers(0, search_space.cardinalities,
+                                                             size=(population_size, search_space.amount_of_parameters))
+        else:
+            self.population_matrix = np.array([individual.full_solution.values for individual in starting_population])
+
+        self.fitnesses = self.evaluator.evaluate_batch(self.population_matrix)
+
+    def __repr__(self):
+        return f"VectorGA(population_size = {self.population_size}, crossover_rate = {self.crossover_rate})"
+
+    @property
+    def current_population(self) -> Population:
+        return list(PopulationView(self.population_matrix, self.fitnesses))
+
+    def get_current_pRef(self) -> PRef:
+        return PRef(fitness_array=self.fitnesses.copy(),
+                    full_solution_matrix=self.population_matrix.copy(),
+                    search_space=self.search_space)
+
+    def get_elite_indices(self) -> np.ndarray:
+        amount = floor(self.elite_proportion * len(self.fitnesses))
+        return np.argsort(-self.fitnesses, kind="stable")[:amount]
+
+    def select(self, amount: int) -> np.ndarray:
+        """The indices of the winners of amount tournaments, where the first of the best contestants wins"""
+        contestants = self.generator.integers(0, len(self.fitnesses), size=(amount, self.selection_tournament_size))
+        return contestants[np.arange(amount), np.argmax(self.fitnesses[contestants], axis=1)]
+
+    def make_children(self, amount: int) -> np.ndarray:
+        amount_of_parameters = self.search_space.amount_of_parameters
+        mothers = self.population_matrix[self.select(amount)]
+        fathers = self.population_matrix[self.select(amount)]
+
+        # the children that don't use crossover take the whole genome from the mother
+        uses_crossover = self.generator.random(amount) < self.crossover_rate
+        cuts = np.sort(self.generator.integers(0, amount_of_parameters, size=(amount, 2)), axis=1)
+        positions = np.arange(amount_of_parameters)
+        from_father = (positions >= cuts[:, [0]]) & (positions < cuts[:, [1]]) & uses_crossover.reshape((-1, 1))
+        children = np.where(from_father, fathers, mothers)
+
+        is_mutated = self.generator.random(children.shape) < self.mutation_probability
+        new_values = np.floor(self.generator.random(children.shape) * self.search_space.cardinalities).astype(int)
+        return np.where(is_mutated, new_values, children)
+
+    def step(self):
+        elite = self.get_elite_indices()
+        children = self.make_children(max(self.population_size - len(elite), 0))
+        self.population_matrix = np.vstack([self.population_matrix[elite], children])
+        self.fitnesses = np.concatenate([self.fitnesses[elite], self.evaluator.evaluate_batch(children)])
+
+    def run(self,
+            termination_criteria: TerminationCriteria.TerminationCriteria,
+            show_every_generation=False):
+        iteration = 0
+
+        def termination_criteria_met():
+            return termination_criteria.met(iterations=iteration,
+                                            fs_evaluations=self.evaluator.used_evaluations,
+                                            evaluated_population=PopulationView(self.population_matrix, self.fitnesses),
+                                            best_fs_fitness=np.max(self.fitnesses))
+
+        while not termination_criteria_met():
+            if show_every_generation:
+                self.show_current_state()
+            self.step()
+            iteration += 1
+
+    def get_current_best(self) -> EvaluatedFS:
+        best_index = int(np.argmax(self.fitnesses))
+        return EvaluatedFS(FullSolution(self.population_matrix[best_index]), float(self.fitnesses[best_index]))
+
+    def show_current_state(self):
+        print(f"The current best fitness is {self.get_current_best()}.")
+
+    def get_results(self, quantity_returned: int) -> Population:
+        indices = np.argsort(-self.fitnesses, kind="stable")[:quantity_returned]
+        return [EvaluatedFS(FullSolution(self.population_matrix[index]), float(self.fitnesses[index]))
+                for index in indices]
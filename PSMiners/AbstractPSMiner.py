@@ -1,7 +1,8 @@
 import heapq
 import random
+import threading
 from math import ceil
-from typing import Optional, TypeAlias
+from typing import Optional, TypeAlias, Iterator
 
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core.EvaluatedPS import EvaluatedPS
@@ -18,10 +19,14 @@ ResultsAsJSON: TypeAlias = dict
 
 class AbstractPSMiner:
     pRef: PRef
+    streamed_results: list[EvaluatedPS]  # what run_iter has yielded so far, guarded by results_lock
+    results_lock: threading.Lock
 
     def __init__(self,
                  pRef: PRef):
         self.pRef = pRef
+        self.streamed_results = []
+        self.results_lock = threading.Lock()
 
 
     def __repr__(self):
@@ -102,6 +107,24 @@ class AbstractPSMiner:
     def get_results(self, amount: Optional[int]) -> list[EvaluatedPS]:
         raise Exception(f"An implementation of PSMiner({self.__repr__()}) does not implement get_results")
 
+    def run_iter(self, termination_criteria: TerminationCriteria) -> Iterator[list[EvaluatedPS]]:
+        """
+        Like .run, but it yields the newly archived PSs as soon as they are found, so that they can be used
+        before the budget is spent. Implementations should pass each batch through publish_results before yielding it.
+        """
+        raise Exception(f"An implementation of PSMiner ({self.__repr__()}) does not implement run_iter")
+
+    def publish_results(self, new_results: list[EvaluatedPS]) -> list[EvaluatedPS]:
+        """Makes the new results visible to results_so_far, and returns them"""
+        with self.results_lock:
+            self.streamed_results.extend(new_results)
+        return new_results
+
+    def results_so_far(self) -> list[EvaluatedPS]:
+        """A snapshot of the results yielded by run_iter so far, which is safe to call from another thread"""
+        with self.results_lock:
+            return list(self.streamed_results)
+
     @staticmethod
     def get_best_n(n: int, population: Population) -> Population:
         return heapq.nlargest(n=n, iterable=population)
@@ -110,6 +133,13 @@ class AbstractPSMiner:
     def without_duplicates(population: Population) -> Population:
         return list(set(population))
 
+    def get_checkpoint_state(self) -> dict:
+        raise Exception(f"An implementation of PSMiner ({self.__repr__()}) does not implement get_checkpoint_state")
+
+    @classmethod
+    def resume_from(cls, checkpoint: str):
+        raise Exception("An implementation of PSMiner does not implement .resume_from")
+
     def get_parameters_as_dict(self) -> dict:
         raise Exception(f"An implementation of PSMiner ({self.__repr__}) does not implement get_parameters_as_dict")
 
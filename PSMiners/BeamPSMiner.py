@@ -0,0 +1,154 @@
+"""
+A lighter alternative to ArchivePSMiner, which keeps a beam of fixed width for each order of PS.
+Starting from the empty PS, at each level
+    - the whole specialisation neighbourhood of the beam is generated as a PSPopulation
+    - the duplicates (the same PS can be reached from many parents) are removed using a hashed set of the packed rows
+    - the neighbourhood is evaluated in a single batch, in parallel if workers are available
+    - the beam becomes the top beam_width PSs by aggregated score (as in ArchivePSMiner, relative to the neighbourhood)
+Since a specialisation always has one more fixed variable than its parent, the visited set only needs to contain
+the current level, and the memory used is O(beam_width * amount_of_parameters).
+The beams of all the levels form the catalog.
+"""
+from typing import Optional, Iterator
+
+import numpy as np
+
+from Core.ArchivePSMiner import get_aggregated_scores
+from Core.EvaluatedPS import EvaluatedPS
+from Core.PRef import PRef
+from Core.PS import PS
+from Core.PSMetric.Atomicity import Atomicity
+from Core.PSMetric.MeanFitness import MeanFitness
+from Core.PSMetric.Metric import Metric
+from Core.PSMetric.Simplicity import Simplicity
+from Core.PSPopulation import PSPopulation, PSArchive
+from Core.ParallelPSEvaluator import ParallelPSEvaluator
+from Core.TerminationCriteria import TerminationCriteria
+from PSMiners.AbstractPSMiner import AbstractPSMiner
+
+
+class BeamPSMiner(AbstractPSMiner):
+    metrics: list[Metric]
+    beam_width: int
+
+    beam: PSPopulation  # the PSs of the current order which will be expanded
+    catalog: PSArchive  # the beams of all the previous orders
+
+    used_evaluations: int
+    iterations: int
+    parallel_evaluator: Optional[ParallelPSEvaluator]
+
+    def __init__(self,
+                 pRef: PRef,
+                 metrics: list[Metric],
+                 beam_width: int,
+                 workers: Optional[int] = None):
+        super().__init__(pRef=pRef)
+        self.metrics = metrics
+        self.beam_width = beam_width
+
+        self.parallel_evaluator = None
+        if workers is not None and workers > 1:  # the workers receive the metrics before set_pRef is called on them
+            self.parallel_evaluator = ParallelPSEvaluator(pRef=self.pRef, metrics=self.metrics, workers=workers)
+        for metric in self.metrics:
+            metric.set_pRef(self.pRef)
+
+        self.used_evaluations = 0
+        self.iterations = 0
+        self.beam = PSPopulation.from_pss([PS.empty(self.search_space)],
+                                          search_space=self.search_space,
+                                          amount_of_metrics=len(self.metrics))
+        self.beam = self.evaluate_individuals(self.beam)
+        self.catalog = PSArchive(self.search_space, amount_of_metrics=len(self.metrics))
+
+    def __repr__(self):
+        return f"BeamPSMiner(beam_width = {self.beam_width})"
+
+    def get_used_evaluations(self) -> int:
+        return self.used_evaluations
+
+    def evaluate_individuals(self, population: PSPopulation) -> PSPopulation:
+        """Calculates the metrics of all the individuals in a single batch"""
+        if self.parallel_evaluator is not None:
+            population.metric_scores = self.parallel_evaluator.evaluate(population.genomes)
+        else:
+            for index in range(len(population)):
+                individual = population.ps_at(index)
+                population.metric_scores[index] = [metric.get_single_score(individual) for metric in self.metrics]
+        self.used_evaluations += len(population)
+        return population
+
+    @staticmethod
+    def without_visited(population: PSPopulation) -> PSPopulation:
+        """Keeps the first occurrence of each PS, using a hashed set of the rows"""
+        visited = set()
+        is_new = np.zeros(len(population), dtype=bool)
+        for index, key in enumerate(population.row_keys()):
+            if key not in visited:
+                visited.add(key)
+                is_new[index] = True
+        return population.subset(is_new)
+
+    def step(self, max_evaluations: Optional[int] = None) -> PSPopulation:
+        """
+        Replaces the beam with the best PSs among its specialisations, at most max_evaluations are evaluated.
+        Returns the PSs that were added to the catalog (ie the previous beam)
+        """
+        newly_catalogued = self.catalog.add(self.beam)
+
+        neighbourhood = self.without_visited(self.beam.specialisations(self.search_space))
+        if max_evaluations is not None and len(neighbourhood) > max_evaluations:
+            # the beam is sorted by aggregated score, so the neighbours of the best parents are kept
+            neighbourhood = neighbourhood.subset(np.arange(max_evaluations))
+        neighbourhood = self.evaluate_individuals(neighbourhood)
+
+        if len(neighbourhood) > 0:
+            neighbourhood.aggregated_scores = get_aggregated_scores(neighbourhood.metric_scores, self.metrics)
+        self.beam = neighbourhood.top(self.beam_width).sorted_by_aggregated_score()
+        return newly_catalogued
+
+    def run(self, termination_criteria: TerminationCriteria, verbose=False):
+        for _ in self.run_iter(termination_criteria, verbose=verbose):
+            pass
+
+    def run_iter(self, termination_criteria: TerminationCriteria, verbose=False) -> Iterator[list[EvaluatedPS]]:
+        """Like .run, but each beam is yielded as soon as it enters the catalog"""
+        def should_terminate():
+            return termination_criteria.met(iterations=self.iterations,
+                                            ps_evaluations=self.get_used_evaluations()) or len(self.beam) == 0
+
+        while not should_terminate():
+            newly_catalogued = self.step(max_evaluations=termination_criteria.remaining_ps_evaluations(self.get_used_evaluations()))
+            self.iterations += 1
+            if verbose:
+                print(f"Beam of order {self.iterations} has {len(self.beam)} PSs, used budget is {self.used_evaluations}")
+            if len(newly_catalogued) > 0:
+                yield self.publish_results(newly_catalogued.to_evaluated_pss())
+
+        # the last beam is also part of the results
+        newly_catalogued = self.catalog.add(self.beam)
+        if len(newly_catalogued) > 0:
+            yield self.publish_results(newly_catalogued.to_evaluated_pss())
+
+    def close(self):
+        """Stops the worker processes, if there are any"""
+        if self.parallel_evaluator is not None:
+            self.parallel_evaluator.close()
+            self.parallel_evaluator = None
+
+    def get_results(self, amount: Optional[int] = None) -> list[EvaluatedPS]:
+        """The best PSs in the catalog, where the aggregated scores are relative to the whole catalog"""
+        catalog = self.catalog.as_population()
+        if amount is None:
+            amount = len(catalog)
+        if len(catalog) == 0:
+            return []
+        catalog.aggregated_scores = get_aggregated_scores(catalog.metric_scores, self.metrics)
+        return catalog.top(amount).sorted_by_aggregated_score().to_evaluated_pss()
+
+    @classmethod
+    def with_default_settings(cls, pRef: PRef, workers: Optional[int] = None):
+        return cls(pRef=pRef,
+                   metrics=[Simplicity(), MeanFitness(), Atomicity()],
+                   beam_width=50,
+                   workers=workers)
@@ -0,0 +1,168 @@
+"""
+An exact miner for the k PSs with the highest mean fitness, among those with at least min_support observations.
+
+If a PS has the rows R in the PRef, any of its specialisations with at least m = min_support observations
+has a mean fitness which is at most the mean of the m highest fitnesses in R.
+This optimistic bound allows a best-first search over the PS lattice: the PSs are kept in a priority queue
+ordered by their bound, and a PS is expanded only when its bound can still beat the current k-th best.
+When the queue is exhausted (or the best bound in the queue can't beat the k-th best), the catalog is provably optimal.
+
+Like in LevelWisePSMiner, each PS is generated only once, by fixing the variables after its last fixed variable.
+This is useful to validate the heuristic miners.
+"""
+import heapq
+import itertools
+from typing import Optional, Iterator
+
+import numpy as np
+
+from Core.EvaluatedPS import EvaluatedPS
+from Core.PRef import PRef
+from Core.PS import PS
+from Core.PSMetric.Classic3 import Classic3PSEvaluator
+from Core.TerminationCriteria import TerminationCriteria
+from PSMiners.AbstractPSMiner import AbstractPSMiner
+from PSMiners.LevelWisePSMiner import get_supported_children, get_rows_of_child
+
+
+class BranchAndBoundPSMiner(AbstractPSMiner):
+    k: int
+    min_support: int
+
+    used_evaluations: int
+    expanded_nodes: int
+
+    # the queue contains (-bound, tiebreaker, genome, last fixed variable, rows)
+    queue: list[(float, int, np.ndarray, int, np.ndarray)]
+    # the best PSs found so far, as a min-heap of (mean fitness, tiebreaker, genome)
+    best_found: list[(float, int, np.ndarray)]
+
+    def __init__(self,
+                 pRef: PRef,
+                 k: int,
+                 min_support: int):
+        super().__init__(pRef=pRef)
+        if min_support < 1:
+            raise Exception(f"The min_support for BranchAndBoundPSMiner must be at least 1, but it is {min_support}")
+        self.k = k
+        self.min_support = min_support
+
+        self.used_evaluations = 0
+        self.expanded_nodes = 0
+        self.tiebreaker = itertools.count()
+
+        self.queue = []
+        self.best_found = []
+        empty = PS.empty(self.search_space).values
+        all_rows = np.arange(self.pRef.sample_size)
+        self.push_to_queue(empty, -1, all_rows)
+
+    def __repr__(self):
+        return f"BranchAndBoundPSMiner(k = {self.k}, min_support = {self.min_support})"
+
+    def get_used_evaluations(self) -> int:
+        return self.used_evaluations
+
+    def get_optimistic_bound(self, rows: np.ndarray) -> float:
+        """The mean of the min_support highest fitnesses in the rows"""
+        fitnesses = self.pRef.fitness_array[rows]
+        amount = len(fitnesses) - self.min_support
+        return float(np.mean(np.partition(fitnesses, amount)[amount:]))
+
+    @property
+    def threshold(self) -> float:
+        """The mean fitness that a PS has to exceed to enter the catalog"""
+        if len(self.best_found) < self.k:
+            return -np.inf
+        return self.best_found[0][0]
+
+    def push_to_queue(self, genome: np.ndarray, last_fixed_variable: int, rows: np.ndarray):
+        bound = self.get_optimistic_bound(rows)
+        if bound > self.threshold:
+            heapq.heappush(self.queue, (-bound, next(self.tiebreaker), genome, last_fixed_variable, rows))
+
+    def register_found(self, genome: np.ndarray, mean_fitness: float):
+        item = (mean_fitness, next(self.tiebreaker), genome)
+        if len(self.best_found) < self.k:
+            heapq.heappush(self.best_found, item)
+        elif mean_fitness > self.threshold:
+            heapq.heapreplace(self.best_found, item)
+
+    def can_improve(self) -> bool:
+        return len(self.queue) > 0 and -self.queue[0][0] > self.threshold
+
+    @property
+    def is_proven_optimal(self) -> bool:
+        """True when the search is complete, and therefore the catalog contains the true top k"""
+        return not self.can_improve()
+
+    def step(self):
+        """Expands the PS with the highest bound"""
+        _, _, genome, last_fixed_variable, rows = heapq.heappop(self.queue)
+        self.expanded_nodes += 1
+        children = get_supported_children(self.pRef, last_fixed_variable, rows, self.min_support,
+                                          weights=[self.pRef.fitness_array])
+        if children is None:
+            return
+        variables, values, supports, (fitness_sums,) = children
+        genomes = np.repeat(genome.reshape((1, -1)), len(variables), axis=0)
+        genomes[np.arange(len(variables)), variables] = values
+        mean_fitnesses = fitness_sums / supports
+        self.used_evaluations += len(genomes)
+
+        for child, mean_fitness in zip(genomes, mean_fitnesses):
+            self.register_found(child, mean_fitness)
+        for child, variable, value in zip(genomes, variables, values):
+            self.push_to_queue(child, variable, get_rows_of_child(self.pRef, rows, variable, value))
+
+    def run(self, termination_criteria: TerminationCriteria, verbose=False):
+        for _ in self.run_iter(termination_criteria, verbose=verbose):
+            pass
+
+    def run_iter(self, termination_criteria: TerminationCriteria, verbose=False) -> Iterator[list[EvaluatedPS]]:
+        """
+        Like .run, but the catalog is only known to be final at the end of the search,
+        so it is yielded as a single batch when the search is complete or interrupted
+        """
+        iterations = 0
+
+        def should_terminate():
+            return (not self.can_improve()) or termination_criteria.met(iterations=iterations,
+                                                                        ps_evaluations=self.get_used_evaluations())
+
+        while not should_terminate():
+            self.step()
+            iterations += 1
+            if verbose and iterations % 1000 == 0:
+                print(f"Expanded {self.expanded_nodes} PSs, the queue has {len(self.queue)}, "
+                      f"the k-th best mean fitness is {self.threshold}")
+
+        if verbose:
+            print(f"The search {'is complete' if self.is_proven_optimal else 'was interrupted'} "
+                  f"after expanding {self.expanded_nodes} PSs")
+        yield self.publish_results(self.get_results())
+
+    def get_results(self, amount: Optional[int] = None) -> list[EvaluatedPS]:
+        """
+        The best PSs by mean fitness, sorted from best to worst.
+        The metric scores are the usual simplicity, mean fitness and atomicity, and the aggregated score is the mean fitness.
+        """
+        in_order = sorted(self.best_found, key=lambda item: item[0], reverse=True)
+        if amount is not None:
+            in_order = in_order[:amount]
+
+        classic3_evaluator = Classic3PSEvaluator(self.pRef)
+
+        def as_evaluated_ps(mean_fitness: float, genome: np.ndarray) -> EvaluatedPS:
+            ps = PS(genome)
+            return EvaluatedPS(genome,
+                               metric_scores=list(classic3_evaluator.get_S_MF_A(ps)),
+                               aggregated_score=mean_fitness)
+
+        return [as_evaluated_ps(mean_fitness, genome) for mean_fitness, _, genome in in_order]
+
+    @classmethod
+    def with_default_settings(cls, pRef: PRef):
+        return cls(pRef=pRef,
+                   k=100,
+                   min_support=max(1, pRef.sample_size // 100))
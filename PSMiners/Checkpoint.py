@@ -0,0 +1,103 @@
+"""
+Checkpoints allow a long run of a PS miner to be resumed after a crash or a preemption.
+A checkpoint is a single compressed .npz file, containing
+    - the PRef that the miner is using
+    - the state of the miner (population genomes, metric scores, archive, evaluation counters...)
+    - the state of the random number generators (both random and np.random)
+Each miner implements get_checkpoint_state and resume_from, and accepts a Checkpointer in .run
+"""
+import os
+import pickle
+import random
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+import utils
+from Core.PRef import PRef
+from Core.SearchSpace import SearchSpace
+
+
+CheckpointState = dict[str, np.ndarray]
+
+
+def to_bytes_array(item: Any) -> np.ndarray:
+    """Objects that are not arrays (eg the RNG state, or the metrics) are pickled and stored as an array of bytes"""
+    return np.frombuffer(pickle.dumps(item), dtype=np.uint8)
+
+
+def from_bytes_array(array: np.ndarray) -> Any:
+    return pickle.loads(array.tobytes())
+
+
+def get_rng_state() -> np.ndarray:
+    return to_bytes_array((random.getstate(), np.random.get_state()))
+
+
+def set_rng_state(rng_state: np.ndarray):
+    python_state, numpy_state = from_bytes_array(rng_state)
+    random.setstate(python_state)
+    np.random.set_state(numpy_state)
+
+
+def pRef_to_checkpoint_state(pRef: PRef) -> CheckpointState:
+    return {"pRef_fsm": pRef.full_solution_matrix,
+            "pRef_fitness_array": pRef.fitness_array,
+            "pRef_cardinalities": pRef.search_space.cardinalities}
+
+
+def pRef_from_checkpoint_state(state: CheckpointState) -> PRef:
+    return PRef(full_solution_matrix=state["pRef_fsm"],
+                fitness_array=state["pRef_fitness_array"],
+                search_space=SearchSpace(state["pRef_cardinalities"]))
+
+
+def write_checkpoint(state: CheckpointState, file: str):
+    """The file is written under a temporary name first, so that a crash while writing keeps the previous checkpoint"""
+    utils.make_folder_if_not_present(file)
+    temporary_file = file + ".tmp"
+    with open(temporary_file, "wb") as stream:
+        np.savez_compressed(stream, **state)
+    os.replace(temporary_file, file)
+
+
+def load_checkpoint(file: str, expected_miner: str) -> CheckpointState:
+    with np.load(file, allow_pickle=False) as contents:
+        state = {key: contents[key] for key in contents.files}
+    found_miner = str(state["miner"])
+    if found_miner != expected_miner:
+        raise ValueError(f"The checkpoint {file} was written by {found_miner}, not {expected_miner}")
+    return state
+
+
+class Checkpointer:
+    """
+    Writes the state of a miner every few iterations, on a background thread so that the main loop is not blocked.
+    The state is a snapshot (the miners copy their arrays), so the miner can carry on while it is being written.
+    Only one write happens at a time: if the previous one is still going, the next one waits for it.
+    """
+    file: str
+    every_n_iterations: int
+    writing_thread: Optional[threading.Thread]
+
+    def __init__(self, file: str, every_n_iterations: int = 10):
+        self.file = file
+        self.every_n_iterations = every_n_iterations
+        self.writing_thread = None
+
+    def __repr__(self):
+        return f"Checkpointer({self.file}, every {self.every_n_iterations} iterations)"
+
+    def should_write(self, iterations: int) -> bool:
+        return iterations > 0 and iterations % self.every_n_iterations == 0
+
+    def write_in_background(self, state: CheckpointState):
+        self.wait()
+        self.writing_thread = threading.Thread(target=write_checkpoint, args=(state, self.file))
+        self.writing_thread.start()
+
+    def wait(self):
+        if self.writing_thread is not None:
+            self.writing_thread.join()
+            self.writing_thread = None
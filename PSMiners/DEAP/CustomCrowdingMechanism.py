@@ -1,33 +1,93 @@
 from itertools import chain
-from operator import attrgetter
 
 import numpy as np
-from deap import tools
-from deap.tools import sortNondominated, sortLogNondominated, uniform_reference_points, selNSGA3
-from deap.tools.emo import find_intercepts, find_extreme_points, associate_to_niche, NSGA3Memory
+from deap.tools.emo import find_intercepts, find_extreme_points, NSGA3Memory
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
 
 from Core.PS import STAR
 
+# The selection operators in this file work on the (N x 3) objective matrix of the population,
+# which is extracted only once per call. The non-dominated sorting is delegated to pymoo's compiled
+# efficient non-dominated sort, and the food scores and niches are calculated with matrix operations.
+
+compiled_nds = NonDominatedSorting(method="efficient_non_dominated_sort")
+
+
+def get_objective_matrix(individuals) -> np.ndarray:
+    """Returns the weighted fitnesses of the individuals, multiplied by -1 so that it is a minimisation task"""
+    return -np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+
+
+def get_where_fixed_matrix(individuals) -> np.ndarray:
+    """A boolean matrix where each row is an individual and each column is True if the variable is fixed"""
+    return np.array([individual.values != STAR for individual in individuals])
+
+
+def sort_nondominated_indices(objective_matrix: np.ndarray, k: int, nd: str) -> list[np.ndarray]:
+    """Equivalent to DEAP's sortNondominated(individuals, k), but it returns the fronts as arrays of indices.
+    Both 'standard' and 'log' are accepted for compatibility, and they produce the same fronts"""
+    if nd not in {"standard", "log"}:
+        raise Exception(f"The choice of non-dominated sorting method '{nd}' is invalid.")
+    if len(objective_matrix) == 0:
+        return [np.array([], dtype=int)]
+    return compiled_nds.do(objective_matrix, n_stop_if_ranked=k)
+
+
 def get_food_supplies(population) -> np.ndarray:
     """The result is an array, where for each variable in the search space we give the proportion
     of the individuals in the population which have that variable fixed"""
-    counts = np.sum([individual.values != STAR for individual in population], dtype=float, axis=0)
+    return get_food_supplies_from_where_fixed(get_where_fixed_matrix(population))
+
+
+def get_food_supplies_from_where_fixed(where_fixed: np.ndarray) -> np.ndarray:
+    counts = np.sum(where_fixed, dtype=float, axis=0)
     return np.divide(1.0, counts, out=np.zeros_like(counts), where=counts != 0)
 
+
+def get_food_scores(where_fixed: np.ndarray, fixed_counts_supply: np.ndarray) -> np.ndarray:
+    """For each row, the average food of its fixed variables. Empty individuals get 0"""
+    fixed_amounts = np.sum(where_fixed, axis=1)
+    food_totals = where_fixed @ fixed_counts_supply
+    return np.divide(food_totals, fixed_amounts, out=np.zeros_like(food_totals), where=fixed_amounts != 0)
+
+
 def get_food_score(individual, fixed_counts_supply: np.ndarray):
-    if individual.is_empty():
-        return 0 #np.average(fixed_counts_supply)  # very arbitrary to be honest
-    return np.average([food for val, food in zip(individual, fixed_counts_supply)
-                         if val != STAR])
+    return get_food_scores(np.array([individual.values != STAR]), fixed_counts_supply)[0]
+
+
+def associate_to_niche(fitnesses: np.ndarray, reference_points: np.ndarray, best_point, intercepts) -> (np.ndarray, np.ndarray):
+    """Same as deap.tools.emo.associate_to_niche, but it avoids building the (N x R x M) tensor:
+    the perpendicular distance to each reference line is obtained from the projection directly"""
+    fn = (fitnesses - best_point) / (intercepts - best_point + np.finfo(float).eps)
+    unit_references = reference_points / np.linalg.norm(reference_points, axis=1).reshape((-1, 1))
+    projections = fn @ unit_references.T
+    squared_distances = np.sum(fn * fn, axis=1).reshape((-1, 1)) - projections * projections
+    distances = np.sqrt(np.maximum(squared_distances, 0))
 
+    niches = np.argmin(distances, axis=1)
+    return niches, distances[np.arange(len(niches)), niches]
+
+
+def gc_select_indices_from_last_front(last_front: np.ndarray, where_fixed: np.ndarray, amount_to_select: int) -> (np.ndarray, np.ndarray):
+    """Returns the indices of the selected individuals, and the food scores of the entire front"""
+    food_supply = get_food_supplies_from_where_fixed(where_fixed)  # note: on the entire population, not on the front
+    scores = get_food_scores(where_fixed[last_front], food_supply)
+    order = np.argsort(-scores, kind="stable")  # stable, so that it behaves like sorted(..., reverse=True)
+    return last_front[order[:amount_to_select]], scores
 
 
 def gc_select_from_last_front(last_pareto_front, entire_population, amount_to_select: int):
-    food_supply = get_food_supplies(entire_population)  #note: on the entire population, not on the front
-    for individual in last_pareto_front:
-        individual.fitness.crowding_dist = get_food_score(individual, food_supply)
-    sorted_front = sorted(last_pareto_front, key=attrgetter("fitness.crowding_dist"), reverse=True)
-    return sorted_front[:amount_to_select]
+    where_fixed = get_where_fixed_matrix(entire_population)
+    position_of = {id(individual): index for index, individual in enumerate(entire_population)}
+    last_front = np.array([position_of[id(individual)] for individual in last_pareto_front], dtype=int)
+    return gc_select_by_indices(last_front, entire_population, where_fixed, amount_to_select)
+
+
+def gc_select_by_indices(last_front: np.ndarray, individuals, where_fixed: np.ndarray, amount_to_select: int):
+    selected, scores = gc_select_indices_from_last_front(last_front, where_fixed, amount_to_select)
+    for index, score in zip(last_front, scores):
+        individuals[index].fitness.crowding_dist = score
+    return [individuals[index] for index in selected]
 
 
 def gc_selNSGA2(individuals, k, nd='standard'):
@@ -49,15 +109,8 @@ def gc_selNSGA2(individuals, k, nd='standard'):
        optimization: NSGA-II", 2002.
     """
     # this is new, read the comments below
-
-
-    if nd == 'standard':
-        pareto_fronts = sortNondominated(individuals, k)
-    elif nd == 'log':
-        pareto_fronts = sortLogNondominated(individuals, k)
-    else:
-        raise Exception('selNSGA2: The choice of non-dominated sorting '
-                        'method "{0}" is invalid.'.format(nd))
+    objective_matrix = get_objective_matrix(individuals)
+    pareto_fronts = sort_nondominated_indices(objective_matrix, k, nd)
 
     # usually, here you would assign a crowing distance like so:
     # for front in pareto_fronts:
@@ -65,11 +118,11 @@ def gc_selNSGA2(individuals, k, nd='standard'):
 
     # instead, we ignore the fronts and assign our own crowding at the start
 
-
-    chosen = list(chain(*pareto_fronts[:-1]))
+    chosen = [individuals[index] for index in chain(*pareto_fronts[:-1])]
     k = k - len(chosen)
     if k > 0:
-        selected = gc_select_from_last_front(pareto_fronts[-1], individuals, k)
+        where_fixed = get_where_fixed_matrix(individuals)
+        selected = gc_select_by_indices(pareto_fronts[-1], individuals, where_fixed, k)
         chosen.extend(selected)
 
     return chosen
@@ -145,18 +198,12 @@ def gc_selNSGA3(individuals, k, ref_points, nd="log", best_point=None,
         Part I: Solving Problems With Box Constraints. IEEE Transactions on
         Evolutionary Computation, 18(4), 577-601. doi:10.1109/TEVC.2013.2281535.
     """
-    if nd == "standard":
-        pareto_fronts = sortNondominated(individuals, k)
-    elif nd == "log":
-        pareto_fronts = sortLogNondominated(individuals, k)
-    else:
-        raise Exception("selNSGA3: The choice of non-dominated sorting "
-                        "method '{0}' is invalid.".format(nd))
+    all_fitnesses = get_objective_matrix(individuals)  # already multiplied by -1, it's a minimisation problem
+    pareto_fronts = sort_nondominated_indices(all_fitnesses, k, nd)
 
     # Extract fitnesses as a numpy array in the nd-sort order
-    # Use wvalues * -1 to tackle always as a minimization problem
-    fitnesses = np.array([ind.fitness.wvalues for f in pareto_fronts for ind in f])
-    fitnesses *= -1
+    sorted_indices = np.concatenate(pareto_fronts)
+    fitnesses = all_fitnesses[sorted_indices]
 
     # Get best and worst point of population, contrary to pymoo
     # we don't use memory
@@ -173,19 +220,17 @@ def gc_selNSGA3(individuals, k, ref_points, nd="log", best_point=None,
     niches, dist = associate_to_niche(fitnesses, ref_points, best_point, intercepts)
 
     # Get counts per niche for individuals in all front but the last
-    niche_counts = np.zeros(len(ref_points), dtype=np.int64)
-    index, counts = np.unique(niches[:-len(pareto_fronts[-1])], return_counts=True)
-    niche_counts[index] = counts
+    niche_counts = np.bincount(niches[:len(fitnesses)-len(pareto_fronts[-1])], minlength=len(ref_points))
 
     # Choose individuals from all fronts but the last
-    chosen = list(chain(*pareto_fronts[:-1]))
+    chosen = [individuals[index] for index in chain(*pareto_fronts[:-1])]
 
     # Use niching to select the remaining individuals
     sel_count = len(chosen)
     # n = k - sel_count
 
     ##  GC PART
-    selected = gc_select_from_last_front(pareto_fronts[-1], individuals, k)
+    selected = gc_select_by_indices(pareto_fronts[-1], individuals, get_where_fixed_matrix(individuals), k)
     chosen.extend(selected)
 
     # selected = niching(pareto_fronts[-1], n, niches[sel_count:], dist[sel_count:], niche_counts)
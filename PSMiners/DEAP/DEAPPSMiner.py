@@ -1,5 +1,7 @@
-from typing import Any, Optional
+from typing import Any, Optional, Iterator
 
+import numpy as np
+from deap import creator
 from deap.base import Toolbox
 from deap.tools import Logbook
 
@@ -9,6 +11,8 @@ from Core.PRef import PRef
 from Core.PSMetric.Classic3 import Classic3PSEvaluator
 from Core.TerminationCriteria import TerminationCriteria, PSEvaluationLimit
 from PSMiners.AbstractPSMiner import AbstractPSMiner
+from PSMiners.Checkpoint import Checkpointer, CheckpointState, get_rng_state, set_rng_state, to_bytes_array, \
+    from_bytes_array, pRef_to_checkpoint_state, pRef_from_checkpoint_state, load_checkpoint
 from PSMiners.DEAP.deap_utils import get_toolbox_for_problem, get_stats_object, nsga
 from utils import announce
 
@@ -20,23 +24,33 @@ class DEAPPSMiner(AbstractPSMiner):
     stats: Any
     classic3_evaluator: Classic3PSEvaluator
     uses_experimental_crowding: bool
+    use_spea: bool
     last_logbook: Optional[Logbook]
     last_population: Optional[list[EvaluatedPS]]
+    current_deap_population: Optional[list]  # the individuals as used by DEAP, kept to allow resuming
+    iterations: int
+    min_support: int  # PSs with fewer observations than this are repaired before being evaluated
 
     def __init__(self,
                  pRef: PRef,
                  population_size: int,
                  uses_custom_crowding: bool,
-                 use_spea = False):
+                 use_spea = False,
+                 min_support: int = 0):
         super().__init__(pRef=pRef)
         self.population_size = population_size
         self.uses_experimental_crowding = uses_custom_crowding
+        self.use_spea = use_spea
+        self.min_support = min_support
+        self.current_deap_population = None
+        self.iterations = 0
 
         self.classic3_evaluator = Classic3PSEvaluator(self.pRef)  # replaces simplicity, mean fitness, atomicity
         self.toolbox = get_toolbox_for_problem(pRef,
                                                classic3_evaluator=self.classic3_evaluator,
                                                uses_experimental_crowding=self.uses_experimental_crowding,
-                                               use_spea=use_spea)
+                                               use_spea=use_spea,
+                                               min_support=min_support)
         self.stats = get_stats_object()
 
     def __repr__(self):
@@ -55,7 +69,27 @@ class DEAPPSMiner(AbstractPSMiner):
 
         return [convert_single(individual) for individual in nsga_population]
 
-    def run(self, termination_criteria: TerminationCriteria, verbose=False):
+    def run(self,
+            termination_criteria: TerminationCriteria,
+            verbose=False,
+            checkpointer: Optional[Checkpointer] = None):
+        for _ in self.run_iter(termination_criteria, verbose=verbose, checkpointer=checkpointer):
+            pass
+
+    def run_iter(self,
+                 termination_criteria: TerminationCriteria,
+                 verbose=False,
+                 checkpointer: Optional[Checkpointer] = None) -> Iterator[list[EvaluatedPS]]:
+        """
+        NSGA does not have an archive (individuals can leave the population at any generation),
+        so the final population is yielded as a single batch when the run is over
+        """
+        def on_generation(population, iterations: int):
+            self.current_deap_population = population
+            self.iterations = iterations
+            if checkpointer is not None and checkpointer.should_write(iterations):
+                checkpointer.write_in_background(self.get_checkpoint_state())
+
         final_population, self.last_logbook = nsga(toolbox=self.toolbox,
                                          mu =self.population_size,
                                          cxpb=0.5,
@@ -63,10 +97,77 @@ class DEAPPSMiner(AbstractPSMiner):
                                          termination_criteria = termination_criteria,
                                          stats=self.stats,
                                          verbose=verbose,
-                                         classic3_evaluator=self.classic3_evaluator)
+                                         classic3_evaluator=self.classic3_evaluator,
+                                         starting_population=self.current_deap_population,
+                                         starting_iteration=self.iterations,
+                                         on_generation=on_generation)
 
+        self.current_deap_population = final_population
         self.last_population = DEAPPSMiner.nsgaii_population_to_evaluated_ps_population(final_population)
 
+        if checkpointer is not None:
+            checkpointer.write_in_background(self.get_checkpoint_state())
+            checkpointer.wait()
+        yield self.publish_results(self.last_population)
+
+    def get_selection_memory(self) -> Optional[tuple]:
+        """The NSGA-III selection operators remember the best, worst and extreme points"""
+        selection = getattr(self.toolbox.select, "func", self.toolbox.select)
+        if not hasattr(selection, "extreme_points"):
+            return None
+        return selection.best_point, selection.worst_point, selection.extreme_points
+
+    def set_selection_memory(self, memory: Optional[tuple]):
+        if memory is None:
+            return
+        selection = getattr(self.toolbox.select, "func", self.toolbox.select)
+        selection.best_point, selection.worst_point, selection.extreme_points = memory
+
+    def get_checkpoint_state(self) -> CheckpointState:
+        """A copy of everything that is needed to continue the run, see resume_from"""
+        population = self.current_deap_population if self.current_deap_population is not None else []
+        amount_of_parameters = self.search_space.amount_of_parameters
+        population_genomes = np.array([ind.values for ind in population], dtype=int).reshape((-1, amount_of_parameters))
+        population_fitnesses = np.array([ind.fitness.values for ind in population], dtype=float).reshape((-1, 3))
+        return {"miner": np.array("DEAPPSMiner"),
+                "population_genomes": population_genomes,
+                "population_metric_scores": population_fitnesses,
+                "has_population": np.array(self.current_deap_population is not None),
+                "used_evaluations": np.array(self.get_used_evaluations()),
+                "iterations": np.array(self.iterations),
+                "population_size": np.array(self.population_size),
+                "uses_experimental_crowding": np.array(self.uses_experimental_crowding),
+                "use_spea": np.array(self.use_spea),
+                "min_support": np.array(self.min_support),
+                "selection_memory": to_bytes_array(self.get_selection_memory()),
+                "rng_state": get_rng_state(),
+                **pRef_to_checkpoint_state(self.pRef)}
+
+    @classmethod
+    def resume_from(cls, checkpoint: str):
+        """Constructs the miner from a checkpoint file, and calling .run will continue where the checkpoint was taken"""
+        state = load_checkpoint(checkpoint, expected_miner="DEAPPSMiner")
+        miner = cls(pRef=pRef_from_checkpoint_state(state),
+                    population_size=int(state["population_size"]),
+                    uses_custom_crowding=bool(state["uses_experimental_crowding"]),
+                    use_spea=bool(state["use_spea"]),
+                    min_support=int(state["min_support"]))
+
+        def make_individual(values, fitness_values):
+            individual = creator.DEAPPSIndividual(values)
+            individual.fitness.values = tuple(fitness_values)
+            return individual
+
+        if bool(state["has_population"]):
+            miner.current_deap_population = [make_individual(values, fitness_values)
+                                             for values, fitness_values in zip(state["population_genomes"],
+                                                                               state["population_metric_scores"])]
+        miner.set_selection_memory(from_bytes_array(state["selection_memory"]))
+        miner.classic3_evaluator.used_evaluations = int(state["used_evaluations"])
+        miner.iterations = int(state["iterations"])
+        set_rng_state(state["rng_state"])
+        return miner
+
     @classmethod
     def with_default_settings(cls, pRef: PRef):
         return cls(population_size = 300,
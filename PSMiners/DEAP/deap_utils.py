@@ -10,6 +10,7 @@ from Core.PRef import PRef
 from Core.PS import PS
 from Core.PSMetric.Classic3 import Classic3PSEvaluator
 from Core.SearchSpace import SearchSpace
+from Core.SupportIndex import SupportIndex
 from Core.TerminationCriteria import TerminationCriteria
 from PSMiners.DEAP.CustomCrowdingMechanism import GC_selNSGA3WithMemory
 
@@ -21,27 +22,40 @@ def nsga(toolbox,
          cxpb,
          mutpb,
          classic3_evaluator: Classic3PSEvaluator,
-         verbose=False):
+         verbose=False,
+         starting_population=None,
+         starting_iteration: int = 0,
+         on_generation=None):
+    """
+    The generational loop of NSGA.
+    If starting_population is given (eg when resuming from a checkpoint) it's used instead of generating a new one,
+    and on_generation(population, iterations) is called at the end of every generation
+    """
     logbook = tools.Logbook()
     logbook.header = "gen", "evals", "min", "avg", "max"
 
-    pop = toolbox.population(n=mu)
-    # Evaluate the individuals with an invalid fitness
-    invalid_ind = [ind for ind in pop if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-    for ind, fit in zip(invalid_ind, fitnesses):
-        ind.fitness.values = fit
+    if starting_population is None:
+        pop = toolbox.population(n=mu)
+        # Evaluate the individuals with an invalid fitness
+        invalid_ind = [ind for ind in pop if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
 
-    # Compile statistics about the population
-    record = stats.compile(pop)
-    logbook.record(gen=0, evals=len(invalid_ind), **record)
-    if verbose:
-        print(logbook.stream)
+        # Compile statistics about the population
+        record = stats.compile(pop)
+        logbook.record(gen=0, evals=len(invalid_ind), **record)
+        if verbose:
+            print(logbook.stream)
+    else:
+        pop = starting_population
 
     # Begin the generational process
-    iterations = 0
+    iterations = starting_iteration
     def should_stop():
-        return termination_criteria.met(ps_evaluations = classic3_evaluator.used_evaluations, iterations=iterations)
+        return termination_criteria.met(ps_evaluations = classic3_evaluator.used_evaluations,
+                                        iterations=iterations,
+                                        front=[ind.fitness.values for ind in pop])  # all the weights are positive
 
     while not should_stop():
         pop = list(set(pop))
@@ -63,6 +77,8 @@ def nsga(toolbox,
             print(logbook.stream)
 
         iterations +=1
+        if on_generation is not None:
+            on_generation(pop, iterations)
 
     return pop, logbook
 
@@ -98,10 +114,30 @@ def make_random_deap_individual(search_space: SearchSpace):
     result = geometric_distribution_values_of_ps(search_space)
     return creator.DEAPPSIndividual(result)
 
+def get_support_repair_decorator(support_index: SupportIndex, min_support: int):
+    """
+    A decorator for the toolbox operators which create or modify individuals (make_random_ps, mate, mutate),
+    which generalises the resulting individuals that have fewer than min_support observations, before they are evaluated
+    """
+    def repair(individual):
+        if support_index.get_support(individual.values) < min_support:
+            individual.values[:] = support_index.generalise_until_supported(individual.values, min_support)
+
+    def decorator(operator):
+        def wrapper(*args, **kwargs):
+            result = operator(*args, **kwargs)
+            for individual in (result if isinstance(result, tuple) else (result,)):
+                repair(individual)
+            return result
+        return wrapper
+    return decorator
+
+
 def get_toolbox_for_problem(pRef: PRef,
                             classic3_evaluator: Classic3PSEvaluator,
                             uses_experimental_crowding = True,
-                            use_spea = False):
+                            use_spea = False,
+                            min_support: int = 0):
     creator.create("FitnessMax", base.Fitness, weights=[1.0, 1.0, 1.0])
     creator.create("DEAPPSIndividual", PS,
                    fitness=creator.FitnessMax)
@@ -125,7 +161,6 @@ def get_toolbox_for_problem(pRef: PRef,
     toolbox.register("mutate", tools.mutUniformInt, low=lower_bounds, up=upper_bounds, indpb=1/search_space.amount_of_parameters)
 
     toolbox.register("evaluate", evaluate)
-    toolbox.register("population", tools.initRepeat, list, toolbox.make_random_ps)
 
     selection_method = None
 
@@ -136,6 +171,14 @@ def get_toolbox_for_problem(pRef: PRef,
     else:
         selection_method = selSPEA2
     toolbox.register("select", selection_method)
+
+    if min_support > 0:
+        repair_decorator = get_support_repair_decorator(SupportIndex(pRef), min_support)
+        for operator in ["make_random_ps", "mate", "mutate"]:
+            toolbox.decorate(operator, repair_decorator)
+
+    # registered after the decoration, otherwise it would use the make_random_ps without the repair
+    toolbox.register("population", tools.initRepeat, list, toolbox.make_random_ps)
     return toolbox
 
 def get_stats_object():
@@ -0,0 +1,307 @@
+"""
+A deterministic alternative to the stochastic miners, which enumerates the PS lattice level by level (Apriori style).
+The support of a PS (how many observations it has in the PRef) can only decrease when a variable is fixed,
+so any PS with less than min_support observations can be discarded together with all of its specialisations.
+
+Each PS is generated exactly once, by only fixing variables that come after its last fixed variable.
+For every PS, the matching rows of the PRef are kept, so that the supports, mean fitnesses and benefits of
+all of its children are obtained with a few calls to np.bincount.
+When the levels are capped (max_pss_per_level), only the best children seen so far are kept while the level is expanded,
+and the rows and genomes are only built for the children that survive, so that the cap also bounds the memory.
+The survivors are scored with the same metrics as Classic3PSEvaluator.get_S_MF_A (simplicity, mean fitness, atomicity).
+"""
+import time
+from typing import Optional, Iterator, Callable
+
+import numpy as np
+
+from Core.EvaluatedPS import EvaluatedPS
+from Core.PRef import PRef
+from Core.PS import PS, STAR
+from Core.PSMetric.Classic3 import Classic3PSEvaluator
+from Core.TerminationCriteria import TerminationCriteria
+from PSMiners.AbstractPSMiner import AbstractPSMiner
+
+
+def get_supported_children(pRef: PRef,
+                           last_fixed_variable: int,
+                           rows: np.ndarray,
+                           min_support: int,
+                           weights: list[np.ndarray]):
+    """
+    Finds the children of a PS (which fix one more variable, after last_fixed_variable) that have at least
+    min_support observations, given the rows of the PRef where the PS appears.
+    Returns the variables that were fixed, their values, their supports and the sums of each array in weights over
+    the rows of each child. Returns None when there are no such children.
+    """
+    search_space = pRef.search_space
+    first_variable = last_fixed_variable + 1
+    if first_variable >= search_space.amount_of_parameters:
+        return None
+
+    # every (variable, value) pair gets its own bin
+    value_offsets = search_space.precomputed_offsets
+    offsets = value_offsets[first_variable:-1]
+    bins = (pRef.full_solution_matrix[rows, first_variable:] + offsets).ravel()
+    amount_of_bins = value_offsets[-1]
+    supports = np.bincount(bins, minlength=amount_of_bins)
+
+    surviving_bins = np.nonzero(supports >= min_support)[0]
+    if len(surviving_bins) == 0:
+        return None
+    weighted_sums = [np.bincount(bins, weights=np.repeat(weight[rows], len(offsets)),
+                                 minlength=amount_of_bins)[surviving_bins]
+                     for weight in weights]
+    variables = np.searchsorted(value_offsets, surviving_bins, side="right") - 1
+    values = surviving_bins - value_offsets[variables]
+    return variables, values, supports[surviving_bins], weighted_sums
+
+
+def get_rows_of_child(pRef: PRef, rows: np.ndarray, variable: int, value: int) -> np.ndarray:
+    """The rows of the child that fixes variable = value, given the rows of its parent"""
+    return rows[pRef.full_solution_matrix[rows, variable] == value]
+
+
+class LevelOfPSs:
+    """The PSs of a single order, stored as arrays, together with the rows of the PRef where each of them appears"""
+    genomes: np.ndarray
+    last_fixed_variables: np.ndarray
+    rows: list[np.ndarray]
+    metric_scores: np.ndarray  # simplicity, mean fitness, atomicity
+    benefits: np.ndarray  # the sum of the normalised fitnesses of the observations, used for atomicity
+
+    def __init__(self,
+                 genomes: np.ndarray,
+                 last_fixed_variables: np.ndarray,
+                 rows: list[np.ndarray],
+                 metric_scores: np.ndarray,
+                 benefits: np.ndarray):
+        self.genomes = genomes
+        self.last_fixed_variables = last_fixed_variables
+        self.rows = rows
+        self.metric_scores = metric_scores
+        self.benefits = benefits
+
+    def __len__(self):
+        return len(self.genomes)
+
+    def subset(self, indices: np.ndarray):
+        return LevelOfPSs(self.genomes[indices],
+                          self.last_fixed_variables[indices],
+                          [self.rows[index] for index in indices],
+                          self.metric_scores[indices],
+                          self.benefits[indices])
+
+
+class LevelWisePSMiner(AbstractPSMiner):
+    min_support: int
+    max_order: Optional[int]
+    max_pss_per_level: Optional[int]
+
+    classic3_evaluator: Classic3PSEvaluator
+    used_evaluations: int
+    current_level: Optional[LevelOfPSs]
+    catalog: list[LevelOfPSs]  # one entry per order, only the genomes and the metrics are kept
+
+    def __init__(self,
+                 pRef: PRef,
+                 min_support: int,
+                 max_order: Optional[int] = None,
+                 max_pss_per_level: Optional[int] = None):
+        """
+        :param pRef: the reference population
+        :param min_support: PSs with fewer observations than this are pruned, along with their specialisations
+        :param max_order: the largest amount of fixed variables in the results, None means no limit
+        :param max_pss_per_level: if a level has more PSs than this, only those with the highest mean fitness are
+                                  kept (and expanded). This bounds the memory and time, at the cost of exactness
+        """
+        super().__init__(pRef=pRef)
+        self.min_support = min_support
+        self.max_order = max_order
+        self.max_pss_per_level = max_pss_per_level
+
+        self.classic3_evaluator = Classic3PSEvaluator(self.pRef)
+        self.normalised_fitnesses = self.classic3_evaluator.normalised_fitnesses
+        self.used_evaluations = 0
+        self.current_level = self.get_empty_level()
+        self.catalog = []
+
+    def __repr__(self):
+        return (f"LevelWisePSMiner(min_support = {self.min_support}, max_order = {self.max_order}, "
+                f"max_pss_per_level = {self.max_pss_per_level})")
+
+    def get_used_evaluations(self) -> int:
+        return self.used_evaluations
+
+    @property
+    def current_order(self) -> int:
+        return len(self.catalog)
+
+    def get_empty_level(self) -> LevelOfPSs:
+        empty = PS.empty(self.search_space)
+        all_rows = np.arange(self.pRef.sample_size)
+        return LevelOfPSs(genomes=empty.values.reshape((1, -1)),
+                          last_fixed_variables=np.array([-1]),
+                          rows=[all_rows],
+                          metric_scores=np.array([self.classic3_evaluator.get_S_MF_A(empty)]),
+                          benefits=np.array([np.sum(self.normalised_fitnesses)]))
+
+    def get_children_of(self, last_fixed_variable: int, rows: np.ndarray):
+        """
+        Finds all the children of the given PS which have enough support,
+        returns their fixed variables, values, supports, fitness sums and benefits
+        """
+        children = get_supported_children(self.pRef, last_fixed_variable, rows, self.min_support,
+                                          weights=[self.pRef.fitness_array, self.normalised_fitnesses])
+        if children is None:
+            return None
+        variables, values, supports, (fitness_sums, benefits) = children
+        return variables, values, supports, fitness_sums, benefits
+
+    def get_atomicities(self,
+                        genomes: np.ndarray,
+                        benefits: np.ndarray,
+                        previous_benefits: dict[bytes, float]) -> np.ndarray:
+        """Same as Classic3PSEvaluator.get_atomicity_from_relevant_rows, using the benefits of the previous level"""
+        isolated_benefits = self.classic3_evaluator.cached_isolated_benefits
+
+        def benefit_of(genome: np.ndarray) -> float:
+            key = genome.tobytes()
+            if key not in previous_benefits:  # only when that PS was not generated because of max_pss_per_level
+                previous_benefits[key] = float(np.sum(self.normalised_fitnesses[self.rows_of(genome)]))
+            return previous_benefits[key]
+
+        def atomicity(genome: np.ndarray, pAB: float) -> float:
+            if pAB == 0.0:
+                return pAB
+            fixed_variables = np.nonzero(genome != STAR)[0]
+            isolated = np.array([isolated_benefits[var][genome[var]] for var in fixed_variables])
+            excluded = np.zeros(len(fixed_variables))
+            for index, var in enumerate(fixed_variables):
+                simplification = genome.copy()
+                simplification[var] = STAR
+                excluded[index] = benefit_of(simplification)
+            max_denominator = np.max(isolated * excluded)
+            return pAB * np.log(pAB / max_denominator)
+
+        return np.array([atomicity(genome, pAB) for genome, pAB in zip(genomes, benefits)])
+
+    def rows_of(self, genome: np.ndarray) -> np.ndarray:
+        which = np.ones(self.pRef.sample_size, dtype=bool)
+        for var in np.nonzero(genome != STAR)[0]:
+            which &= self.pRef.full_solution_matrix[:, var] == genome[var]
+        return np.nonzero(which)[0]
+
+    def get_next_level(self,
+                       max_evaluations: Optional[int],
+                       should_stop: Optional[Callable[[], bool]] = None) -> Optional[LevelOfPSs]:
+        """
+        Expands the parents in order. Only the best cap children (by mean fitness) are kept as the level is expanded,
+        where cap comes from max_pss_per_level and max_evaluations, and their genomes and rows are built at the end.
+        When should_stop returns True (checked after each parent), the children found so far are used as the level.
+        """
+        level = self.current_level
+        caps = [cap for cap in [self.max_pss_per_level, max_evaluations] if cap is not None]
+        cap = min(caps) if len(caps) > 0 else None
+
+        # for each candidate child: the index of its parent, the variable and value it fixes, its support, etc
+        candidate_columns = [np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                             np.zeros(0, dtype=float), np.zeros(0, dtype=float)]
+
+        def keep_best_candidates(amount: int):
+            """Keeps the candidates with the highest mean fitness, in the order they were found"""
+            parents, variables, values, mean_fitnesses, benefits = candidate_columns
+            kept = np.sort(np.argsort(-mean_fitnesses, kind="stable")[:amount])
+            candidate_columns[:] = [column[kept] for column in candidate_columns]
+
+        for parent_index, (last, rows) in enumerate(zip(level.last_fixed_variables, level.rows)):
+            children = self.get_children_of(last, rows)
+            if children is not None:
+                variables, values, supports, fitness_sums, benefits = children
+                new_columns = [np.full(len(variables), parent_index), variables, values, fitness_sums / supports, benefits]
+                candidate_columns[:] = [np.concatenate([column, new_column])
+                                        for column, new_column in zip(candidate_columns, new_columns)]
+                if cap is not None and len(candidate_columns[0]) > 2 * cap:
+                    keep_best_candidates(cap)
+            if should_stop is not None and should_stop():
+                break
+
+        # graceful degradation: only the best PSs (by mean fitness) are scored and expanded
+        if cap is not None:
+            keep_best_candidates(cap)
+        parents, variables, values, mean_fitnesses, benefits = candidate_columns
+        if len(parents) == 0:
+            return None
+
+        genomes = level.genomes[parents].copy()
+        genomes[np.arange(len(genomes)), variables] = values
+        rows = [get_rows_of_child(self.pRef, level.rows[parent], variable, value)
+                for parent, variable, value in zip(parents, variables, values)]
+        simplicities = np.sum(genomes == STAR, axis=1).astype(float)
+        metric_scores = np.column_stack([simplicities, mean_fitnesses, np.zeros(len(genomes))])
+        next_level = LevelOfPSs(genomes, variables, rows, metric_scores, benefits)
+
+        previous_benefits = {genome.tobytes(): benefit for genome, benefit in zip(level.genomes, level.benefits)}
+        next_level.metric_scores[:, 2] = self.get_atomicities(next_level.genomes, next_level.benefits, previous_benefits)
+        self.used_evaluations += len(next_level)
+        return next_level
+
+    def step(self, max_evaluations: Optional[int] = None, should_stop: Optional[Callable[[], bool]] = None):
+        next_level = self.get_next_level(max_evaluations, should_stop)
+        self.current_level = next_level
+        if next_level is not None:
+            # the rows are not needed in the catalog
+            self.catalog.append(LevelOfPSs(next_level.genomes, next_level.last_fixed_variables, [],
+                                           next_level.metric_scores, next_level.benefits))
+
+    def is_finished(self) -> bool:
+        reached_max_order = self.max_order is not None and self.current_order >= self.max_order
+        return self.current_level is None or len(self.current_level) == 0 or reached_max_order
+
+    def run(self, termination_criteria: TerminationCriteria, verbose=False):
+        for _ in self.run_iter(termination_criteria, verbose=verbose):
+            pass
+
+    def run_iter(self, termination_criteria: TerminationCriteria, verbose=False) -> Iterator[list[EvaluatedPS]]:
+        """Like .run, but each level is yielded as soon as it has been scored"""
+        start_time = time.time()
+        iterations = 0
+
+        def criteria_met():
+            return termination_criteria.met(iterations=iterations,
+                                            ps_evaluations=self.get_used_evaluations(),
+                                            time=time.time() - start_time)
+
+        while not (self.is_finished() or criteria_met()):
+            # the criteria are also checked while the level is expanded, so that a time limit can stop it halfway
+            self.step(max_evaluations=termination_criteria.remaining_ps_evaluations(self.get_used_evaluations()),
+                      should_stop=criteria_met)
+            iterations += 1
+            if self.current_level is not None:
+                if verbose:
+                    print(f"Level {self.current_order} has {len(self.current_level)} PSs, "
+                          f"used budget is {self.used_evaluations}")
+                yield self.publish_results(self.level_as_evaluated_pss(self.current_level))
+
+    @staticmethod
+    def level_as_evaluated_pss(level: LevelOfPSs) -> list[EvaluatedPS]:
+        return [EvaluatedPS(genome, metric_scores=list(metric_scores))
+                for genome, metric_scores in zip(level.genomes, level.metric_scores)]
+
+    def get_results(self, amount: Optional[int] = None) -> list[EvaluatedPS]:
+        """The PSs of all the levels, sorted by atomicity"""
+        if len(self.catalog) == 0:
+            return []
+        genomes = np.vstack([level.genomes for level in self.catalog])
+        metric_scores = np.vstack([level.metric_scores for level in self.catalog])
+        order = np.argsort(-metric_scores[:, 2], kind="stable")
+        if amount is not None:
+            order = order[:amount]
+        return [EvaluatedPS(genomes[index], metric_scores=list(metric_scores[index])) for index in order]
+
+    @classmethod
+    def with_default_settings(cls, pRef: PRef):
+        return cls(pRef=pRef,
+                   min_support=max(1, pRef.sample_size // 100),
+                   max_order=None,
+                   max_pss_per_level=10000)
@@ -14,8 +14,11 @@ from Core.ArchivePSMiner import ArchivePSMiner
 from FSStochasticSearch.HistoryPRefs import uniformly_random_distribution_pRef, pRef_from_GA, pRef_from_SA, \
     pRef_from_GA_best, pRef_from_SA_best
 from PSMiners.AbstractPSMiner import AbstractPSMiner
+from PSMiners.BeamPSMiner import BeamPSMiner
+from PSMiners.BranchAndBoundPSMiner import BranchAndBoundPSMiner
 from PSMiners.DEAP.DEAPPSMiner import DEAPPSMiner
 from PSMiners.DEAP.deap_utils import report_in_order_of_last_metric, plot_stats_for_run
+from PSMiners.LevelWisePSMiner import LevelWisePSMiner
 from PSMiners.PyMoo.SequentialCrowdingMiner import SequentialCrowdingMiner
 from utils import announce
 import plotly.express as px
@@ -46,7 +49,7 @@ def get_history_pRef(benchmark_problem: BenchmarkProblem,
 
 
 def get_ps_miner(pRef: PRef,
-                 which: Literal["classic", "NSGA_experimental_crowding", "NSGA", "SPEA2"]):
+                 which: Literal["classic", "NSGA_experimental_crowding", "NSGA", "SPEA2", "sequential", "levelwise", "branch_and_bound", "beam"]):
     match which:
         case "classic": return ArchivePSMiner.with_default_settings(pRef)
         case "NSGA": return DEAPPSMiner(population_size = 300,
@@ -60,6 +63,9 @@ def get_ps_miner(pRef: PRef,
                                          pRef = pRef,
                                          use_spea=True)
         case "sequential": return SequentialCrowdingMiner.with_default_settings(pRef)
+        case "levelwise": return LevelWisePSMiner.with_default_settings(pRef)
+        case "branch_and_bound": return BranchAndBoundPSMiner.with_default_settings(pRef)
+        case "beam": return BeamPSMiner.with_default_settings(pRef)
         case _: raise ValueError
 
 def write_pss_to_file(pss: list[PS], file: str):
@@ -67,10 +73,14 @@ def write_pss_to_file(pss: list[PS], file: str):
     np.savez(file, ps_matrix = ps_matrix)
 
 def write_evaluated_pss_to_file(e_pss: list[EvaluatedPS], file: str):
+    """The file is replaced in one go, so that it can be rewritten while other stages are reading it"""
     ps_matrix = np.array([e_ps.values for e_ps in e_pss])
     fitness_matrix = np.array([e_ps.metric_scores for e_ps in e_pss])
 
-    np.savez(file, ps_matrix = ps_matrix, fitness_matrix=fitness_matrix)
+    temporary_file = file + ".tmp"
+    with open(temporary_file, "wb") as stream:
+        np.savez(stream, ps_matrix = ps_matrix, fitness_matrix=fitness_matrix)
+    os.replace(temporary_file, file)
 
 def load_pss(file: str) -> list[[EvaluatedPS | PS]]:
     results_dict = np.load(file)
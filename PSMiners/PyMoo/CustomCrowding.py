@@ -106,7 +106,7 @@ class PyMooPSSequentialCrowding(PyMooCustomCrowding):
     search_space: SearchSpace
     opt: Any
 
-    def __init__(self, search_space: SearchSpace, already_obtained: list[PS], immediate = False):
+    def __init__(self, search_space: SearchSpace, already_obtained: list[PS] | np.ndarray, immediate = False):
         self.search_space = search_space
         super().__init__()
         self.coverage = PyMooPSSequentialCrowding.get_coverage(self.search_space, already_obtained)
@@ -117,11 +117,15 @@ class PyMooPSSequentialCrowding(PyMooCustomCrowding):
 
 
     @classmethod
-    def get_coverage(cls, search_space: SearchSpace, already_obtained: list[PS]):
+    def get_coverage(cls, search_space: SearchSpace, already_obtained: list[PS] | np.ndarray):
+        """already_obtained can also be a genome matrix, as in the archive of SequentialCrowdingMiner"""
         if len(already_obtained) == 0:
             return np.zeros(search_space.amount_of_parameters, dtype=float)
 
-        pop_matrix = np.array([ps.values for ps in already_obtained])
+        if isinstance(already_obtained, np.ndarray):
+            pop_matrix = already_obtained
+        else:
+            pop_matrix = np.array([ps.values for ps in already_obtained])
         where_fixed = pop_matrix != STAR
         counts = np.sum(where_fixed, axis=0)
 
@@ -3,12 +3,15 @@ import random
 import numpy as np
 from pymoo.core.crossover import Crossover
 from pymoo.core.mutation import Mutation
+from pymoo.core.repair import Repair
 from pymoo.core.variable import Real, get
 from pymoo.operators.crossover.sbx import SBX
 from pymoo.operators.mutation.pm import PolynomialMutation
 from pymoo.operators.sampling.rnd import FloatRandomSampling
 
 from Core.SearchSpace import SearchSpace
+from Core.SupportIndex import SupportIndex
+from Core.get_init import LinkageTreeInit
 
 
 class PSGeometricSampling(FloatRandomSampling):
@@ -27,6 +30,27 @@ class PSGeometricSampling(FloatRandomSampling):
         return np.array([self.generate_single_individual(n, xu) for _ in range(n_samples)])
 
 
+class PSLinkageTreeSampling(FloatRandomSampling):
+    """
+    Samples PSs where the fixed variables form a cluster of the linkage tree of the PRef of the problem,
+    with the values of a high fitness solution (see LinkageTreeInit).
+    A proportion of the samples is still generated as in PSGeometricSampling, to keep some diversity.
+    """
+    linkage_tree_init: LinkageTreeInit
+    geometric_proportion: float
+
+    def __init__(self, elite_proportion: float = 0.1, geometric_proportion: float = 0.2):
+        super().__init__()
+        self.linkage_tree_init = LinkageTreeInit(elite_proportion=elite_proportion)
+        self.geometric_proportion = geometric_proportion
+
+    def _do(self, problem, n_samples, **kwargs):
+        amount_of_geometric = int(n_samples * self.geometric_proportion)
+        seeds = self.linkage_tree_init.get_seed_genomes(problem.pRef, n_samples - amount_of_geometric)
+        geometric = PSGeometricSampling()._do(problem, amount_of_geometric).reshape((-1, problem.n_var))
+        return np.vstack([seeds, geometric])
+
+
 # ---------------------------------------------------------------------------------------------------------
 # Class
 # ---------------------------------------------------------------------------------------------------------
@@ -95,3 +119,20 @@ class PSSimulatedBinaryCrossover(Crossover):
         return np.swapaxes(children, 0, 1)
 
 
+class PSSupportRepair(Repair):
+    """
+    Generalises the PSs with fewer than min_support observations in the PRef (by freeing some of their variables),
+    so that the metrics are never calculated for unobservable PSs.
+    Pymoo applies the repair to the sampled and the generated individuals before they are evaluated.
+    """
+    support_index: SupportIndex
+    min_support: int
+
+    def __init__(self, support_index: SupportIndex, min_support: int):
+        super().__init__()
+        self.support_index = support_index
+        self.min_support = min_support
+
+    def _do(self, problem, X, **kwargs):
+        genomes = np.asarray(X).astype(int)
+        return self.support_index.repaired(genomes, self.min_support).astype(np.asarray(X).dtype)
@@ -1,5 +1,5 @@
 from math import ceil
-from typing import Any, Optional
+from typing import Any, Optional, Iterator
 
 import numpy as np
 from deap.base import Toolbox
@@ -13,15 +13,21 @@ from pymoo.optimize import minimize
 import utils
 from BenchmarkProblems.BenchmarkProblem import BenchmarkProblem
 from Core.EvaluatedPS import EvaluatedPS
+from Core.Fidelity import FidelitySchedule, StratifiedSubsample
 from Core.PRef import PRef
+from Core.ParetoArchive import ParetoArchive
 from Core.PS import PS
 from Core.PSMetric.Classic3 import Classic3PSEvaluator
+from Core.SupportIndex import SupportIndex
 from Core.TerminationCriteria import TerminationCriteria, PSEvaluationLimit, UnionOfCriteria, IterationLimit, \
     SearchSpaceIsCovered
 from PSMiners.AbstractPSMiner import AbstractPSMiner
+from PSMiners.Checkpoint import Checkpointer, CheckpointState, get_rng_state, set_rng_state, pRef_to_checkpoint_state, \
+    pRef_from_checkpoint_state, load_checkpoint
 from PSMiners.DEAP.deap_utils import get_toolbox_for_problem, get_stats_object, nsga
 from PSMiners.PyMoo.CustomCrowding import PyMooPSSequentialCrowding
-from PSMiners.PyMoo.Operators import PSGeometricSampling, PSSimulatedBinaryCrossover, PSPolynomialMutation
+from PSMiners.PyMoo.Operators import PSGeometricSampling, PSSimulatedBinaryCrossover, PSPolynomialMutation, \
+    PSSupportRepair, PSLinkageTreeSampling
 from PSMiners.PyMoo.PSPyMooProblem import PSPyMooProblem, get_pymoo_algorithm
 from PSMiners.PyMoo.pymoo_utilities import get_pymoo_search_algorithm
 from utils import announce
@@ -33,24 +39,52 @@ class SequentialCrowdingMiner(AbstractPSMiner):
     budget_per_run: int
 
     pymoo_problem: PSPyMooProblem
-    archive: list[EvaluatedPS]
+    archive: ParetoArchive  # the scores are the ones from pymoo, so they are all minimised
+    iterations: int
 
     use_experimental_crowding_operator: bool
 
+    min_support: int  # PSs with fewer observations than this are repaired before being evaluated
+    support_index: Optional[SupportIndex]
+
+    # when true, the initial populations are sampled from the linkage tree instead of PSGeometricSampling
+    use_linkage_tree_sampling: bool
+    linkage_tree_sampling: Optional[PSLinkageTreeSampling]
+
+    # when a fidelity schedule is given, the early runs use a subsample of the PRef,
+    # and the winners are evaluated again with the full PRef before they enter the archive
+    fidelity_schedule: Optional[FidelitySchedule]
+    subsample: Optional[StratifiedSubsample]
+    low_fidelity_problems: dict[float, PSPyMooProblem]
+    low_fidelity_evaluations: int  # weighted by the fraction of the PRef they used, rounded up
+
 
     def __init__(self,
                  pRef: PRef,
                  which_algorithm: str,
                  population_size_per_run: int,
                  budget_per_run: int,
-                 use_experimental_crowding_operator: bool = True):
+                 use_experimental_crowding_operator: bool = True,
+                 min_support: int = 0,
+                 max_archive_size: Optional[int] = None,
+                 use_linkage_tree_sampling: bool = False,
+                 fidelity_schedule: Optional[FidelitySchedule] = None):
         super().__init__(pRef=pRef)
         self.which_algorithm = which_algorithm
         self.population_size_per_run = population_size_per_run
         self.budget_per_run = budget_per_run
         self.pymoo_problem = PSPyMooProblem(pRef)
-        self.archive = []
+        self.archive = ParetoArchive(self.search_space, directions=[-1, -1, -1], max_size=max_archive_size)
+        self.iterations = 0
         self.use_experimental_crowding_operator = use_experimental_crowding_operator
+        self.min_support = min_support
+        self.support_index = SupportIndex(pRef) if min_support > 0 else None
+        self.use_linkage_tree_sampling = use_linkage_tree_sampling
+        self.linkage_tree_sampling = PSLinkageTreeSampling() if use_linkage_tree_sampling else None  # reused, to keep the linkage tree
+        self.fidelity_schedule = fidelity_schedule
+        self.subsample = None if fidelity_schedule is None else fidelity_schedule.get_subsample(pRef)
+        self.low_fidelity_problems = {}
+        self.low_fidelity_evaluations = 0
 
     def __repr__(self):
         return (f"SequentialCrowdingMiner({self.which_algorithm = }, "
@@ -59,7 +93,21 @@ class SequentialCrowdingMiner(AbstractPSMiner):
 
 
     def get_used_evaluations(self) -> int:
-        return self.pymoo_problem.objectives_evaluator.used_evaluations
+        return self.pymoo_problem.objectives_evaluator.used_evaluations + self.low_fidelity_evaluations
+
+    def get_problem_for_current_run(self) -> (PSPyMooProblem, float):
+        """The problem to be used in this run, and the fraction of the PRef that it uses"""
+        fidelity = 1.0 if self.fidelity_schedule is None else self.fidelity_schedule.fraction_at(self.iterations)
+        if fidelity >= 1:
+            return self.pymoo_problem, 1.0
+        if fidelity not in self.low_fidelity_problems:
+            self.low_fidelity_problems[fidelity] = PSPyMooProblem(self.subsample.get_pRef(fidelity))
+        return self.low_fidelity_problems[fidelity], fidelity
+
+    def with_full_fidelity(self, e_pss: list[EvaluatedPS]) -> list[EvaluatedPS]:
+        """Evaluates the PSs using the full PRef, with the same sign as pymoo"""
+        evaluator = self.pymoo_problem.objectives_evaluator
+        return [EvaluatedPS(e_ps.values, metric_scores=-evaluator.get_S_MF_A(e_ps)) for e_ps in e_pss]
 
     @classmethod
     def output_of_miner_to_evaluated_ps(cls, output_of_miner) -> list[EvaluatedPS]:
@@ -85,7 +133,7 @@ class SequentialCrowdingMiner(AbstractPSMiner):
         # else:
         if self.use_experimental_crowding_operator:
             return PyMooPSSequentialCrowding(search_space=self.search_space,
-                                         already_obtained=self.archive,
+                                         already_obtained=self.archive.genomes,
                                          immediate=False)
         else:
             return RankAndCrowding(crowding_func = "ce")
@@ -93,11 +141,22 @@ class SequentialCrowdingMiner(AbstractPSMiner):
     def get_miner_algorithm(self):
         return get_pymoo_search_algorithm(which_algorithm=self.which_algorithm,
                                           pop_size=self.population_size_per_run,
-                                          sampling=PSGeometricSampling(),
+                                          sampling=self.get_sampling_operator(),
                                           crossover=PSSimulatedBinaryCrossover(),
                                           mutation=PSPolynomialMutation(self.search_space),
                                           crowding_operator=self.get_crowding_operator(),
-                                          search_space=self.search_space)
+                                          search_space=self.search_space,
+                                          repair=self.get_repair_operator())
+
+    def get_sampling_operator(self):
+        if self.linkage_tree_sampling is not None:
+            return self.linkage_tree_sampling
+        return PSGeometricSampling()
+
+    def get_repair_operator(self):
+        if self.support_index is None:
+            return None
+        return PSSupportRepair(support_index=self.support_index, min_support=self.min_support)
 
 
 
@@ -106,9 +165,13 @@ class SequentialCrowdingMiner(AbstractPSMiner):
             return np.zeros(self.search_space.amount_of_parameters)
         else:
             return PyMooPSSequentialCrowding.get_coverage(search_space=self.pymoo_problem.search_space,
-                                                          already_obtained=self.archive)
+                                                          already_obtained=self.archive.genomes)
 
 
+    def get_front_objectives(self) -> np.ndarray:
+        """The metrics of the non-dominated PSs in the archive, as a maximisation problem"""
+        return self.archive.objectives[self.archive.front_indices]
+
     def sort_by_m_and_a(self, pss: list[EvaluatedPS]) -> list[EvaluatedPS]:
         def get_atomicity(ps: EvaluatedPS) -> float:
             return ps.metric_scores[2]
@@ -121,17 +184,22 @@ class SequentialCrowdingMiner(AbstractPSMiner):
 
         return utils.sort_by_combination_of(pss, key_functions=[get_simplicity, get_mean_fitness, get_atomicity], reverse=False)
 
-    def step(self, verbose = False):
+    def step(self, verbose = False) -> list[EvaluatedPS]:
+        """Runs the pymoo algorithm once, and returns the winners which were added to the archive"""
         algorithm = self.get_miner_algorithm()
         if verbose:
             coverage = self.get_coverage()
             # print(f"In the operator, the coverage is {(coverage*100).astype(int)}")
 
+        problem, fidelity = self.get_problem_for_current_run()
+        evaluations_before = problem.objectives_evaluator.used_evaluations
         with announce("Running a single search step", verbose):
-            res = minimize(self.pymoo_problem,
+            res = minimize(problem,
                        algorithm,
                        termination=('n_evals', self.budget_per_run),
                        verbose=verbose)
+        if fidelity < 1:
+            self.low_fidelity_evaluations += ceil(fidelity * (problem.objectives_evaluator.used_evaluations - evaluations_before))
 
 
         e_pss = self.output_of_miner_to_evaluated_ps(res)
@@ -145,27 +213,89 @@ class SequentialCrowdingMiner(AbstractPSMiner):
 
         amount_to_keep_per_run = ceil(self.population_size_per_run / 20)
         winners = sorted_pss[:amount_to_keep_per_run]
+        if fidelity < 1:
+            winners = self.with_full_fidelity(winners)
 
-        self.archive.extend(winners)
+        self.archive.add(np.array([winner.values for winner in winners]),
+                         np.array([winner.metric_scores for winner in winners]))
 
         if verbose:
             print("At the end of this run, the winners were")
             for winner in winners:
                 print(winner)
+        return winners
+
 
+    def run(self,
+            termination_criteria: TerminationCriteria,
+            verbose=False,
+            checkpointer: Optional[Checkpointer] = None):
+        for _ in self.run_iter(termination_criteria, verbose=verbose, checkpointer=checkpointer):
+            pass
 
-    def run(self, termination_criteria: TerminationCriteria, verbose=False):
-        iterations = 0
+    def run_iter(self,
+                 termination_criteria: TerminationCriteria,
+                 verbose=False,
+                 checkpointer: Optional[Checkpointer] = None) -> Iterator[list[EvaluatedPS]]:
+        """Like .run, but the winners of each run are yielded as soon as they are archived"""
         def should_stop():
             return termination_criteria.met(ps_evaluations = self.get_used_evaluations(),
                                             archive = self.archive,
                                             coverage = self.get_coverage(),
-                                            iterations = iterations)
+                                            iterations = self.iterations,
+                                            front = self.get_front_objectives())
 
 
         while not should_stop():
-            self.step(verbose=verbose)
-            iterations += 1
+            winners = self.step(verbose=verbose)
+            self.iterations += 1
+            if checkpointer is not None and checkpointer.should_write(self.iterations):
+                checkpointer.write_in_background(self.get_checkpoint_state())
+            yield self.publish_results(winners)
+
+        if checkpointer is not None:
+            checkpointer.write_in_background(self.get_checkpoint_state())
+            checkpointer.wait()
+
+    def get_checkpoint_state(self) -> CheckpointState:
+        """The state between two steps, which is all that's needed to continue the run (see resume_from)"""
+        return {"miner": np.array("SequentialCrowdingMiner"),
+                "archive_genomes": self.archive.genomes.copy(),
+                "archive_metric_scores": self.archive.metric_scores.copy(),
+                "used_evaluations": np.array(self.pymoo_problem.objectives_evaluator.used_evaluations),
+                "low_fidelity_evaluations": np.array(self.low_fidelity_evaluations),
+                "iterations": np.array(self.iterations),
+                "which_algorithm": np.array(self.which_algorithm),
+                "population_size_per_run": np.array(self.population_size_per_run),
+                "budget_per_run": np.array(self.budget_per_run),
+                "use_experimental_crowding_operator": np.array(self.use_experimental_crowding_operator),
+                "min_support": np.array(self.min_support),
+                "max_archive_size": np.array(-1 if self.archive.max_size is None else self.archive.max_size),
+                "use_linkage_tree_sampling": np.array(self.use_linkage_tree_sampling),
+                "fidelity_schedule": np.zeros(0) if self.fidelity_schedule is None else self.fidelity_schedule.to_array(),
+                "rng_state": get_rng_state(),
+                **pRef_to_checkpoint_state(self.pRef)}
+
+    @classmethod
+    def resume_from(cls, checkpoint: str):
+        """Constructs the miner from a checkpoint file, and calling .run will continue where the checkpoint was taken"""
+        state = load_checkpoint(checkpoint, expected_miner="SequentialCrowdingMiner")
+        miner = cls(pRef=pRef_from_checkpoint_state(state),
+                    which_algorithm=str(state["which_algorithm"]),
+                    population_size_per_run=int(state["population_size_per_run"]),
+                    budget_per_run=int(state["budget_per_run"]),
+                    use_experimental_crowding_operator=bool(state["use_experimental_crowding_operator"]),
+                    min_support=int(state["min_support"]),
+                    max_archive_size=None if int(state["max_archive_size"]) < 0 else int(state["max_archive_size"]),
+                    use_linkage_tree_sampling=bool(state["use_linkage_tree_sampling"]),
+                    fidelity_schedule=None if len(state["fidelity_schedule"]) == 0
+                                      else FidelitySchedule.from_array(state["fidelity_schedule"]))
+        miner.archive.add(state["archive_genomes"], state["archive_metric_scores"])
+        miner.pymoo_problem.objectives_evaluator.used_evaluations = int(state["used_evaluations"])
+        miner.low_fidelity_evaluations = int(state["low_fidelity_evaluations"])
+        miner.iterations = int(state["iterations"])
+        set_rng_state(state["rng_state"])
+        return miner
 
     @classmethod
     def with_default_settings(cls, pRef: PRef):
@@ -177,11 +307,8 @@ class SequentialCrowdingMiner(AbstractPSMiner):
 
 
     def get_results(self, amount: Optional[int] = None) -> list[EvaluatedPS]:
-        if amount is None:
-            amount = len(self.archive)
-
-        self.archive = self.sort_by_atomicity(self.archive)
-        return self.archive[:amount]
+        """The archived PSs with the best atomicity (which is the last metric)"""
+        return self.archive.to_evaluated_pss(self.archive.top_k_indices(objective=2, k=amount))
 
 
 
@@ -18,31 +18,32 @@ def get_pymoo_search_algorithm(which_algorithm: str,
                                sampling: Any,
                                crowding_operator: Survival,
                                crossover: Any,
-                               mutation: Any):
+                               mutation: Any,
+                               repair: Any = None):
     n_params = search_space.amount_of_parameters
     def get_ref_dirs():
         return get_reference_directions("das-dennis", 3, n_partitions=12)
     if which_algorithm == "NSGAII":
         return NSGA2(pop_size=pop_size, sampling=sampling, crossover=crossover,
-                      mutation=mutation, eliminate_duplicates=True, survival=crowding_operator)
+                      mutation=mutation, eliminate_duplicates=True, survival=crowding_operator, repair=repair)
     if which_algorithm == "NSGAIII":
         return NSGA3(pop_size=pop_size, ref_dirs=get_ref_dirs(), sampling=sampling,
-                     crossover=crossover, mutation=mutation, eliminate_duplicates=True, survival=crowding_operator)
+                     crossover=crossover, mutation=mutation, eliminate_duplicates=True, survival=crowding_operator, repair=repair)
     elif which_algorithm == "MOEAD":
         return MOEAD(ref_dirs = get_ref_dirs(), sampling=sampling, crossover=crossover,
             mutation=mutation, n_neighbors=n_params, prob_neighbor_mating=0.7,
-            survival=crowding_operator
+            survival=crowding_operator, repair=repair
         )
     elif which_algorithm == "AGEMOEA":
         return AGEMOEA(pop_size=pop_size, sampling=sampling, crossover=crossover,
-                       mutation=mutation, eliminate_duplicates=True, survival=crowding_operator)
+                       mutation=mutation, eliminate_duplicates=True, survival=crowding_operator, repair=repair)
     elif which_algorithm == "RVEA":
         return RVEA(pop_size=pop_size, sampling=sampling, crossover=crossover,
-                    mutation=mutation, eliminate_duplicates=True, survival=crowding_operator,
+                    mutation=mutation, eliminate_duplicates=True, survival=crowding_operator, repair=repair,
                     ref_dirs=get_ref_dirs())
     elif which_algorithm == "SPEA2":
         return SPEA2(pop_size=pop_size, sampling=sampling, crossover=crossover,
-                    mutation=mutation, eliminate_duplicates=True, survival=crowding_operator,
+                    mutation=mutation, eliminate_duplicates=True, survival=crowding_operator, repair=repair,
                     ref_dirs=get_ref_dirs())
     else:
         raise Exception(f"The algorithm {which_algorithm} was not recognised...")
\ No newline at end of file